@@ -0,0 +1,228 @@
+from datetime import datetime
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context, url_for
+from werkzeug.exceptions import NotFound
+
+from catalog import (export_recipes, import_recipes, recipe_details, recipe_page, remove_recipe, scale_factor,
+                     sync_ingredients)
+from extensions import csrf, limiter, pdf_cache
+from forms import recipe_validator
+from models import db, Recipe
+from photos import upload_url
+from queries import costing_rows
+from recipe_io import RECIPE_FIELDS, EXPORT_FIELDS, DATE_FORMAT, created_at_for, validate_recipe, read_ndjson
+from recipe_views import get_page_size
+
+
+# JSON API, version 1
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+def api_error(status, message, **details):
+    return jsonify(error=message, **details), status
+
+def api_recipe(details):
+    recipe = {field: details[field] for field in EXPORT_FIELDS}
+    recipe['ingredient_lines'] = details['ingredients_list']
+    recipe['images'] = [upload_url(image['image_path']) for image in details['images']]
+    recipe['url'] = url_for('recipes.view_recipe', recipe_id=details['id'])
+    return recipe
+
+def api_json_body():
+    if not request.is_json:
+        return None, api_error(415, 'Send the recipe as application/json.')
+    data = request.get_json(silent=True)
+    if data is None:
+        return None, api_error(400, 'Request body is not valid JSON.')
+    return data, None
+
+# List recipes (newest first, or best match with ?keyword= / ?ingredient=), a page at a time
+@bp.route('/recipes', methods=['GET'])
+@limiter.limit("60 per minute")
+def list_recipes():
+    keyword = request.args.get('keyword')
+    ingredient = request.args.get('ingredient')
+    recipes, next_cursor, total = recipe_page(keyword=keyword,
+                                              ingredient=ingredient,
+                                              cursor=request.args.get('cursor'),
+                                              page_size=get_page_size())
+    next_url = None
+    if next_cursor:
+        params = {key: value for key, value in request.args.items() if key != 'cursor'}
+        next_url = url_for('api.list_recipes', cursor=next_cursor, **params)
+    return jsonify(
+        recipes=[{
+            'id': recipe['id'],
+            'title': recipe['title'],
+            'date': recipe['date'],
+            'prep_time': recipe['prep_time'],
+            'cook_time': recipe['cook_time'],
+            'url': url_for('api.get_recipe', recipe_id=recipe['id'])
+        } for recipe in recipes],
+        total=total,
+        next_url=next_url
+    )
+
+@bp.route('/recipes/<int:recipe_id>', methods=['GET'])
+@limiter.limit("60 per minute")
+def get_recipe(recipe_id):
+    try:
+        return jsonify(api_recipe(recipe_details(recipe_id)))
+    except NotFound:
+        return api_error(404, 'Recipe not found.')
+
+@bp.route('/recipes', methods=['POST'])
+@limiter.limit("20 per minute")
+@csrf.exempt
+def create_recipe():
+    data, error = api_json_body()
+    if error:
+        return error
+    values, errors = validate_recipe(data, recipe_validator())
+    if errors:
+        return api_error(422, 'Invalid recipe.', errors=errors)
+    recipe = Recipe(**{'date': datetime.now().strftime(DATE_FORMAT), **values})
+    recipe.created_at = created_at_for(recipe.date)
+    try:
+        db.session.add(recipe)
+        db.session.flush()
+        sync_ingredients(recipe)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error('Error adding recipe through the API: %s', e)
+        return api_error(500, 'Error adding recipe.')
+    current_app.logger.info('Added recipe %s through the API', recipe.id)
+    response = jsonify(api_recipe(recipe_details(recipe.id)))
+    response.headers['Location'] = url_for('api.get_recipe', recipe_id=recipe.id)
+    return response, 201
+
+# PUT replaces every field; PATCH changes only the fields sent
+@bp.route('/recipes/<int:recipe_id>', methods=['PUT', 'PATCH'])
+@limiter.limit("20 per minute")
+@csrf.exempt
+def update_recipe(recipe_id):
+    recipe = db.session.get(Recipe, recipe_id)
+    if recipe is None:
+        return api_error(404, 'Recipe not found.')
+    data, error = api_json_body()
+    if error:
+        return error
+    current = {field: getattr(recipe, field) for field in RECIPE_FIELDS} if request.method == 'PATCH' else None
+    values, errors = validate_recipe(data, recipe_validator(), current)
+    if errors:
+        return api_error(422, 'Invalid recipe.', errors=errors)
+    try:
+        if values.get('date') and values['date'] != recipe.date:
+            recipe.created_at = created_at_for(values['date'])
+        for field, value in values.items():
+            setattr(recipe, field, value)
+        sync_ingredients(recipe)
+        db.session.commit()
+        pdf_cache.invalidate(recipe_id)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error('Error updating recipe %s through the API: %s', recipe_id, e)
+        return api_error(500, 'Error updating recipe.')
+    return jsonify(api_recipe(recipe_details(recipe_id)))
+
+@bp.route('/recipes/<int:recipe_id>', methods=['DELETE'])
+@limiter.limit("5 per minute")
+@csrf.exempt
+def delete_recipe(recipe_id):
+    recipe = Recipe.query.options(db.selectinload(Recipe.images)).filter(Recipe.id == recipe_id).first()
+    if recipe is None:
+        return api_error(404, 'Recipe not found.')
+    try:
+        remove_recipe(recipe)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error('Error deleting recipe %s through the API: %s', recipe_id, e)
+        return api_error(500, 'Error deleting recipe.')
+    current_app.logger.info('Deleted recipe %s through the API', recipe_id)
+    return '', 204
+
+# A recipe scaled by ?factor=, or to ?covers= portions of a recipe that makes ?servings=: each
+# line's scaled amount, cost and calories, the totals, and what to buy
+@bp.route('/recipes/<int:recipe_id>/scale')
+@limiter.limit("60 per minute")
+def scale_recipe(recipe_id):
+    factor = scale_factor(request.args)
+    if factor is None:
+        return api_error(400, 'Give ?factor=, or ?covers= and ?servings=, scaling the recipe up to '
+                              f"{current_app.config['MAX_SCALE_FACTOR']} times.")
+    rows = costing_rows([recipe_id])
+    if not rows:
+        return api_error(404, 'Recipe not found.')
+    from costing import cost_recipes  # Loads NumPy, so only on first use
+    costing = cost_recipes(rows, {recipe_id: factor})
+    return jsonify(**costing['recipes'][0],
+                   shopping_list=costing['shopping_list'],
+                   url=url_for('api.get_recipe', recipe_id=recipe_id))
+
+# Scale and cost a menu in one pass: {"recipes": [{"id": 1, "covers": 40, "servings": 4}, ...]}.
+# Each recipe gives a factor, or covers and servings; top-level "factor", "covers" and "servings"
+# apply to the recipes that leave them out. A recipe listed twice is made twice (its factors add
+# up). Answers with each recipe's totals (and scaled lines with ?lines=true), the menu's
+# shopping list and its grand totals.
+@bp.route('/menus/cost', methods=['POST'])
+@limiter.limit("20 per minute")
+@csrf.exempt
+def cost_menu():
+    data, error = api_json_body()
+    if error:
+        return error
+    items = data.get('recipes') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return api_error(400, 'Send {"recipes": [{"id": ..., "covers": ..., "servings": ...}, ...]}.')
+    if len(items) > current_app.config['MENU_COSTING_MAX_RECIPES']:
+        return api_error(413, f"A menu may have at most {current_app.config['MENU_COSTING_MAX_RECIPES']} recipes.")
+    defaults = {key: data[key] for key in ('factor', 'covers', 'servings') if key in data}
+    factors, positions, errors = {}, {}, []
+    for position, item in enumerate(items):
+        recipe_id = item.get('id') if isinstance(item, dict) else None
+        if not isinstance(recipe_id, int) or isinstance(recipe_id, bool):
+            errors.append({'index': position, 'errors': ['Give the recipe id as a number.']})
+            continue
+        values = {**defaults, **item}
+        if 'covers' in item:
+            values.pop('factor', None)  # The recipe's own covers win over a menu-wide factor
+        factor = scale_factor(values)
+        if factor is None:
+            errors.append({'index': position, 'errors': [
+                f"Give a factor, or covers and servings, up to {current_app.config['MAX_SCALE_FACTOR']} times the recipe."]})
+            continue
+        factors[recipe_id] = factors.get(recipe_id, 0) + factor
+        positions.setdefault(recipe_id, position)
+    if errors:
+        return api_error(422, 'Invalid menu.', errors=errors)
+    rows = costing_rows(list(factors))
+    found = {row.recipe_id for row in rows}
+    missing = [{'index': positions[recipe_id], 'errors': ['Recipe not found.']}
+               for recipe_id in factors if recipe_id not in found]
+    if missing:
+        return api_error(422, 'Invalid menu.', errors=missing)
+    from costing import cost_recipes
+    costing = cost_recipes(rows, factors, with_lines=request.args.get('lines', '').lower() == 'true')
+    for recipe in costing['recipes']:
+        recipe['url'] = url_for('api.get_recipe', recipe_id=recipe['id'])
+    return jsonify(costing)
+
+# Bulk import: one recipe per line (NDJSON), same fields and rules as POST /api/v1/recipes
+@bp.route('/recipes/import', methods=['POST'])
+@limiter.limit("10 per hour")
+@csrf.exempt
+def bulk_import():
+    if request.mimetype not in ('application/x-ndjson', 'application/jsonl'):
+        return api_error(415, 'Send recipes as application/x-ndjson, one JSON object per line.')
+    request.max_content_length = current_app.config['API_IMPORT_MAX_BYTES']
+    summary = import_recipes(read_ndjson(request.stream))
+    return jsonify(summary), (422 if summary['failed'] and not summary['created'] else 200)
+
+# Bulk export: every recipe as NDJSON, streamed
+@bp.route('/recipes/export')
+@limiter.limit("10 per hour")
+def bulk_export():
+    filename = f"recipes_{datetime.now().strftime('%Y-%m-%d')}.ndjson"
+    return Response(stream_with_context(export_recipes()),
+                    mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
@@ -0,0 +1,84 @@
+"""Measure what a rate limit check costs with each storage, and whether workers share the counts.
+
+Every storage and strategy is run by several processes at once, like gunicorn workers: each one
+checks limits for many clients, then all of them hit one shared limit. `memory://` keeps counts
+per process, so it lets each worker through up to the limit; `shm://` counts for the host.
+
+    python benchmarks/rate_limit.py --processes 4 --checks 20000
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STRATEGIES = ('fixed-window', 'sliding-window-counter')
+CLIENTS = 1000  # Distinct clients (limit keys) spread over the checks
+SHARED_LIMIT = 500  # Hits allowed on the shared limit per hour, however many workers there are
+
+
+# Worker entry point; each runs in its own interpreter
+def work(storage_uri, strategy, checks, start):
+    sys.path.insert(0, ROOT)
+    import rate_limit_storage  # noqa: F401  (registers the shm:// storage scheme)
+    from limits import parse
+    from limits.storage import storage_from_string
+    from limits.strategies import STRATEGIES as LIMITERS
+
+    limiter = LIMITERS[strategy](storage_from_string(storage_uri))
+    per_client = parse('1000 per minute')
+    shared = parse(f'{SHARED_LIMIT} per hour')
+    time.sleep(max(0, start - time.time()))
+
+    timings = []
+    for check in range(checks):
+        began = time.perf_counter()
+        limiter.hit(per_client, f'client-{os.getpid()}-{check % CLIENTS}')
+        timings.append(time.perf_counter() - began)
+    allowed = sum(limiter.hit(shared, 'everyone') for _ in range(SHARED_LIMIT))
+    timings.sort()
+    print(json.dumps({
+        'mean_us': sum(timings) / len(timings) * 1e6,
+        'p99_us': timings[int(len(timings) * 0.99)] * 1e6,
+        'allowed': allowed,
+    }))
+
+
+def python(code, workdir):
+    code = f'import sys; sys.path.insert(0, {ROOT!r}); from benchmarks.rate_limit import *; {code}'
+    return subprocess.Popen([sys.executable, '-c', code], cwd=workdir,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+
+
+@click.command()
+@click.option('--processes', default=4, show_default=True, help='Worker processes checking limits at once.')
+@click.option('--checks', default=20000, show_default=True, help='Limit checks per process.')
+def main(processes, checks):
+    """Benchmark rate limit checks with the in-process and shared storages."""
+    click.echo(f"{processes} processes x {checks} checks; shared limit of {SHARED_LIMIT}")
+    click.echo(f"{'storage':<10} {'strategy':<24} {'mean':>9} {'p99':>9} {'shared limit let through':>26}")
+    for name in ('memory', 'shm'):
+        for strategy in STRATEGIES:
+            workdir = tempfile.mkdtemp(prefix='bench-ratelimit-')
+            storage_uri = 'memory://' if name == 'memory' else f"shm://{os.path.join(workdir, 'ratelimit.slots')}"
+            start = time.time() + 2  # Give every process time to start first
+            workers = [python(f'work({storage_uri!r}, {strategy!r}, {checks}, {start})', workdir)
+                       for _ in range(processes)]
+            results = []
+            for worker in workers:
+                output, _ = worker.communicate()
+                if worker.returncode != 0:
+                    raise click.ClickException(f"The {name} {strategy} worker failed")
+                results.append(json.loads(output.strip().splitlines()[-1]))
+            mean = sum(result['mean_us'] for result in results) / len(results)
+            p99 = max(result['p99_us'] for result in results)
+            allowed = sum(result['allowed'] for result in results)
+            click.echo(f"{name:<10} {strategy:<24} {mean:>7.1f}us {p99:>7.1f}us {allowed:>26}")
+
+
+if __name__ == '__main__':
+    main()
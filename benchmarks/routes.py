@@ -0,0 +1,416 @@
+"""Latency, throughput and memory of each page as the catalog grows.
+
+A synthetic catalog (recipes with ingredients, dates spread over three years and photos) is
+generated once per size and kept under --data-dir. Each route is then driven either in-process
+through the Flask test client, or over HTTP against a local gunicorn with concurrent clients.
+The report gives p50/p95/p99 latency, requests/s and peak RSS per route.
+
+    python benchmarks/routes.py --sizes 1000,10000,100000
+    python benchmarks/routes.py --server --workers 2 --concurrency 8
+    python benchmarks/routes.py --save-baseline    # record the results in benchmarks/baseline.json
+    python benchmarks/routes.py --compare          # fail if a route regressed against the baseline
+"""
+import http.client
+import io
+import json
+import os
+import random
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+CATALOG_VERSION = 1  # Bump when the generated data changes, so old catalogs are rebuilt
+
+# Synthetic catalog vocabulary
+DISHES = ['soup', 'stew', 'salad', 'curry', 'pasta', 'risotto', 'pie', 'tart', 'bread', 'cake',
+          'pancakes', 'casserole', 'chili', 'tacos', 'noodles', 'dumplings', 'omelette', 'gratin']
+ADJECTIVES = ['Rustic', 'Spicy', 'Creamy', 'Quick', 'Roasted', 'Smoky', 'Summer', 'Winter',
+              'Garlicky', 'Lemony', 'Herbed', 'Crispy', 'Grandma\'s', 'Weeknight', 'Golden']
+INGREDIENTS = ['tomato', 'onion', 'garlic', 'basil', 'olive oil', 'salt', 'black pepper', 'butter',
+               'flour', 'egg', 'milk', 'sugar', 'carrot', 'celery', 'potato', 'chicken', 'beef',
+               'rice', 'lentils', 'chickpeas', 'spinach', 'mushroom', 'parmesan', 'cheddar', 'lemon',
+               'lime', 'cumin', 'paprika', 'chili flakes', 'ginger', 'soy sauce', 'honey', 'thyme',
+               'rosemary', 'parsley', 'cilantro', 'coconut milk', 'cream', 'bell pepper', 'zucchini',
+               'eggplant', 'pine nuts', 'walnuts', 'oats', 'yogurt', 'vinegar', 'mustard', 'bacon']
+UNITS = ['cups', 'tbsp', 'tsp', 'g', 'cloves of', 'pinch of']
+STEPS = ['Chop everything finely.', 'Heat the oil in a large pan.', 'Stir in the spices.',
+         'Simmer for twenty minutes.', 'Season to taste.', 'Bake until golden.',
+         'Whisk until smooth.', 'Rest before serving.', 'Garnish with fresh herbs.']
+AUTHORS = ['Ana', 'Ben', 'Chloe', 'Dev', 'Emma', 'Farid', 'Grace', 'Hiro']
+PHOTOS = 24  # Distinct photo files; recipes share them, as they would after deduplication
+
+# Routes, each a function of (random generator, catalog size) returning the path to request
+ROUTES = {
+    'index': lambda rng, size: '/',
+    'search_keyword': lambda rng, size: f'/search?keyword={rng.choice(DISHES)}',
+    'search_ingredient': lambda rng, size: f'/search?ingredient={rng.choice(INGREDIENTS).replace(" ", "+")}',
+    'view_recipe': lambda rng, size: f'/recipe/{rng.randint(1, size)}',
+    'photo_gallery': lambda rng, size: '/photo_gallery',
+    'generate_pdf': lambda rng, size: f'/generate_pdf/{rng.randint(1, size)}',
+    'typeahead': lambda rng, size: f'/suggest?q={rng.choice(DISHES)[:3]}',
+    'api_list': lambda rng, size: '/api/v1/recipes',
+    'scale_recipe': lambda rng, size: f'/api/v1/recipes/{rng.randint(1, size)}/scale?covers=40&servings=4',
+}
+HEADERS = {'Accept-Encoding': 'br, gzip'}
+
+
+def load_app():
+    sys.path.insert(0, ROOT)
+    from app import app
+    return app
+
+
+def environment(data_dir, size, run_dir):
+    catalog = os.path.join(data_dir, str(size))
+    return dict(os.environ,
+                DATABASE_URL=f"sqlite:///{os.path.join(catalog, 'recipes.db')}",
+                UPLOAD_FOLDER=os.path.join(catalog, 'uploads'),
+                PDF_CACHE_DIR=os.path.join(run_dir, 'pdf'),
+                READ_CACHE_DIR=os.path.join(run_dir, 'read'),
+                STATIC_PRECOMPRESS_DIR=os.path.join(run_dir, 'static'),
+                RATELIMIT_ENABLED='false',
+                FLASK_ENV='production')
+
+
+def percentile(timings, fraction):
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))] if timings else 0
+
+
+def summarize(timings, errors, elapsed, rss_kib):
+    timings = sorted(timings)
+    return {
+        'requests': len(timings),
+        'errors': errors,
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 2),
+        'rps': round(len(timings) / elapsed, 1) if elapsed > 0 else 0,
+        'rss_mb': round(rss_kib / 1024, 1) if rss_kib else None,
+    }
+
+
+# Worker entry points; each runs in its own interpreter with the catalog's environment
+
+def synthetic_recipes(count):
+    rng = random.Random(count)
+    first_day = datetime.now() - timedelta(days=3 * 365)
+    for i in range(count):
+        lines = [f'{rng.randint(1, 4)} {rng.choice(UNITS)} {name}'
+                 for name in rng.sample(INGREDIENTS, rng.randint(4, 10))]
+        photos = [f'photo-{i % PHOTOS}'] + ([f'photo-{i * 7 % PHOTOS}'] if i % 3 == 0 else [])
+        yield json.dumps({
+            'title': f'{rng.choice(ADJECTIVES)} {DISHES[i % len(DISHES)]} {i + 1}',
+            'author': rng.choice(AUTHORS),
+            'date': (first_day + timedelta(days=i * 3 * 365 // count)).strftime('%Y-%m-%d'),
+            'prep_time': rng.randint(5, 60),
+            'cook_time': rng.randint(5, 180),
+            'ingredients': ', '.join(lines),
+            'instructions': ' '.join(rng.choice(STEPS) for _ in range(rng.randint(3, 8))),
+            'notes': rng.choice(['', 'Keeps for three days.', 'Freezes well.']),
+            'images': photos,
+        })
+
+
+def seed(size):
+    from PIL import Image
+    app = load_app()
+    from catalog import import_recipes, init_db
+    from models import db
+    from photos import store_blob
+    from recipe_io import read_ndjson
+    with app.app_context():
+        init_db()
+        images = {}
+        for n in range(PHOTOS):
+            photo = Image.merge('RGB', [Image.effect_noise((640, 480), 20 + n + channel) for channel in range(3)])
+            buffer = io.BytesIO()
+            photo.save(buffer, 'JPEG', quality=85)
+            buffer.seek(0)
+            blob = store_blob(buffer, 'jpg')
+            images[f'photo-{n}'] = (blob.hash, blob.path)
+        db.session.commit()
+        summary = import_recipes(read_ndjson(synthetic_recipes(size)), images=images, collect_ids=False)
+    print(json.dumps({'recipes': summary['created'], 'failed': summary['failed']}))
+
+
+# Bring a catalog generated by an older checkout up to the current schema
+def migrate():
+    from catalog import init_db
+    with load_app().app_context():
+        init_db()
+    print(json.dumps({}))
+
+
+# Drive every route through the test client; RSS is the process peak once the route has run
+def client_run(size, routes, max_requests, seconds, warmup):
+    client = load_app().test_client()
+    results = {}
+    for name in routes:
+        rng = random.Random(name)
+        for _ in range(warmup):
+            client.get(ROUTES[name](rng, size), headers=HEADERS).close()
+        timings = []
+        errors = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while len(timings) < max_requests and time.perf_counter() < deadline:
+            path = ROUTES[name](rng, size)
+            began = time.perf_counter()
+            response = client.get(path, headers=HEADERS)
+            response.get_data()
+            timings.append(time.perf_counter() - began)
+            errors += response.status_code >= 500
+        elapsed = time.perf_counter() - started
+        results[name] = summarize(timings, errors, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    print(json.dumps(results))
+
+
+def python(code, env, workdir, **kwargs):
+    code = f'import sys; sys.path.insert(0, {ROOT!r}); from benchmarks.routes import *; {code}'
+    return subprocess.Popen([sys.executable, '-c', code], env=env, cwd=workdir,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, **kwargs)
+
+
+def last_json(process, what):
+    output, _ = process.communicate()
+    if process.returncode != 0 or not output.strip():
+        raise click.ClickException(f"{what} failed (exit code {process.returncode})")
+    return json.loads(output.strip().splitlines()[-1])
+
+
+# Generate the catalog for `size` unless a complete one is already there, which is migrated
+def ensure_catalog(data_dir, size):
+    catalog = os.path.join(data_dir, str(size))
+    marker = os.path.join(catalog, 'catalog.json')
+    if os.path.exists(marker):
+        with open(marker) as file:
+            if json.load(file).get('version') == CATALOG_VERSION:
+                last_json(python('migrate()', environment(data_dir, size, catalog), catalog), 'Migrating')
+                return
+    shutil.rmtree(catalog, ignore_errors=True)
+    os.makedirs(catalog)
+    click.echo(f"Generating a catalog of {size:,} recipes in {catalog} ...")
+    started = time.perf_counter()
+    result = last_json(python(f'seed({size})', environment(data_dir, size, catalog), catalog), 'Seeding')
+    with open(marker, 'w') as file:
+        json.dump({'version': CATALOG_VERSION, **result}, file)
+    click.echo(f"  {result['recipes']:,} recipes in {time.perf_counter() - started:.0f}s")
+
+
+# gunicorn
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise click.ClickException("gunicorn exited during startup")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise click.ClickException(f"gunicorn did not start listening on port {port}")
+
+
+# Peak RSS (KiB) of the largest gunicorn worker, from /proc (Linux only)
+def worker_peak_rss(master_pid):
+    try:
+        with open(f'/proc/{master_pid}/task/{master_pid}/children') as file:
+            pids = file.read().split()
+    except OSError:
+        return None
+    peaks = []
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status') as file:
+                peaks += [int(line.split()[1]) for line in file if line.startswith('VmHWM:')]
+        except OSError:
+            pass
+    return max(peaks, default=None)
+
+
+# `concurrency` clients with keep-alive connections request one route for `seconds`
+def load(port, name, size, concurrency, seconds):
+    timings = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client(number):
+        rng = random.Random(f'{name}-{number}')
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        mine = []
+        failed = 0
+        while time.perf_counter() < deadline:
+            began = time.perf_counter()
+            try:
+                connection.request('GET', ROUTES[name](rng, size), headers=HEADERS)
+                response = connection.getresponse()
+                response.read()
+                failed += response.status >= 500
+                mine.append(time.perf_counter() - began)
+                if response.will_close:
+                    connection.close()
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                connection.close()
+        connection.close()
+        with lock:
+            timings.extend(mine)
+            errors[0] += failed
+
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return timings, errors[0], time.perf_counter() - started
+
+
+def server_run(data_dir, size, routes, workers, concurrency, seconds, warmup):
+    run_dir = tempfile.mkdtemp(prefix='bench-routes-')
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--bind', f'127.0.0.1:{port}',
+         '--pythonpath', ROOT, '--log-level', 'warning', '--timeout', '120', 'app:app'],
+        env=environment(data_dir, size, run_dir), cwd=run_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port, server)
+        results = {}
+        for name in routes:
+            if warmup:
+                load(port, name, size, min(concurrency, workers), 0.5 * warmup)
+            timings, errors, elapsed = load(port, name, size, concurrency, seconds)
+            results[name] = summarize(timings, errors, elapsed, worker_peak_rss(server.pid))
+        return results
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+
+# Baseline comparison
+
+def regressions(results, baseline, tolerance):
+    found = []
+    for mode, sizes in results.items():
+        for size, routes in sizes.items():
+            for name, result in routes.items():
+                base = baseline.get(mode, {}).get(size, {}).get(name)
+                if not base:
+                    continue
+                if result['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+                    found.append(f"{mode} {size} {name}: p95 {base['p95_ms']}ms -> {result['p95_ms']}ms")
+                if result['rps'] < base['rps'] / (1 + tolerance):
+                    found.append(f"{mode} {size} {name}: {base['rps']} -> {result['rps']} requests/s")
+                if result['rss_mb'] and base.get('rss_mb') and result['rss_mb'] > base['rss_mb'] * (1 + tolerance):
+                    found.append(f"{mode} {size} {name}: peak RSS {base['rss_mb']}MB -> {result['rss_mb']}MB")
+    return found
+
+
+def change(value, base):
+    if not base:
+        return ''
+    return f'{(value - base) / base:+.0%}'
+
+
+def report(mode, size, results, baseline):
+    click.echo(f"\n{mode}, {int(size):,} recipes")
+    click.echo(f"{'route':<18} {'requests':>8} {'errors':>6} {'p50':>9} {'p95':>9} {'p99':>9} "
+               f"{'req/s':>8} {'peak RSS':>9} {'p95 vs baseline':>16}")
+    for name, result in results.items():
+        base = baseline.get(mode, {}).get(size, {}).get(name, {})
+        rss = f"{result['rss_mb']:.0f}MB" if result['rss_mb'] else 'n/a'
+        click.echo(f"{name:<18} {result['requests']:>8} {result['errors']:>6} {result['p50_ms']:>7.1f}ms "
+                   f"{result['p95_ms']:>7.1f}ms {result['p99_ms']:>7.1f}ms {result['rps']:>8.1f} {rss:>9} "
+                   f"{change(result['p95_ms'], base.get('p95_ms')):>16}")
+
+
+@click.command()
+@click.option('--sizes', default='1000,10000,100000', show_default=True, help='Catalog sizes, comma-separated.')
+@click.option('--routes', 'route_names', default=','.join(ROUTES), show_default=True,
+              help='Routes to run, comma-separated.')
+@click.option('--server', is_flag=True, help='Load a local gunicorn over HTTP instead of using the test client.')
+@click.option('--workers', default=2, show_default=True, help='gunicorn worker processes (with --server).')
+@click.option('--concurrency', default=8, show_default=True, help='Concurrent clients (with --server).')
+@click.option('--requests', 'max_requests', default=200, show_default=True,
+              help='Most requests per route with the test client.')
+@click.option('--seconds', default=10.0, show_default=True, help='Time per route.')
+@click.option('--warmup', default=3, show_default=True, help='Unmeasured requests per route first.')
+@click.option('--data-dir', default=os.path.join(ROOT, 'cache', 'benchmarks'), show_default=True,
+              help='Where generated catalogs are kept between runs.')
+@click.option('--baseline', 'baseline_path', default=BASELINE, show_default=True, type=click.Path(dir_okay=False))
+@click.option('--save-baseline', is_flag=True, help='Store these results as the baseline.')
+@click.option('--compare', is_flag=True, help='Exit with an error if a route regressed against the baseline.')
+@click.option('--tolerance', default=0.25, show_default=True,
+              help='Allowed slowdown before --compare fails (0.25 = 25%).')
+@click.option('--output', type=click.Path(dir_okay=False), help='Also write the results to this JSON file.')
+def main(sizes, route_names, server, workers, concurrency, max_requests, seconds, warmup, data_dir,
+         baseline_path, save_baseline, compare, tolerance, output):
+    """Benchmark every page against synthetic catalogs of each size."""
+    routes = [name.strip() for name in route_names.split(',') if name.strip()]
+    unknown = sorted(set(routes) - set(ROUTES))
+    if unknown:
+        raise click.BadParameter(f"unknown routes {', '.join(unknown)}; choose from {', '.join(ROUTES)}")
+    if server:
+        try:
+            import gunicorn
+        except ImportError:
+            raise click.ClickException("--server needs gunicorn: pip install gunicorn")
+        click.echo(f"gunicorn {gunicorn.__version__}, {workers} workers, {concurrency} concurrent clients")
+    mode = f'gunicorn-w{workers}-c{concurrency}' if server else 'test-client'
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as file:
+            baseline = json.load(file)
+
+    results = {mode: {}}
+    for size in [int(size) for size in sizes.split(',')]:
+        ensure_catalog(data_dir, size)
+        if server:
+            size_results = server_run(data_dir, size, routes, workers, concurrency, seconds, warmup)
+        else:
+            run_dir = tempfile.mkdtemp(prefix='bench-routes-')
+            worker = python(f'client_run({size}, {routes!r}, {max_requests}, {seconds}, {warmup})',
+                            environment(data_dir, size, run_dir), run_dir)
+            size_results = last_json(worker, f"Benchmarking {size:,} recipes")
+            shutil.rmtree(run_dir, ignore_errors=True)
+        results[mode][str(size)] = size_results
+        report(mode, str(size), size_results, baseline)
+
+    if output:
+        with open(output, 'w') as file:
+            json.dump(results, file, indent=2)
+    if save_baseline:
+        for size, size_results in results[mode].items():
+            baseline.setdefault(mode, {}).setdefault(size, {}).update(size_results)
+        with open(baseline_path, 'w') as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+            file.write('\n')
+        click.echo(f"\nSaved the baseline to {baseline_path}")
+    if compare:
+        found = regressions(results, baseline, tolerance)
+        if found:
+            raise click.ClickException('regressions against the baseline:\n  ' + '\n  '.join(found))
+        click.echo(f"\nNo regressions beyond {tolerance:.0%} of the baseline")
+
+
+if __name__ == '__main__':
+    main()
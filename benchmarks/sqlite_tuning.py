@@ -0,0 +1,129 @@
+"""Compare request throughput with the stock SQLite settings and the tuned profile.
+
+Each profile gets its own database. Reader processes run the queries behind a recipe page
+while one writer process keeps saving recipe edits, like gunicorn workers sharing the
+database file: the pattern that stalls readers without WAL.
+
+    python benchmarks/sqlite_tuning.py --seconds 10 --readers 4
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Environment for each profile; anything not set uses the app's defaults
+PROFILES = {
+    'stock': {
+        'SQLITE_JOURNAL_MODE': 'DELETE',
+        'SQLITE_SYNCHRONOUS': 'FULL',
+        'SQLITE_CACHE_SIZE': '2000',
+        'SQLITE_MMAP_SIZE': '0',
+    },
+    'tuned': {},
+}
+
+
+def load_app():
+    sys.path.insert(0, ROOT)
+    from app import app
+    from extensions import limiter
+    app.config['RATELIMIT_ENABLED'] = False
+    limiter.enabled = False
+    return app
+
+
+# Worker entry points; each runs in its own interpreter with the profile's environment
+
+def seed(recipes):
+    app = load_app()
+    from catalog import import_recipes, init_db
+    from recipe_io import read_ndjson
+    with app.app_context():
+        init_db()
+        lines = (json.dumps({'title': f'Recipe {i}', 'prep_time': 5, 'cook_time': 10,
+                             'ingredients': f'{i % 50} cups flour, egg, salt', 'instructions': 'Mix and bake.'})
+                 for i in range(recipes))
+        import_recipes(read_ndjson(lines), collect_ids=False)
+
+
+# Readers load what a recipe page shows; the writer saves one recipe edit per transaction
+def work(role, offset, recipes, start, deadline):
+    app = load_app()
+    from catalog import sync_ingredients
+    from models import db, Recipe
+    from queries import recipe_with_details
+    done = errors = 0
+    timings = []
+    recipe_id = offset
+    with app.test_request_context():
+        time.sleep(max(0, start - time.time()))
+        while time.time() < deadline:
+            recipe_id = recipe_id % recipes + 1
+            began = time.perf_counter()
+            try:
+                if role == 'reader':
+                    recipe_with_details(recipe_id)
+                else:
+                    recipe = db.session.get(Recipe, recipe_id)
+                    recipe.notes = f'Edited at {time.time()}'
+                    sync_ingredients(recipe)
+                db.session.commit()
+                done += 1
+                timings.append(time.perf_counter() - began)
+            except Exception:
+                db.session.rollback()
+                errors += 1
+            db.session.expunge_all()
+            recipe_id += 7
+    timings.sort()
+    slowest = timings[int(len(timings) * 0.99)] if timings else 0
+    print(json.dumps({'done': done, 'errors': errors, 'p99_ms': slowest * 1000}))
+
+
+def python(code, env, workdir, **kwargs):
+    code = f'import sys; sys.path.insert(0, {ROOT!r}); from benchmarks.sqlite_tuning import *; {code}'
+    return subprocess.Popen([sys.executable, '-c', code], env=env, cwd=workdir,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, **kwargs)
+
+
+@click.command()
+@click.option('--recipes', default=2000, show_default=True, help='Recipes in the test database.')
+@click.option('--readers', default=4, show_default=True, help='Processes fetching recipe pages.')
+@click.option('--seconds', default=5, show_default=True, help='Duration of each run.')
+def main(recipes, readers, seconds):
+    """Benchmark the stock and tuned SQLite profiles."""
+    click.echo(f"{recipes} recipes, {readers} reader processes + 1 writer, {seconds}s per profile")
+    click.echo(f"{'profile':<8} {'reads/s':>10} {'writes/s':>10} {'read p99':>10} {'write p99':>10} {'errors':>7}")
+    for name, settings in PROFILES.items():
+        workdir = tempfile.mkdtemp(prefix=f'bench-{name}-')
+        env = dict(os.environ, **settings,
+                   DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'recipes.db')}",
+                   UPLOAD_FOLDER=os.path.join(workdir, 'uploads'),
+                   READ_CACHE_BACKEND='none',
+                   FLASK_ENV='production')
+        if python(f'seed({recipes})', env, workdir).wait() != 0:
+            raise click.ClickException(f"Seeding the {name} database failed")
+
+        start = time.time() + 5  # Give every worker time to import the app first
+        window = f'{recipes}, {start}, {start + seconds}'
+        workers = [python(f"work('reader', {n}, {window})", env, workdir) for n in range(readers)]
+        workers.append(python(f"work('writer', 0, {window})", env, workdir))
+        results = []
+        for worker in workers:
+            output, _ = worker.communicate()
+            results.append(json.loads(output.strip().splitlines()[-1]))
+        reads = sum(result['done'] for result in results[:-1])
+        errors = sum(result['errors'] for result in results)
+        read_p99 = max(result['p99_ms'] for result in results[:-1])
+        click.echo(f"{name:<8} {reads / seconds:>10.0f} {results[-1]['done'] / seconds:>10.0f} "
+                   f"{read_p99:>8.1f}ms {results[-1]['p99_ms']:>8.1f}ms {errors:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Time a worker's cold start: importing the app, then the first request to each kind of page.
+
+Every boot is a fresh interpreter, as a new gunicorn worker would be, against a small seeded
+database. The profiles compare compiling templates on first use, compiling them all at
+startup, and loading them from the bytecode cache an earlier boot wrote. The report also
+says whether the heavy optional libraries (NumPy, FPDF, Pillow) were loaded by the import.
+
+    python benchmarks/startup.py --runs 5
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import click
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# First request to each, in this order; later ones reuse what earlier ones loaded (the connection pool)
+ROUTES = {
+    'home': '/',
+    'recipe': '/recipe/1',
+    'scaled': '/api/v1/recipes/1/scale?factor=2',
+    'pdf': '/generate_pdf/1',
+}
+HEAVY_MODULES = ['numpy', 'fpdf', 'PIL.Image']
+
+# Environment for each profile; anything not set uses the app's defaults
+PROFILES = {
+    'compile on first use': {'TEMPLATE_CACHE_DIR': '', 'TEMPLATE_PRELOAD': 'false'},
+    'compile at startup': {'TEMPLATE_CACHE_DIR': '', 'TEMPLATE_PRELOAD': 'true'},
+    'bytecode cache': {},
+}
+
+
+# Worker entry points; each runs in its own interpreter with the profile's environment
+
+def seed(recipes):
+    sys.path.insert(0, ROOT)
+    from app import app
+    from catalog import import_recipes, init_db
+    from recipe_io import read_ndjson
+    with app.app_context():
+        init_db()
+        lines = (json.dumps({'title': f'Recipe {i}', 'prep_time': 5, 'cook_time': 10,
+                             'ingredients': f'{i % 50 + 1} cups flour, 2 eggs, salt', 'instructions': 'Mix and bake.'})
+                 for i in range(recipes))
+        summary = import_recipes(read_ndjson(lines), collect_ids=False)
+    print(json.dumps({'created': summary['created']}))
+
+
+def boot(routes):
+    started = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    from app import app
+    import_ms = (time.perf_counter() - started) * 1000
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    client = app.test_client()
+    first_ms = {}
+    for name in routes:
+        began = time.perf_counter()
+        response = client.get(ROUTES[name])
+        response.get_data()
+        if response.status_code != 200:
+            raise SystemExit(f'{ROUTES[name]} answered {response.status_code}')
+        first_ms[name] = (time.perf_counter() - began) * 1000
+    print(json.dumps({'import_ms': import_ms, 'first_ms': first_ms, 'loaded': loaded}))
+
+
+# A first boot after a deploy: also waits for the static files to be precompressed, which
+# would otherwise be cut short when the interpreter exits and redone by every timed boot
+def warm(routes):
+    boot(routes)
+    for thread in threading.enumerate():
+        if thread.name == 'static-precompress':
+            thread.join()
+
+
+def python(code, env, workdir):
+    code = f'import sys; sys.path.insert(0, {ROOT!r}); from benchmarks.startup import *; {code}'
+    process = subprocess.run([sys.executable, '-c', code], env=env, cwd=workdir,
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    if process.returncode != 0 or not process.stdout.strip():
+        raise click.ClickException(f"{code} failed (exit code {process.returncode})")
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+@click.command()
+@click.option('--runs', default=5, show_default=True, help='Boots per profile; the report gives medians.')
+@click.option('--recipes', default=200, show_default=True, help='Recipes in the test database.')
+def main(runs, recipes):
+    """Benchmark importing the app and its first requests."""
+    workdir = tempfile.mkdtemp(prefix='bench-startup-')
+    base = dict(os.environ,
+                DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'recipes.db')}",
+                UPLOAD_FOLDER=os.path.join(workdir, 'uploads'),
+                RATELIMIT_ENABLED='false',
+                FLASK_ENV='production')
+    python(f'seed({recipes})', base, workdir)
+    python(f'warm({list(ROUTES)!r})', base, workdir)  # Writes the template cache and static copies
+
+    click.echo(f"{runs} boots per profile, {recipes} recipes; medians in ms")
+    click.echo(f"{'profile':<22} {'import':>8} " + ' '.join(f"{'first ' + name:>14}" for name in ROUTES)
+               + "  loaded by the import")
+    for name, settings in PROFILES.items():
+        results = [python(f'boot({list(ROUTES)!r})', dict(base, **settings), workdir) for _ in range(runs)]
+        import_ms = statistics.median(result['import_ms'] for result in results)
+        first_ms = [statistics.median(result['first_ms'][route] for result in results) for route in ROUTES]
+        loaded = ', '.join(sorted({module for result in results for module in result['loaded']})) or 'none'
+        click.echo(f"{name:<22} {import_ms:>8.0f} " + ' '.join(f"{ms:>14.1f}" for ms in first_ms) + f"  {loaded}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import glob
+import hashlib
+import os
+import tempfile
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+# Content-addressed file store: each distinct file is kept once, named by its SHA-256.
+# Layout: <root>/<h[:2]>/<h[2:4]>/<h>.<extension>
+class BlobStore:
+    def __init__(self, root):
+        self.root = root
+
+    def path_for(self, digest, extension):
+        return os.path.join(self.root, digest[:2], digest[2:4], f'{digest}.{extension}').replace('\\', '/')
+
+    # Stream a file object to disk in chunks, hashing as it goes.
+    # Returns (digest, path, size); `path` is the existing copy when the content is already stored.
+    def save(self, stream, extension, existing_path=None):
+        os.makedirs(self.root, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    file.write(chunk)
+                    size += len(chunk)
+            digest = digest.hexdigest()
+            path = existing_path(digest) if existing_path else None
+            path = path or self.path_for(digest, extension)
+            if os.path.exists(path):
+                os.remove(tmp_path)  # Duplicate upload: keep the stored copy
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest, path, size
+
+    # Remove a blob and any files derived from it (named "<digest>-*" in `derived_dir`)
+    def delete(self, path, digest, derived_dir=None):
+        paths = [path]
+        if derived_dir:
+            paths += glob.glob(os.path.join(glob.escape(derived_dir), f'{digest}-*'))
+        for file_path in paths:
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,361 @@
+import base64
+import hashlib
+import json
+from datetime import datetime
+
+from flask import current_app
+
+import migrations
+from extensions import image_processor, pdf_cache, read_cache, search_index, typeahead
+from forms import recipe_validator
+from ingredients import UNIT_NAMES, split_ingredients, ingredient_name, parse_ingredient
+from models import db, Recipe, RecipeImage, ImageBlob, Ingredient, IngredientWord, RecipeIngredient
+from photos import adopt_legacy_images, collect_image_garbage, remove_legacy_image_files
+from queries import (newest_first, older_than, recent_recipes, recipe_card_query, recipe_cards, ranked_recipe_cards,
+                     recipe_with_details, recipes_with_ingredients)
+from recipe_io import EXPORT_FIELDS, DATE_FORMAT, created_at_for, validate_recipe, ndjson_line
+from search_index import tokenize
+
+
+# Reading and writing recipes: ingredient parsing, bulk import and export, cached page data,
+# prices. Shared by the blueprints, the API and the command line; everything here runs in
+# an app context.
+
+# Read cache keys of the home page, and of each recipe's page
+HOME_CACHE_KEYS = ['recipes:summary', 'recipes:first-page']
+
+def recipe_cache_keys(recipe_id):
+    return [f'recipe:{recipe_id}', f'fragment:recipe:{recipe_id}']
+
+# Create or upgrade the schema, then build the search and typeahead indexes
+def init_db():
+    migrations.upgrade(db, current_app.logger)
+    backfill_ingredients()
+    adopt_legacy_images()
+    search_index.ensure()
+    typeahead.ensure()
+    read_cache.clear()  # A shared cache may hold pages from before a restore or migration
+
+# Replace a recipe's normalized ingredient rows with those parsed from its ingredients text
+def sync_ingredients(recipe):
+    lines = split_ingredients(recipe.ingredients)
+    parsed = {line: parse_ingredient(line) for line in lines}
+    names = {line: name for line, (*_, name) in parsed.items()}
+    existing = {}
+    if names:
+        existing = {ingredient.name: ingredient for ingredient in
+                    Ingredient.query.filter(Ingredient.name.in_(set(names.values())))}
+    recipe.ingredient_lines.clear()
+    db.session.flush()  # Free the (recipe_id, position) keys before re-adding lines
+    for position, line in enumerate(lines):
+        quantity, quantity_max, unit, name = parsed[line]
+        if name not in existing:
+            existing[name] = Ingredient(name=name, words=[IngredientWord(word=word) for word in set(tokenize(name))])
+            db.session.add(existing[name])
+        recipe.ingredient_lines.append(
+            RecipeIngredient(position=position, ingredient=existing[name], text=line,
+                             quantity=quantity, quantity_max=quantity_max, unit=unit)
+        )
+
+# Parse ingredients for recipes saved before the normalized tables existed
+def backfill_ingredients(batch_size=500):
+    has_lines = db.exists().where(RecipeIngredient.recipe_id == Recipe.id)
+    pending = Recipe.query.filter(Recipe.ingredients.isnot(None), ~has_lines)
+    total = 0
+    while True:
+        recipes = pending.order_by(Recipe.id).limit(batch_size).all()
+        recipes = [recipe for recipe in recipes if split_ingredients(recipe.ingredients)]
+        if not recipes:
+            break
+        for recipe in recipes:
+            sync_ingredients(recipe)
+        db.session.commit()
+        total += len(recipes)
+    if total:
+        current_app.logger.info('Backfilled ingredients for %s recipes', total)
+    return total
+
+# Insert validated recipes with multi-row statements instead of one ORM flush per recipe.
+# `photos` optionally gives each recipe a list of stored (blob hash, path) pairs.
+# Returns the new ids in order. Bulk inserts skip ORM events, so the search index and
+# photo reference counts are updated here.
+def insert_recipes(rows, photos=None):
+    now = datetime.now()
+    rows = [{'date': now.strftime(DATE_FORMAT), **row} for row in rows]
+    rows = [{**row, 'created_at': created_at_for(row['date'], now), 'updated_at': now} for row in rows]
+    recipe_ids = db.session.scalars(
+        db.insert(Recipe).returning(Recipe.id, sort_by_parameter_order=True), rows).all()
+
+    lines = [(recipe_id, position, line, parse_ingredient(line))
+             for recipe_id, row in zip(recipe_ids, rows)
+             for position, line in enumerate(split_ingredients(row['ingredients']))]
+    names = {name for *_, (*_, name) in lines}
+    ingredient_ids = {}
+    if names:
+        ingredient_ids = dict(db.session.query(Ingredient.name, Ingredient.id).filter(Ingredient.name.in_(names)).all())
+    new_names = sorted(names - set(ingredient_ids))
+    if new_names:
+        new_ids = db.session.scalars(db.insert(Ingredient).returning(Ingredient.id, sort_by_parameter_order=True),
+                                     [{'name': name} for name in new_names]).all()
+        ingredient_ids.update(zip(new_names, new_ids))
+        words = [{'word': word, 'ingredient_id': ingredient_ids[name]}
+                 for name in new_names for word in set(tokenize(name))]
+        if words:
+            db.session.execute(db.insert(IngredientWord), words)
+    if lines:
+        db.session.execute(db.insert(RecipeIngredient), [
+            {'recipe_id': recipe_id, 'position': position, 'ingredient_id': ingredient_ids[name], 'text': line,
+             'quantity': quantity, 'quantity_max': quantity_max, 'unit': unit}
+            for recipe_id, position, line, (quantity, quantity_max, unit, name) in lines
+        ])
+
+    images = [{'recipe_id': recipe_id, 'image_path': path, 'blob_hash': blob_hash, 'status': 'pending'}
+              for recipe_id, recipe_photos in zip(recipe_ids, photos or []) for blob_hash, path in recipe_photos]
+    if images:
+        db.session.execute(db.insert(RecipeImage), images)
+        references = {}
+        for image in images:
+            references[image['blob_hash']] = references.get(image['blob_hash'], 0) + 1
+        blobs = ImageBlob.__table__
+        db.session.execute(
+            blobs.update().where(blobs.c.hash == db.bindparam('blob')).values(
+                refcount=blobs.c.refcount + db.bindparam('added'), released_at=None),
+            [{'blob': blob_hash, 'added': added} for blob_hash, added in references.items()])
+    search_index.record_bulk_insert(db.session, zip(recipe_ids, rows))
+    typeahead.record_bulk_insert(db.session, recipes=[(recipe_id, row['title']) for recipe_id, row in zip(recipe_ids, rows)],
+                                 ingredients=[(ingredient_ids[name], name) for name in new_names])
+    return recipe_ids
+
+# Validate and insert recipes, committing a batch at a time.
+# `records` yields (line number, recipe dict, parse error) as read_ndjson() does. With `images`
+# (archive name -> stored (blob hash, path)), each recipe's 'images' list is attached as photos.
+# A batch that fails to insert is retried row by row so only the bad rows are rejected.
+# `progress(summary)` is called after each batch.
+# Returns {'created', 'failed', 'ids', 'errors': [{'line', 'errors'}]}; ids only with collect_ids.
+def import_recipes(records, batch_size=None, images=None, progress=None, collect_ids=True):
+    batch_size = batch_size or current_app.config['IMPORT_BATCH_SIZE']
+    summary = {'created': 0, 'failed': 0, 'ids': [], 'errors': []}
+
+    def reject(number, errors):
+        summary['failed'] += 1
+        summary['errors'].append({'line': number, 'errors': errors})
+
+    def insert(batch):
+        try:
+            recipe_ids = insert_recipes([values for _, values, _ in batch], [photos for _, _, photos in batch])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) == 1:
+                reject(batch[0][0], {'recipe': [str(e)]})
+                return
+            current_app.logger.warning('Import batch failed, retrying row by row: %s', e)
+            for row in batch:
+                insert([row])
+            return
+        summary['created'] += len(batch)
+        if collect_ids:
+            summary['ids'] += recipe_ids
+
+    validator = recipe_validator()
+    batch = []
+    for number, data, error in records:
+        photos = []
+        if images is not None and isinstance(data, dict):
+            photos = [images[name] for name in data.pop('images', None) or [] if name in images]
+        values, errors = (None, {'recipe': [error]}) if error else validate_recipe(data, validator)
+        if errors:
+            reject(number, errors)
+            continue
+        batch.append((number, values, photos))
+        if len(batch) >= batch_size:
+            insert(batch)
+            batch = []
+            if progress:
+                progress(summary)
+    if batch:
+        insert(batch)
+        if progress:
+            progress(summary)
+    if summary['created']:
+        read_cache.delete(*HOME_CACHE_KEYS)
+        current_app.logger.info('Imported %s recipes (%s rejected)', summary['created'], summary['failed'])
+    return summary
+
+# All recipes as NDJSON lines, read from the database in chunks
+def export_recipes():
+    columns = [getattr(Recipe, field) for field in EXPORT_FIELDS]
+    result = db.session.execute(db.select(*columns).order_by(Recipe.id).execution_options(yield_per=1000))
+    for row in result:
+        yield ndjson_line(dict(row._mapping))
+
+# Content version of a recipe: changes whenever anything shown in its PDF changes
+def recipe_version(recipe):
+    fields = (recipe.title, recipe.author, recipe.date, recipe.prep_time, recipe.cook_time,
+              recipe.ingredients, recipe.instructions, recipe.variations, recipe.notes)
+    return hashlib.sha256(json.dumps(fields).encode()).hexdigest()[:32]
+
+# Opaque pagination cursors: [offset] for searches, [created_at, id] when browsing
+def encode_cursor(*values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+# The values of a cursor, one per type in `types` (int, str, or datetime for an ISO 8601
+# string), or None when it is missing or not of that shape. Clients can send any string,
+# so nothing else is trusted.
+def decode_cursor(cursor, *types):
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        return None
+    if not isinstance(values, list) or len(values) != len(types):
+        return None
+    decoded = []
+    for value, kind in zip(values, types):
+        if kind is datetime:
+            if not isinstance(value, str):
+                return None
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                return None
+        elif type(value) is not kind:  # Not isinstance: True is an int
+            return None
+        elif kind is int and not 0 <= value < 2 ** 63:  # What SQLite and list offsets accept
+            return None
+        decoded.append(value)
+    return decoded
+
+# Ids matching a keyword (ranked) and/or an ingredient filter
+def search_recipe_ids(keyword=None, ingredient=None):
+    if not keyword:
+        return recipes_with_ingredients(ingredient)
+    recipe_ids = search_index.search(keyword=keyword)
+    if ingredient:
+        with_ingredients = set(recipes_with_ingredients(ingredient))
+        recipe_ids = [recipe_id for recipe_id in recipe_ids if recipe_id in with_ingredients]
+    return recipe_ids
+
+# One page of recipe cards.
+# Searches page through the ranked matches; browsing uses a keyset on (created_at, id).
+# Returns (cards, next_cursor, total_matches), where total_matches is None when browsing.
+def recipe_page(keyword=None, ingredient=None, cursor=None, page_size=None):
+    page_size = page_size or current_app.config['RECIPES_PER_PAGE']
+
+    if keyword or ingredient:
+        recipe_ids = search_recipe_ids(keyword, ingredient)
+        position = decode_cursor(cursor, int)
+        start = position[0] if position else 0
+        end = start + page_size
+        next_cursor = encode_cursor(end) if end < len(recipe_ids) else None
+        return ranked_recipe_cards(recipe_ids[start:end]), next_cursor, len(recipe_ids)
+
+    query = recipe_card_query()
+    position = decode_cursor(cursor, datetime, int)
+    if position:
+        query = query.filter(older_than(*position))
+    page_query = query.order_by(*newest_first()).limit(page_size + 1)
+    cards = recipe_cards(page_query, order=lambda page: newest_first(page.c.created_at, page.c.id))
+    next_cursor = None
+    if len(cards) > page_size:
+        cards = cards[:page_size]
+        next_cursor = encode_cursor(cards[-1]['created_at'].isoformat(), cards[-1]['id'])
+    return cards, next_cursor, None
+
+# Recipe total and the newest recipes for the sidebar (cached)
+RECENTLY_ADDED = 10
+
+def home_summary(limit):
+    def load():
+        total, rows = recent_recipes(RECENTLY_ADDED)
+        return total, [{'id': row.id, 'title': row.title, 'date': row.date} for row in rows]
+    total, recently_added = read_cache.get_or_set('recipes:summary', load)
+    return total, recently_added[:limit]
+
+# Plain data for a recipe page (cached): its columns, ingredient lines and images; 404 if missing
+def recipe_details(recipe_id):
+    def load():
+        recipe = recipe_with_details(recipe_id)
+        details = {column.name: getattr(recipe, column.name) for column in Recipe.__table__.columns}
+        details['ingredients_list'] = [line.text for line in recipe.ingredient_lines]
+        details['images'] = [{
+            'id': image.id,
+            'image_path': image.image_path,
+            'thumbnail_path': image.thumbnail_path,
+            'variants': image.variants
+        } for image in recipe.images]
+        return details
+    return read_cache.get_or_set(f'recipe:{recipe_id}', load)
+
+# Scale factor from `factor`, or from `covers` (the portions wanted) over `servings` (what the
+# recipe makes as written, 1 if not given); None when neither is given or it is out of range
+def scale_factor(values):
+    try:
+        if values.get('factor') not in (None, ''):
+            factor = float(values['factor'])
+        elif values.get('covers') not in (None, ''):
+            factor = float(values['covers']) / float(values.get('servings') or 1)
+        else:
+            return None
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return factor if 0 < factor <= current_app.config['MAX_SCALE_FACTOR'] else None
+
+# Delete a recipe with its photos and cached PDF
+def remove_recipe(recipe):
+    for image in recipe.images:
+        remove_legacy_image_files(image)
+    db.session.delete(recipe)
+    db.session.commit()
+    image_processor.defer(collect_image_garbage)
+    pdf_cache.invalidate(recipe.id)
+
+# A price or calorie figure from a price list: None if blank, else a number of at least 0
+def price_figure(value):
+    value = (value or '').strip()
+    if not value:
+        return None
+    number = float(value)
+    if not 0 <= number < float('inf'):
+        raise ValueError(value)
+    return number
+
+# Set ingredient prices and calories from price list rows, dicts with 'name', 'unit', 'price' and
+# 'calories': the cost and kcal of one unit ('each' for items counted as they are, like eggs).
+# Names are matched as ingredient lines are, so "Tomatoes" prices "2 cups tomatoes"; ingredients
+# no recipe uses yet are added for recipes saved later. Commits a batch of ingredients at a time.
+# Returns (ingredients priced, [{'line', 'errors'}]).
+def import_prices(rows, batch_size=500):
+    prices, errors = {}, []
+    for line, row in rows:
+        problems = []
+        name = ingredient_name(row.get('name') or '')
+        if not name:
+            problems.append('Give the ingredient name.')
+        unit = (row.get('unit') or 'each').strip().lower()
+        unit = 'each' if unit == 'each' else UNIT_NAMES.get(unit)
+        if unit is None:
+            problems.append(f"Unknown unit {row.get('unit')!r}.")
+        figures = []
+        for field in ('price', 'calories'):
+            try:
+                figures.append(price_figure(row.get(field)))
+            except ValueError:
+                problems.append(f'The {field} must be a number of at least 0.')
+        if problems:
+            errors.append({'line': line, 'errors': problems})
+        else:
+            prices[name] = (figures[0], unit, figures[1])
+    names = list(prices)
+    for start in range(0, len(names), batch_size):
+        batch = names[start:start + batch_size]
+        existing = {ingredient.name: ingredient for ingredient in Ingredient.query.filter(Ingredient.name.in_(batch))}
+        for name in batch:
+            ingredient = existing.get(name)
+            if ingredient is None:
+                ingredient = Ingredient(name=name, words=[IngredientWord(word=word) for word in set(tokenize(name))])
+                db.session.add(ingredient)
+            ingredient.price, ingredient.price_unit, ingredient.calories = prices[name]
+        db.session.commit()
+    return len(prices), errors
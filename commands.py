@@ -0,0 +1,180 @@
+import csv
+import os
+import time
+
+import click
+from flask.cli import with_appcontext
+
+import migrations
+from catalog import import_prices, import_recipes, init_db
+from extensions import image_processor
+from models import db, Recipe, RecipeImage, ImageBlob
+from pdf_views import menu_recipe_ids, parse_ids, stream_menu_zip
+from photos import collect_image_garbage, store_blob
+from queries import id_list
+from recipe_io import EXPORT_FIELDS, archive_image_name, ndjson_line, read_archive, read_ndjson, write_archive
+
+
+# Commands for `flask --app app ...`, added to the app's CLI by create_app()
+
+@click.command('export-menu')
+@with_appcontext
+@click.argument('output', type=click.Path(dir_okay=False, writable=True))
+@click.option('--ids', help='Comma-separated recipe ids, in menu order.')
+@click.option('--keyword', help='Export recipes matching a keyword search.')
+@click.option('--ingredient', help='Export recipes containing these comma-separated ingredients.')
+@click.option('--limit', type=int, help='Maximum number of recipes (default MENU_EXPORT_MAX_RECIPES).')
+def export_menu_command(output, ids, keyword, ingredient, limit):
+    """Write recipe PDFs to a ZIP file."""
+    recipe_ids = menu_recipe_ids(ids=parse_ids(ids), keyword=keyword, ingredient=ingredient, limit=limit)
+    with open(output, 'wb') as file:
+        for chunk in stream_menu_zip(recipe_ids):
+            file.write(chunk)
+    click.echo(f"Exported {len(recipe_ids)} recipes to {output}")
+
+@click.command('process-images')
+@with_appcontext
+@click.option('--all', 'reprocess_all', is_flag=True, help='Regenerate variants for every image.')
+def process_images_command(reprocess_all):
+    """Generate thumbnails and size variants for uploaded images."""
+    query = db.session.query(RecipeImage.id)
+    if not reprocess_all:
+        query = query.filter(db.or_(RecipeImage.status.is_(None), RecipeImage.status.in_(['pending', 'failed'])))
+    image_ids = [row.id for row in query.order_by(RecipeImage.id)]
+    with click.progressbar(image_ids, label='Processing images') as bar:
+        for image_id in bar:
+            image_processor.run(image_id)
+    click.echo(f"Processed {len(image_ids)} images")
+
+@click.command('gc-images')
+@with_appcontext
+@click.option('--grace', type=int, help='Only delete photos unreferenced for this many seconds.')
+def gc_images_command(grace):
+    """Delete stored photos that no recipe uses any more."""
+    click.echo(f"Removed {collect_image_garbage(grace)} unreferenced photos")
+
+@click.command('upgrade-db')
+@with_appcontext
+@click.option('--status', is_flag=True, help='Only list the schema revisions not yet applied.')
+def upgrade_db_command(status):
+    """Create missing tables and apply pending schema revisions."""
+    if status:
+        pending = migrations.pending(db.engine)
+        for number, description in pending:
+            click.echo(f"Pending revision {number}: {description}")
+        click.echo(f"{len(pending)} pending; latest revision is {migrations.latest_revision()}")
+        return
+    init_db()
+    with db.engine.connect() as connection:
+        click.echo(f"Database is at schema revision {migrations.current_revision(connection)}")
+
+@click.command('import-prices')
+@with_appcontext
+@click.argument('price_list', type=click.File('r', encoding='utf-8-sig'))
+def import_prices_command(price_list):
+    """Set ingredient prices and calories from a CSV price list.
+
+    The columns are name, unit, price and calories, for one of that unit: "tomato,kg,3.20,180".
+    """
+    reader = csv.DictReader(price_list)
+    priced, errors = import_prices((reader.line_num, row) for row in reader)
+    for error in errors:
+        click.echo(f"Line {error['line']}: {' '.join(error['errors'])}", err=True)
+    click.echo(f"Priced {priced} ingredients")
+
+# Photo files for a backup archive: each stored blob once, plus uploads from before blobs existed
+def archive_image_files():
+    for digest, path in db.session.query(ImageBlob.hash, ImageBlob.path).filter(ImageBlob.refcount > 0):
+        yield archive_image_name(digest, path, None), path
+    legacy = db.session.query(RecipeImage.id, RecipeImage.image_path).filter(RecipeImage.blob_hash.is_(None))
+    for image_id, path in legacy:
+        yield archive_image_name(None, path, image_id), path
+
+# Recipe lines for a backup archive, with the archive names of their photos, a chunk of recipes at a time
+def archive_recipe_lines(chunk_size=1000):
+    columns = [getattr(Recipe, field) for field in EXPORT_FIELDS]
+    result = db.session.execute(db.select(*columns).order_by(Recipe.id).execution_options(yield_per=chunk_size))
+    for rows in result.partitions():
+        photos = {}
+        images = db.session.query(RecipeImage.id, RecipeImage.recipe_id, RecipeImage.blob_hash, RecipeImage.image_path)
+        for image in images.filter(RecipeImage.recipe_id.in_(id_list(row.id for row in rows))).order_by(RecipeImage.id):
+            photos.setdefault(image.recipe_id, []).append(
+                archive_image_name(image.blob_hash, image.image_path, image.id))
+        for row in rows:
+            yield ndjson_line({**row._mapping, 'images': photos.get(row.id, [])})
+
+def throughput(count, seconds):
+    return f"{count / seconds:,.0f}/s" if seconds > 0 else "n/a"
+
+@click.command('export-recipes')
+@with_appcontext
+@click.argument('output', type=click.Path(dir_okay=False, writable=True))
+def export_recipes_command(output):
+    """Back up every recipe and photo to a .tar.gz archive."""
+    started = time.perf_counter()
+    recipe_count = db.session.query(db.func.count(Recipe.id)).scalar()
+    image_files = list(archive_image_files())
+    missing = [name for name, path in image_files if not os.path.isfile(path)]
+    image_files = [(name, path) for name, path in image_files if os.path.isfile(path)]
+    for name in missing:
+        click.echo(f"Skipping missing photo {name}", err=True)
+
+    with click.progressbar(length=len(image_files) + recipe_count, label='Exporting') as bar:
+        def counted(items):
+            for item in items:
+                bar.update(1)
+                yield item
+        write_archive(output, {'recipes': recipe_count, 'images': len(image_files)},
+                      counted(image_files), counted(archive_recipe_lines()))
+    elapsed = time.perf_counter() - started
+    click.echo(f"Exported {recipe_count} recipes and {len(image_files)} photos to {output} "
+               f"in {elapsed:.1f}s ({throughput(recipe_count, elapsed)} recipes)")
+
+@click.command('import-recipes')
+@with_appcontext
+@click.argument('archive', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', type=int, help='Recipes inserted per transaction.')
+def import_recipes_command(archive, batch_size):
+    """Load recipes and photos from an archive written by export-recipes."""
+    started = time.perf_counter()
+    init_db()  # Create the tables when seeding an empty database
+    items = read_archive(archive)
+    kind, manifest = next(items, (None, None))
+    if kind != 'manifest':
+        raise click.ClickException(f"{archive} is not a recipe archive")
+    click.echo(f"Archive from {manifest['created']}: {manifest['recipes']} recipes, {manifest['images']} photos")
+
+    images = {}  # Archive name -> stored (blob hash, path)
+    item = None
+    with click.progressbar(length=manifest['images'], label='Importing photos') as bar:
+        for item in items:
+            if item[0] != 'image':
+                break
+            _, name, file = item
+            blob = store_blob(file, os.path.splitext(name)[1].lstrip('.'))
+            images[name] = (blob.hash, blob.path)
+            if len(images) % 100 == 0:
+                db.session.commit()
+            bar.update(1)
+    db.session.commit()
+    if item is None or item[0] != 'recipes':
+        raise click.ClickException(f"{archive} has no recipes")
+
+    recipes_started = time.perf_counter()
+    with click.progressbar(length=manifest['recipes'], label='Importing recipes') as bar:
+        def progress(summary):
+            bar.update(summary['created'] + summary['failed'] - bar.pos)
+        summary = import_recipes(read_ndjson(item[1]), batch_size, images=images,
+                                 progress=progress, collect_ids=False)
+    elapsed = time.perf_counter() - started
+    click.echo(f"Imported {summary['created']} recipes and {len(images)} photos in {elapsed:.1f}s "
+               f"({throughput(summary['created'], time.perf_counter() - recipes_started)} recipes)")
+    for error in summary['errors'][:20]:
+        click.echo(f"Line {error['line']}: {error['errors']}", err=True)
+    if summary['failed']:
+        click.echo(f"{summary['failed']} recipes were rejected", err=True)
+    if images:
+        click.echo("Run 'flask process-images' to generate thumbnails for the imported photos")
+
+COMMANDS = [export_menu_command, process_images_command, gc_images_command, upgrade_db_command, import_prices_command,
+            export_recipes_command, import_recipes_command]
@@ -0,0 +1,126 @@
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from database import engine_options
+
+
+# Load environment variables
+load_dotenv()
+
+# Application configuration classes
+class Config:
+    SECRET_KEY = os.getenv('SECRET_KEY', os.urandom(32))  # Use random key if not set
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', f"sqlite:///{Path.cwd() / 'recipes.db'}")
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'static/uploads')
+    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max upload size
+    IMAGE_VARIANT_WIDTHS = (320, 640, 1280)  # Downscaled copies generated for each upload
+    IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))  # Background threads processing uploads
+    IMAGE_GC_GRACE_SECONDS = int(os.getenv('IMAGE_GC_GRACE_SECONDS', 3600))  # Keep unreferenced photos this long
+    IMAGE_CACHE_MAX_AGE = 365 * 24 * 3600  # Stored photos never change, so browsers may keep them for a year
+    # Counters shared by all worker processes on this host (see rate_limit_storage.py)
+    # Flask-Limiter reads the RATELIMIT_* keys when it is bound to the app in create_app()
+    RATELIMIT_STORAGE_URI = os.getenv('RATELIMIT_STORAGE_URL', 'shm://cache/ratelimit.slots')
+    # RATELIMIT_STORAGE_URI = os.getenv('RATELIMIT_STORAGE_URL', 'redis://localhost:6379')
+    # For Redis (limits shared by several hosts), you'll need to install redis:
+    # pip install redis
+    RATELIMIT_DEFAULT = "200 per day; 50 per hour"
+    RATELIMIT_STRATEGY = os.getenv('RATELIMIT_STRATEGY', 'fixed-window')  # or sliding-window-counter
+    RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'true').lower() != 'false'  # Off for load tests
+
+    # Security settings
+    SESSION_COOKIE_SECURE = True  # Only send cookies over HTTPS
+    SESSION_COOKIE_HTTPONLY = True  # Prevent JavaScript access to cookies
+    SESSION_COOKIE_SAMESITE = 'Lax'  # Protect against CSRF
+    PERMANENT_SESSION_LIFETIME = 3600  # Sessions expire after 1 hour
+
+    # Database performance: pooling depends on the backend (see database.py)
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    # SQLite connection pragmas
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))  # Milliseconds
+    SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', 64 * 1024))  # KiB of page cache per connection
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # Bytes of the file memory-mapped
+
+    # Pagination
+    RECIPES_PER_PAGE = int(os.getenv('RECIPES_PER_PAGE', 24))  # Recipe cards per page
+    MAX_RECIPES_PER_PAGE = 100  # Upper bound for the ?per_page= override
+
+    # Rendered PDF cache
+    PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR', 'cache/pdf')
+    PDF_CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_BYTES', 256 * 1024 * 1024))  # On disk, 0 disables
+    PDF_CACHE_MEMORY_BYTES = int(os.getenv('PDF_CACHE_MEMORY_BYTES', 32 * 1024 * 1024))  # In memory
+
+    # Menu (bulk PDF) export
+    MENU_EXPORT_MAX_RECIPES = int(os.getenv('MENU_EXPORT_MAX_RECIPES', 250))
+    PDF_EXPORT_WORKERS = int(os.getenv('PDF_EXPORT_WORKERS', 0)) or None  # Defaults to one per CPU
+
+    # Recipe scaling and costing
+    MENU_COSTING_MAX_RECIPES = int(os.getenv('MENU_COSTING_MAX_RECIPES', 500))  # Recipes in one costed menu
+    MAX_SCALE_FACTOR = 1000  # Largest multiple of a recipe it can be scaled to
+
+    # Read cache for recipe pages and home-page aggregates
+    READ_CACHE_BACKEND = os.getenv('READ_CACHE_BACKEND', 'memory')  # memory, disk (shared by workers) or none
+    READ_CACHE_DIR = os.getenv('READ_CACHE_DIR', 'cache/read')
+    READ_CACHE_TTL = int(os.getenv('READ_CACHE_TTL', 300))  # Seconds; 0 disables
+    READ_CACHE_MAX_ENTRIES = int(os.getenv('READ_CACHE_MAX_ENTRIES', 2048))  # Per worker, memory backend only
+
+    # JSON API bulk import
+    IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 500))  # Recipes inserted per transaction
+    API_IMPORT_MAX_BYTES = int(os.getenv('API_IMPORT_MAX_BYTES', 256 * 1024 * 1024))  # Largest NDJSON upload
+
+    # HTTP caching and compression
+    COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 500))  # Smaller responses are sent as-is
+    STATIC_PRECOMPRESS_DIR = os.getenv('STATIC_PRECOMPRESS_DIR', 'cache/static')  # Compressed copies of static assets
+
+    # Search form suggestions, answered from an in-memory index in each worker
+    TYPEAHEAD_REFRESH_SECONDS = int(os.getenv('TYPEAHEAD_REFRESH_SECONDS', 300))  # Pick up other workers' writes; 0 disables
+
+    # Logging
+    LOG_DIR = os.getenv('LOG_DIR', 'logs')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # json (one object per line) or text
+    LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))  # Rotate the log file at this size
+    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))  # Rotated files kept
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))  # Records waiting for the writer; more are dropped
+    LOG_REQUESTS = os.getenv('LOG_REQUESTS', 'true').lower() != 'false'  # One access record per request
+
+    # Instrumentation
+    SERVER_TIMING = os.getenv('SERVER_TIMING', 'true').lower() != 'false'  # Server-Timing header on responses
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() != 'false'  # Serve /metrics
+    PROFILE_SLOW_REQUESTS_MS = int(os.getenv('PROFILE_SLOW_REQUESTS_MS', 0))  # Profile slower requests; 0 disables
+    PROFILE_INTERVAL_MS = int(os.getenv('PROFILE_INTERVAL_MS', 5))  # Stack sampling interval
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'cache/profiles')
+
+    # Compiled templates: cached on disk so a new worker loads them instead of compiling them again
+    TEMPLATE_CACHE_DIR = os.getenv('TEMPLATE_CACHE_DIR', 'cache/templates')  # Empty disables
+    TEMPLATE_PRELOAD = os.getenv('TEMPLATE_PRELOAD', 'true').lower() != 'false'  # Load them all at startup
+
+    # Most SQL statements a GET of each endpoint should need; in debug mode going over logs a warning
+    QUERY_BUDGETS = {
+        'recipes.index': 2,
+        'search.search': 4,
+        'recipes.more_recipes': 2,
+        'search.suggest': 0,
+        'recipes.view_recipe': 3,  # One more when scaled
+        'recipes.update_recipe': 2,
+        'gallery.photo_gallery': 2,
+        'pdf.generate_pdf': 1,
+        'api.list_recipes': 3,
+        'api.get_recipe': 2,
+        'api.scale_recipe': 1,
+    }
+
+    DEBUG = False
+    ENV = 'production'
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    ENV = 'development'
+
+# Choose configuration based on environment
+def default_config():
+    return DevelopmentConfig() if os.getenv('FLASK_ENV', 'production') == 'development' else Config()
@@ -0,0 +1,144 @@
+from itertools import repeat
+
+import numpy as np
+
+from ingredients import UNIT_SIZES, scale_line
+
+
+# Scaling and costing of recipes from their parsed ingredient lines (see queries.costing_rows).
+# The lines of every recipe asked for, one recipe or a menu of hundreds, are loaded into flat
+# arrays with one entry per line, and each step (scaling, unit conversion, pricing, and the
+# totals per recipe and per ingredient) is one NumPy operation over all of them.
+
+UNIT_CODES = {unit: code for code, unit in enumerate(UNIT_SIZES)}
+DIMENSIONS = list(dict.fromkeys(dimension for dimension, _ in UNIT_SIZES.values()))
+UNIT_DIMENSIONS = np.array([DIMENSIONS.index(dimension) for dimension, _ in UNIT_SIZES.values()], dtype=np.intp)
+UNIT_FACTORS = np.array([size for _, size in UNIT_SIZES.values()])  # Grams, millilitres or items
+EACH = UNIT_CODES['each']
+LINE_FIELDS = ('recipe_id', 'title', 'text', 'quantity', 'quantity_max', 'unit', 'ingredient_id', 'name', 'price',
+               'price_unit', 'calories')
+
+# Units for shopping list totals, largest first: "1.2 kg", but "800 g"
+DISPLAY_UNITS = {'mass': (('kg', 1000.0), ('g', 1.0)), 'volume': (('l', 1000.0), ('ml', 1.0))}
+
+
+def _floats(values):
+    return np.array(values, dtype=float)  # None becomes NaN
+
+
+def _unit_codes(units):
+    return np.fromiter(map(UNIT_CODES.get, units, repeat(EACH)), np.intp, len(units))
+
+
+# Array values as plain floats for JSON and templates, None where unknown
+def _values(array, digits):
+    return [None if value != value else round(value, digits) for value in array.tolist()]
+
+
+def _display_amount(amount, dimension):
+    units = DISPLAY_UNITS.get(dimension)
+    if units is None:
+        return amount, None if dimension == 'each' else dimension
+    unit, size = next(((unit, size) for unit, size in units if amount >= size), units[-1])
+    return amount / size, unit
+
+
+# Scale and cost recipes in one pass over all of their ingredient lines.
+# `rows` come from queries.costing_rows(); `factors` maps recipe ids to scale factors, in the
+# order the recipes are reported. Returns plain data: each recipe's cost and calories (with
+# its scaled lines when `with_lines`), a shopping list totalling each ingredient over all the
+# recipes, and grand totals. Costs and calories count the lines whose ingredient has a price
+# (or calories) in a unit convertible from the line's; `priced_lines` says how many did.
+def cost_recipes(rows, factors, with_lines=True):
+    recipe_ids = list(factors)
+    positions = {recipe_id: position for position, recipe_id in enumerate(recipe_ids)}
+    columns = dict(zip(rows[0]._fields, zip(*rows))) if rows else dict.fromkeys(LINE_FIELDS, ())
+    titles = dict(zip(columns['recipe_id'], columns['title']))
+    has_line = np.array([text is not None for text in columns['text']], dtype=bool)  # False for a recipe without lines
+
+    recipe = np.fromiter(map(positions.__getitem__, columns['recipe_id']), np.intp, len(rows))[has_line]
+    text = np.array(columns['text'], dtype=object)[has_line]
+    name = np.array(columns['name'], dtype=object)[has_line]
+    factor = _floats(list(factors.values()))[recipe]
+    quantity = _floats(columns['quantity'])[has_line] * factor
+    quantity_max = _floats(columns['quantity_max'])[has_line] * factor
+    unit = _unit_codes(columns['unit'])[has_line]
+    price_unit = _unit_codes(columns['price_unit'])[has_line]
+
+    # The scaled amount (the middle of a range) in grams, millilitres or items, then in the
+    # unit the ingredient is priced in when the two measure the same thing
+    amount = (quantity + quantity_max) / 2 * UNIT_FACTORS[unit]
+    priced_amount = np.where(UNIT_DIMENSIONS[unit] == UNIT_DIMENSIONS[price_unit],
+                             amount / UNIT_FACTORS[price_unit], np.nan)
+    cost = priced_amount * _floats(columns['price'])[has_line]
+    calories = priced_amount * _floats(columns['calories'])[has_line]
+    priced = ~np.isnan(cost)
+    counted = ~np.isnan(calories)
+
+    # Totals per recipe
+    count = len(recipe_ids)
+    recipe_cost = np.bincount(recipe, weights=np.where(priced, cost, 0), minlength=count)
+    recipe_calories = np.bincount(recipe, weights=np.nan_to_num(calories), minlength=count)
+    recipe_priced = np.bincount(recipe, weights=priced, minlength=count).astype(int)
+    recipe_counted = np.bincount(recipe, weights=counted, minlength=count)
+    recipe_lines = np.bincount(recipe, minlength=count)
+
+    # Totals per ingredient and kind of measure, over the lines with an amount
+    measured = np.flatnonzero(~np.isnan(amount))
+    dimension = UNIT_DIMENSIONS[unit]
+    keys = _floats(columns['ingredient_id'])[has_line].astype(np.int64) * len(DIMENSIONS) + dimension
+    _, first, group = np.unique(keys[measured], return_index=True, return_inverse=True)
+    group_amount = np.bincount(group, weights=amount[measured], minlength=len(first))
+    group_cost = np.bincount(group, weights=np.where(priced, cost, 0)[measured], minlength=len(first))
+    group_priced = np.bincount(group, weights=priced[measured], minlength=len(first))
+
+    shopping = {}
+    for line, total, total_cost, any_priced in zip(measured[first].tolist(), group_amount.tolist(),
+                                                   group_cost.tolist(), group_priced.tolist()):
+        ingredient = name[line]
+        total, display_unit = _display_amount(total, DIMENSIONS[dimension[line]])
+        shopping[ingredient, display_unit] = {'ingredient': ingredient, 'quantity': round(total, 2),
+                                              'unit': display_unit, 'cost': round(total_cost, 2) if any_priced else None}
+    listed = {ingredient for ingredient, _ in shopping}
+    for ingredient in dict.fromkeys(name[np.isnan(amount)].tolist()):
+        if ingredient not in listed:
+            shopping[ingredient, None] = {'ingredient': ingredient, 'quantity': None, 'unit': None, 'cost': None}
+
+    recipes = [{
+        'id': recipe_id,
+        'title': titles.get(recipe_id),
+        'factor': factors[recipe_id],
+        'cost': round(total_cost, 2) if any_priced else None,
+        'calories': round(total_calories) if any_counted else None,
+        'line_count': line_count,
+        'priced_lines': any_priced,
+    } for recipe_id, total_cost, total_calories, any_priced, any_counted, line_count in zip(
+        recipe_ids, recipe_cost.tolist(), recipe_calories.tolist(), recipe_priced.tolist(), recipe_counted.tolist(),
+        recipe_lines.tolist())]
+
+    if with_lines:
+        units = np.array(columns['unit'], dtype=object)[has_line]
+        scaled = zip(text.tolist(), _values(quantity, 4), _values(quantity_max, 4), units.tolist(), name.tolist(),
+                     _values(cost, 2), _values(calories, 0), recipe.tolist())
+        for summary in recipes:
+            summary['lines'] = []
+        for line_text, line_quantity, line_quantity_max, line_unit, ingredient, line_cost, line_calories, position in scaled:
+            recipes[position]['lines'].append({
+                'text': line_text,
+                'scaled': scale_line(line_text, line_quantity, line_quantity_max),
+                'ingredient': ingredient,
+                'quantity': line_quantity,
+                'quantity_max': line_quantity_max,
+                'unit': line_unit,
+                'cost': line_cost,
+                'calories': line_calories,
+            })
+
+    return {
+        'recipes': recipes,
+        'shopping_list': sorted(shopping.values(), key=lambda item: (item['ingredient'], item['unit'] or '')),
+        'cost': round(float(recipe_cost.sum()), 2) if priced.any() else None,
+        'calories': round(float(recipe_calories.sum())) if counted.any() else None,
+        'line_count': len(text),
+        'priced_lines': int(priced.sum()),
+    }
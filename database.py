@@ -0,0 +1,51 @@
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+# Engine options suited to the database behind `uri`.
+# SQLite connections are cheap and share one file lock, so a small pool is plenty and
+# recycling or pinging them is pointless; server databases get a real pool.
+def engine_options(uri, pool_size=10, max_overflow=20):
+    url = make_url(uri)
+    if url.get_backend_name() != 'sqlite':
+        return {
+            'pool_size': pool_size,  # Number of connections to keep open
+            'max_overflow': max_overflow,  # Extra connections for bursts
+            'pool_timeout': 30,  # How long to wait for a connection
+            'pool_recycle': 1800,  # Recycle connections after 30 minutes
+            'pool_pre_ping': True,  # Replace connections the server has dropped
+        }
+    if not url.database or url.database == ':memory:':
+        return {}  # Flask-SQLAlchemy already shares one in-memory connection
+    return {
+        'pool_size': 5,
+        'max_overflow': 10,
+        'pool_timeout': 30,
+    }
+
+
+# Apply the SQLITE_* pragmas to every new connection of the app's SQLite engine
+def tune_sqlite(app, db):
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = {
+        'journal_mode': app.config['SQLITE_JOURNAL_MODE'],  # WAL: readers don't wait for a writer
+        'synchronous': app.config['SQLITE_SYNCHRONOUS'],  # NORMAL is durable across crashes in WAL mode
+        'busy_timeout': app.config['SQLITE_BUSY_TIMEOUT'],  # Milliseconds to wait for a lock
+        'cache_size': -app.config['SQLITE_CACHE_SIZE'],  # Negative: KiB rather than pages
+        'mmap_size': app.config['SQLITE_MMAP_SIZE'],
+        'temp_store': 'MEMORY',
+    }
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
@@ -0,0 +1,51 @@
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from flask_wtf.csrf import CSRFProtect
+
+import rate_limit_storage  # noqa: F401  (registers the shm:// storage scheme)
+from blob_store import BlobStore
+from http_cache import HttpCache
+from image_pipeline import ImageProcessor
+from instrumentation import Instrumentation
+from log_pipeline import LogPipeline
+from pdf_cache import PdfCache
+from read_cache import ReadCache
+from search_index import RecipeSearchIndex
+from typeahead import Typeahead
+
+
+# The app's extensions, created unbound so the blueprints can import them; create_app()
+# (see app.py) sets each one up for the app it builds, in the order the hooks must run.
+
+# Logging through a queue and a writer thread, so requests never wait on the log file
+log_pipeline = LogPipeline()
+
+# Rate limits; the storage, defaults and strategy come from the RATELIMIT_* settings
+limiter = Limiter(key_func=get_remote_address)
+
+# Per-request timing (database, templates, PDFs, images), Server-Timing and /metrics
+instrumentation = Instrumentation()
+
+# Full-text search over recipe titles and ingredients
+search_index = RecipeSearchIndex()
+
+# Suggestions for the search form from recipe titles and ingredient names
+typeahead = Typeahead()
+
+# Rendered PDF cache
+pdf_cache = PdfCache()
+
+# Thumbnails and responsive variants for uploads
+image_processor = ImageProcessor()
+
+# Content-addressed photo storage, under UPLOAD_FOLDER/blobs
+blob_store = BlobStore(None)
+
+# ETags and 304s, compression, and long-lived caching of fingerprinted static files
+http_cache = HttpCache()
+
+# Read cache for hot pages; entries are dropped when the rows behind them change
+read_cache = ReadCache()
+
+# CSRF protection
+csrf = CSRFProtect()
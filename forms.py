@@ -0,0 +1,21 @@
+from flask_wtf import FlaskForm
+from wtforms import StringField, IntegerField, TextAreaField
+from wtforms.validators import DataRequired, NumberRange
+
+
+# Input validation and security
+class RecipeForm(FlaskForm):
+    title = StringField('Title', validators=[DataRequired()])
+    author = StringField('Author')
+    prep_time = IntegerField('Prep Time (minutes)',
+                           validators=[DataRequired(), NumberRange(min=0)])
+    cook_time = IntegerField('Cook Time (minutes)',
+                           validators=[DataRequired(), NumberRange(min=0)])
+    ingredients = TextAreaField('Ingredients', validators=[DataRequired()])
+    instructions = TextAreaField('Instructions', validators=[DataRequired()])
+    variations = TextAreaField('Variations')
+    notes = TextAreaField('Notes')
+
+# RecipeForm for checking recipes that arrive as JSON rather than a form post
+def recipe_validator():
+    return RecipeForm(formdata=None, meta={'csrf': False})
@@ -0,0 +1,82 @@
+import os
+
+from flask import Blueprint, Response, current_app, flash, request, send_from_directory, stream_template
+
+from extensions import http_cache, search_index
+from models import db
+from queries import gallery_images, gallery_summary
+
+
+# The photo gallery, and the uploaded photos themselves
+bp = Blueprint('gallery', __name__)
+
+# Send a template as it renders, in chunks of about STREAM_CHUNK_CHARS, so the first bytes
+# leave before the last rows are read and the page is never held in memory whole
+STREAM_CHUNK_CHARS = 16 * 1024
+
+def stream_page(template_name, **context):
+    def chunks(pieces):
+        buffer, size = [], 0
+        for piece in pieces:
+            buffer.append(piece)
+            size += len(piece)
+            if size >= STREAM_CHUNK_CHARS:
+                yield ''.join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield ''.join(buffer)
+    return Response(chunks(stream_template(template_name, **context)), mimetype='text/html')
+
+# Rows of a query read while the page streams. stream_with_context pushes the request context
+# again, but Flask-SQLAlchemy removed the view's session when the context was first popped, so
+# db.session is a new session there, closed when the stream ends. A query built in the view
+# still holds the removed one: reading it reopens that session, and its pooled connection
+# stays checked out until the session is garbage collected. So the rows are read through the
+# streaming context's session.
+def streamed_rows(query):
+    yield from query.with_session(db.session())
+
+# Photo gallery
+@bp.route('/photo_gallery')
+def photo_gallery():
+    keyword = request.args.get('keyword')
+
+    if keyword:
+        # Search recipes by keyword in title or ingredients
+        recipe_ids = search_index.search(keyword=keyword)
+
+        # Get all images for matching recipes, best match first
+        images = gallery_images(recipe_ids) if recipe_ids else []
+        total = len(images)
+        version = images
+        
+        results = f"Showing {total} images matching '{keyword}'."
+        if not images:
+            flash('Make your memories count. Upload photos!', 'info')
+            results = "No photos found for this keyword. Why not add your first one?"
+    else:
+        # Every image with recipe information, read while the page streams
+        total, version = gallery_summary()
+        images = streamed_rows(gallery_images())
+        results = f"Showing all {total} images."
+
+    not_modified = http_cache.not_modified(keyword, version)
+    if not_modified:
+        return not_modified
+
+    return stream_page(
+        'gallery.html',
+        images=images,
+        total=total,
+        keyword=keyword,
+        results=results
+    )
+
+# Serve uploaded photos; content-addressed files never change, so they are cached for good
+@bp.route('/media/<path:filename>')
+def uploaded_file(filename):
+    response = send_from_directory(os.path.abspath(current_app.config['UPLOAD_FOLDER']), filename,
+                                   max_age=current_app.config['IMAGE_CACHE_MAX_AGE'])
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,274 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import zlib
+
+from flask import Response, g, request, send_file, session
+
+try:
+    import brotli
+except ImportError:  # Brotli not installed: gzip only
+    brotli = None
+
+
+# Content types worth compressing
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript',
+    'application/json', 'application/x-ndjson', 'image/svg+xml',
+}
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.json', '.svg', '.txt', '.html', '.map', '.ttf', '.eot'}
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+ONE_YEAR = 365 * 24 * 3600
+STREAM_FLUSH_BYTES = 16 * 1024  # A streamed response's compressed output is flushed after this much input
+
+
+def _compress(data, encoding, best=False):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if best else 5)
+    return gzip.compress(data, compresslevel=9 if best else 6, mtime=0)
+
+
+# Compress a streamed body as it is produced, flushing every STREAM_FLUSH_BYTES so the client
+# gets the start of the page while the rest is still being generated. `chunks` are the bytes
+# of the response `body`, which is closed at the end.
+def _compress_stream(chunks, encoding, body):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=5)
+        compress, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+        compress, flush, finish = compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+    pending = 0
+    try:
+        for chunk in chunks:
+            data = compress(chunk)
+            pending += len(chunk)
+            if pending >= STREAM_FLUSH_BYTES:
+                data += flush()
+                pending = 0
+            if data:
+                yield data
+        yield finish()
+    finally:
+        if hasattr(body, 'close'):
+            body.close()  # Ends the request context of a stream_with_context generator
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Conditional requests, compression and static asset caching for the whole app:
+# - pages get weak ETags, either from the data they are built from (see not_modified)
+#   or from the rendered body, and matching If-None-Match requests get a 304;
+# - HTML/JSON/CSS/JS responses above a size threshold are compressed with Brotli or gzip,
+#   and streamed ones as they are generated;
+# - static files are compressed once, in the background at startup, and served precompressed;
+# - url_for('static') adds a content fingerprint (?v=), and fingerprinted URLs are cached for a year.
+class HttpCache:
+    def __init__(self, app=None):
+        self.app = app
+        self.site_version = ''
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.min_bytes = app.config['COMPRESS_MIN_BYTES']
+        self.precompressed_dir = app.config['STATIC_PRECOMPRESS_DIR']
+        self.encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+        self.site_version = self._site_version()
+        app.url_defaults(self._fingerprint_static)
+        app.after_request(self._after_request)
+        if app.static_folder and 'static' in app.view_functions:
+            app.view_functions['static'] = self._send_static
+            # Off the startup path: compressing every asset at the highest Brotli level takes
+            # seconds on a fresh deploy. Until a file's copy is written it is sent as-is.
+            threading.Thread(target=self._precompress_in_background, name='static-precompress', daemon=True).start()
+        app.extensions['http_cache'] = self
+
+    # Files whose content decides what the pages look like: templates and static assets
+    def _site_files(self):
+        # UPLOAD_FOLDER is opened relative to the working directory, which needn't be root_path:
+        # skip it wherever either resolution puts it
+        upload_folder = self.app.config['UPLOAD_FOLDER']
+        excluded = {os.path.realpath(upload_folder), os.path.realpath(os.path.join(self.app.root_path, upload_folder))}
+        for folder in (self.app.template_folder, self.app.static_folder):
+            if not folder:
+                continue
+            folder = os.path.join(self.app.root_path, folder)
+            for root, dirs, names in os.walk(folder):
+                dirs[:] = sorted(name for name in dirs if os.path.realpath(os.path.join(root, name)) not in excluded)
+                for name in sorted(names):
+                    yield os.path.join(root, name)
+
+    # Changes whenever a template or asset changes, so page ETags change with a deploy.
+    # Built from sizes and modification times, so starting a worker reads no file contents.
+    def _site_version(self):
+        digest = hashlib.sha256()
+        for path in self._site_files():
+            stat = os.stat(path)
+            digest.update(f'{os.path.relpath(path, self.app.root_path)}:{stat.st_size}:{stat.st_mtime_ns}\n'.encode())
+        return digest.hexdigest()[:16]
+
+    # Pages
+
+    def etag_for(self, *parts):
+        data = json.dumps([self.site_version, parts], default=str, sort_keys=True).encode()
+        return hashlib.sha256(data).hexdigest()[:32]
+
+    # Call before rendering a page with the data it is built from.
+    # Returns a 304 response when the client's copy is current; otherwise the
+    # rendered page is sent with this ETag.
+    def not_modified(self, *parts):
+        if request.method != 'GET' or session.get('_flashes'):
+            return None  # Pending flash messages are part of the page
+        etag = self.etag_for(*parts)
+        g.page_etag = etag
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+            response.set_etag(etag, weak=True)
+            response.cache_control.no_cache = True
+            return response
+        return None
+
+    def _after_request(self, response):
+        if request.method == 'GET' and response.status_code == 200 and request.endpoint != 'static':
+            if response.mimetype in COMPRESSIBLE_TYPES:
+                self._make_conditional(response)
+        if response.status_code == 200:
+            self._compress_response(response)
+        return response
+
+    def _make_conditional(self, response):
+        if 'ETag' not in response.headers:
+            etag = g.get('page_etag')
+            if etag:
+                response.set_etag(etag, weak=True)
+            elif response.is_streamed:
+                return  # No ETag without reading the whole body
+            else:
+                response.add_etag(weak=True)
+        if not response.cache_control.max_age and not response.cache_control.no_store:
+            response.cache_control.no_cache = True  # Revalidate, then reuse if unchanged
+        if not response.is_streamed:
+            response.make_conditional(request)  # Streamed pages were checked by not_modified()
+
+    # Compression
+
+    def _accepted_encoding(self):
+        for encoding in self.encodings:
+            if request.accept_encodings[encoding]:
+                return encoding
+        return None
+
+    def _compress_response(self, response):
+        if (response.direct_passthrough or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES):
+            return
+        response.vary.add('Accept-Encoding')
+        encoding = self._accepted_encoding()
+        if response.is_streamed:
+            if encoding is not None:
+                response.response = _compress_stream(response.iter_encoded(), encoding, response.response)
+                response.headers['Content-Encoding'] = encoding
+                response.headers.pop('Content-Length', None)
+            return
+        data = response.get_data()
+        if encoding is None or len(data) < self.min_bytes:
+            return
+        response.set_data(_compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+
+    # Static assets
+
+    def _precompressed_path(self, filename, encoding):
+        return os.path.join(self.precompressed_dir, filename + ENCODING_SUFFIXES[encoding])
+
+    # Write compressed copies of static text assets that are missing or older than the source
+    def precompress_static(self):
+        static_folder = os.path.join(self.app.root_path, self.app.static_folder)
+        written = 0
+        for path in self._site_files():
+            if not path.startswith(static_folder + os.sep):
+                continue
+            if os.path.splitext(path)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            filename = os.path.relpath(path, static_folder)
+            data = None
+            for encoding in self.encodings:
+                target = self._precompressed_path(filename, encoding)
+                if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                    continue
+                if data is None:
+                    with open(path, 'rb') as file:
+                        data = file.read()
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                tmp_path = f'{target}.{os.getpid()}.tmp'
+                with open(tmp_path, 'wb') as file:
+                    file.write(_compress(data, encoding, best=True))
+                os.replace(tmp_path, target)
+                written += 1
+        if written:
+            self.app.logger.info('Precompressed %s static files', written)
+        return written
+
+    def _precompress_in_background(self):
+        try:
+            self.precompress_static()
+        except Exception:
+            self.app.logger.exception('Could not precompress static files')
+
+    def _fingerprint(self, filename):
+        with self._lock:
+            if filename in self._fingerprints:
+                return self._fingerprints[filename]
+        path = os.path.join(self.app.root_path, self.app.static_folder, filename)
+        try:
+            fingerprint = _file_digest(path)[:12]
+        except OSError:
+            fingerprint = None
+        with self._lock:
+            self._fingerprints[filename] = fingerprint
+        return fingerprint
+
+    def _fingerprint_static(self, endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            fingerprint = self._fingerprint(values['filename'])
+            if fingerprint:
+                values['v'] = fingerprint
+
+    def _send_static(self, filename):
+        response = self.app.send_static_file(filename)
+        fingerprint = request.args.get('v')
+        if fingerprint and fingerprint == self._fingerprint(filename):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = ONE_YEAR
+            response.cache_control.immutable = True
+        if os.path.splitext(filename)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self._accepted_encoding()
+        if encoding is None or response.status_code != 200:
+            return response
+        path = self._precompressed_path(filename, encoding)
+        if not os.path.isfile(path):
+            return response
+        response.close()
+        compressed = send_file(os.path.abspath(path), mimetype=response.mimetype, conditional=False, etag=False)
+        for header in ('Cache-Control', 'Last-Modified', 'Vary'):
+            if header in response.headers:
+                compressed.headers[header] = response.headers[header]
+        if response.get_etag()[0]:
+            compressed.set_etag(f'{response.get_etag()[0]}-{encoding}')
+        compressed.headers['Content-Encoding'] = encoding
+        return compressed.make_conditional(request)
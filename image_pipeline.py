@@ -0,0 +1,146 @@
+import importlib.util
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Pillow is imported by the first image processed, not when the app starts.
+# Without it, originals are served as-is.
+PILLOW_INSTALLED = importlib.util.find_spec('PIL') is not None
+
+
+# Encoder settings for each variant format
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+# Flatten transparency onto white for formats without an alpha channel
+def _opaque(image):
+    from PIL import Image
+
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB') if image.mode != 'RGB' else image
+
+
+# Write downscaled WebP and JPEG copies of an image.
+# Returns (width, height, variants) where each variant is {'width', 'format', 'path'}.
+def generate_variants(path, output_dir, widths):
+    from PIL import Image, ImageOps
+
+    os.makedirs(output_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    variants = []
+    with Image.open(path) as original:
+        image = ImageOps.exif_transpose(original)
+        width, height = image.size
+        for target in sorted({min(width, target) for target in widths}):
+            resized = image
+            if target < width:
+                resized = image.resize((target, max(1, round(height * target / width))), Image.LANCZOS)
+            for extension, (image_format, options) in VARIANT_FORMATS.items():
+                if image_format == 'WEBP' and resized.mode in ('RGB', 'RGBA'):
+                    output = resized  # WebP keeps transparency
+                else:
+                    output = _opaque(resized)
+                variant_path = os.path.join(output_dir, f'{stem}-{target}.{extension}').replace('\\', '/')
+                output.save(variant_path, image_format, **options)
+                variants.append({'width': target, 'format': extension, 'path': variant_path})
+    return width, height, variants
+
+
+# Background pool that turns uploaded originals into thumbnails and size variants
+class ImageProcessor:
+    def __init__(self, app=None, db=None, model=None):
+        self.app = app
+        self.db = db
+        self.model = model
+        self._executor = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, db, model)
+
+    def init_app(self, app, db, model):
+        self.app = app
+        self.db = db
+        self.model = model
+        app.extensions['image_processor'] = self
+
+    @property
+    def available(self):
+        return PILLOW_INSTALLED
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.app.config['IMAGE_WORKERS'],
+                                                    thread_name_prefix='image-processor')
+        return self._executor
+
+    # Queue images for processing; call after the rows are committed
+    def submit(self, image_ids):
+        for image_id in image_ids:
+            self._pool().submit(self.run, image_id)
+
+    # Run other upload housekeeping (such as garbage collection) off the request thread
+    def defer(self, function, *args):
+        self._pool().submit(self._call, function, *args)
+
+    def _call(self, function, *args):
+        with self.app.app_context():
+            try:
+                function(*args)
+            except Exception as e:
+                self.db.session.rollback()
+                self.app.logger.error('Error in background task %s: %s', function.__name__, e)
+
+    # Process one image, recording a failure on the row instead of raising
+    def run(self, image_id):
+        with self.app.app_context():
+            try:
+                self.process(image_id)
+            except Exception as e:
+                self.db.session.rollback()
+                self.app.logger.error('Error processing image %s: %s', image_id, e)
+                image = self.db.session.get(self.model, image_id)
+                if image is not None:
+                    image.status = 'failed'
+                    self.db.session.commit()
+
+    # Generate variants for one image row (synchronously)
+    def process(self, image_id):
+        image = self.db.session.get(self.model, image_id)
+        if image is None:
+            return  # Deleted before we got to it
+        if not self.available:
+            image.status = 'original'
+            self.db.session.commit()
+            return
+        # The same photo may already have been processed for another recipe
+        blob_hash = getattr(image, 'blob_hash', None)
+        if blob_hash:
+            processed = self.model.query.filter(self.model.blob_hash == blob_hash,
+                                                self.model.status == 'ready',
+                                                self.model.id != image.id).first()
+            if processed:
+                image.width = processed.width
+                image.height = processed.height
+                image.variants = processed.variants
+                image.thumbnail_path = processed.thumbnail_path
+                image.status = 'ready'
+                self.db.session.commit()
+                return
+        output_dir = os.path.join(self.app.config['UPLOAD_FOLDER'], 'variants')
+        width, height, variants = generate_variants(image.image_path, output_dir,
+                                                    self.app.config['IMAGE_VARIANT_WIDTHS'])
+        image.width = width
+        image.height = height
+        image.variants = variants
+        image.thumbnail_path = next(variant['path'] for variant in variants if variant['format'] == 'jpeg')
+        image.status = 'ready'
+        self.db.session.commit()
+        self.app.logger.info('Processed image %s into %s variants', image_id, len(variants))
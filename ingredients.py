@@ -0,0 +1,161 @@
+import re
+
+
+# Spellings of each unit, by the canonical name stored with parsed ingredient lines
+UNIT_SPELLINGS = {
+    'tsp': ('tsp', 'tsps', 'teaspoon', 'teaspoons'),
+    'tbsp': ('tbsp', 'tbsps', 'tablespoon', 'tablespoons'),
+    'cup': ('cup', 'cups'),
+    'pint': ('pint', 'pints'),
+    'quart': ('quart', 'quarts'),
+    'gallon': ('gallon', 'gallons'),
+    'ml': ('ml', 'milliliter', 'milliliters', 'millilitre', 'millilitres'),
+    'l': ('l', 'liter', 'liters', 'litre', 'litres'),
+    'g': ('g', 'gram', 'grams'),
+    'kg': ('kg', 'kilogram', 'kilograms'),
+    'oz': ('oz', 'ounce', 'ounces'),
+    'lb': ('lb', 'lbs', 'pound', 'pounds'),
+    'pinch': ('pinch', 'pinches'),
+    'dash': ('dash', 'dashes'),
+    'clove': ('clove', 'cloves'),
+    'can': ('can', 'cans'),
+    'slice': ('slice', 'slices'),
+    'bunch': ('bunch', 'bunches'),
+    'handful': ('handful', 'handfuls'),
+    'sprig': ('sprig', 'sprigs'),
+}
+UNIT_NAMES = {spelling: unit for unit, spellings in UNIT_SPELLINGS.items() for spelling in spellings}
+
+# Units stripped from the front of an ingredient line when working out its name
+UNITS = set(UNIT_NAMES)
+
+# What each unit measures and its size in grams, millilitres or items. Mass and volume convert
+# within themselves; every counted unit (and 'each', a bare count like "2 eggs") only to itself.
+UNIT_SIZES = {
+    'g': ('mass', 1.0),
+    'kg': ('mass', 1000.0),
+    'oz': ('mass', 28.349523125),
+    'lb': ('mass', 453.59237),
+    'ml': ('volume', 1.0),
+    'l': ('volume', 1000.0),
+    'tsp': ('volume', 4.92892159375),
+    'tbsp': ('volume', 14.78676478125),
+    'cup': ('volume', 236.5882365),
+    'pint': ('volume', 473.176473),
+    'quart': ('volume', 946.352946),
+    'gallon': ('volume', 3785.411784),
+    'pinch': ('volume', 0.30805759961),  # 1/16 tsp
+    'dash': ('volume', 0.61611519922),  # 1/8 tsp
+    'each': ('each', 1.0),
+    'clove': ('clove', 1.0),
+    'can': ('can', 1.0),
+    'slice': ('slice', 1.0),
+    'bunch': ('bunch', 1.0),
+    'handful': ('handful', 1.0),
+    'sprig': ('sprig', 1.0),
+}
+
+# Leading amounts such as "2", "1.5", "1/2", "1 1/2", "2-3" or "½"
+QUANTITY_PATTERN = re.compile(
+    r'^(?:\d+(?:[.,]\d+)?(?:\s*/\s*\d+)?|[¼½¾⅓⅔⅛⅜⅝⅞])'
+    r'(?:\s+\d+\s*/\s*\d+|[¼½¾⅓⅔⅛⅜⅝⅞])?'
+    r'(?:\s*(?:-|to)\s*\d+(?:[.,/]\d+)?)?\s*'
+)
+UNIT_PATTERN = re.compile(r'^([a-z]+)\.?\s+(?:of\s+)?')
+RANGE_SEPARATOR = re.compile(r'\s*(?:-|to)\s*')
+AMOUNT_PART = re.compile(r'(\d+(?:[.,]\d+)?)\s*/\s*(\d+)|(\d+(?:[.,]\d+)?)|([¼½¾⅓⅔⅛⅜⅝⅞])')
+VULGAR_FRACTIONS = {'¼': 1 / 4, '½': 1 / 2, '¾': 3 / 4, '⅓': 1 / 3, '⅔': 2 / 3,
+                    '⅛': 1 / 8, '⅜': 3 / 8, '⅝': 5 / 8, '⅞': 7 / 8}
+
+# Fractions written out when a quantity is close to one, as cooks measure
+COMMON_FRACTIONS = ((1 / 8, '1/8'), (1 / 4, '1/4'), (1 / 3, '1/3'), (3 / 8, '3/8'), (1 / 2, '1/2'),
+                    (5 / 8, '5/8'), (2 / 3, '2/3'), (3 / 4, '3/4'), (7 / 8, '7/8'))
+
+
+# Split the comma-separated ingredients text into individual lines
+def split_ingredients(text):
+    if not text:
+        return []
+    return [line.strip() for line in text.split(',') if line.strip()]
+
+
+def _amount(text):
+    total = 0.0
+    for numerator, denominator, number, fraction in AMOUNT_PART.findall(text):
+        if denominator:
+            if int(denominator) == 0:
+                return None
+            total += float(numerator.replace(',', '.')) / int(denominator)
+        elif number:
+            total += float(number.replace(',', '.'))
+        else:
+            total += VULGAR_FRACTIONS[fraction]
+    return total
+
+
+# (low, high) of an amount matched by QUANTITY_PATTERN: "1 1/2" -> (1.5, 1.5), "2-3" -> (2.0, 3.0)
+def parse_quantity(text):
+    parts = RANGE_SEPARATOR.split(text.strip(), maxsplit=1)
+    low = _amount(parts[0])
+    high = _amount(parts[1]) if len(parts) > 1 else low
+    if low is None or high is None:
+        return None, None
+    return low, max(low, high)
+
+
+# Split an ingredient line into (quantity, quantity_max, unit, name):
+# "2-3 Cups of  Tomato" -> (2.0, 3.0, 'cup', 'tomato'). The unit is a key of UNIT_SIZES, 'each'
+# for a bare count; a unit without an amount ("pinch of salt") counts one. Lines without
+# either ("salt to taste") have no quantity or unit.
+def parse_ingredient(line):
+    text = ' '.join(line.lower().split())
+    quantity = QUANTITY_PATTERN.match(text)
+    stripped = text[quantity.end():] if quantity else text
+    unit = UNIT_PATTERN.match(stripped)
+    if unit and unit.group(1) in UNITS:
+        stripped = stripped[unit.end():]
+        unit = UNIT_NAMES[unit.group(1)]
+    else:
+        unit = None
+    name = stripped.strip(' .;:-') or text
+    if quantity:
+        low, high = parse_quantity(quantity.group(0))
+        if low is None:
+            return None, None, None, name
+        return low, high, unit or 'each', name
+    if unit:
+        return 1.0, 1.0, unit, name
+    return None, None, None, name
+
+
+# Normalized ingredient name for lookups: "2 Cups of  Tomato" -> "tomato"
+def ingredient_name(line):
+    return parse_ingredient(line)[3]
+
+
+# A quantity as a cook would write it: 1.5 -> "1 1/2", 0.333 -> "1/3", 12.75 -> "12.8"
+def format_quantity(value):
+    if value >= 10:
+        return f'{value:.1f}'.rstrip('0').rstrip('.')
+    whole = int(value)
+    rest = value - whole
+    for fraction, written in COMMON_FRACTIONS:
+        if abs(rest - fraction) < 0.02:
+            return f'{whole} {written}' if whole else written
+    if rest < 0.02 and whole:
+        return str(whole)
+    if rest > 0.98:
+        return str(whole + 1)
+    return f'{value:.2g}' if value < 0.1 else f'{value:.2f}'.rstrip('0').rstrip('.')
+
+
+# An ingredient line with its amount replaced by a scaled one: ("2 cups rice", 3, 3) -> "3 cups rice"
+def scale_line(line, quantity, quantity_max):
+    text = ' '.join(line.split())
+    if quantity is None:
+        return text
+    amount = format_quantity(quantity)
+    if quantity_max is not None and quantity_max > quantity:
+        amount = f'{amount}-{format_quantity(quantity_max)}'
+    original = QUANTITY_PATTERN.match(text)
+    return f'{amount} {text[original.end():] if original else text}'
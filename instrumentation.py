@@ -0,0 +1,247 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Parts of a request timed separately; whatever is left is Python/Flask time
+PHASES = ('db', 'render', 'pdf', 'image')
+PROFILE_COOLDOWN = 60  # Seconds between profiles of the same endpoint
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Where each request spends its time, reported three ways:
+# - a Server-Timing header on every response (db, render, pdf, image and total);
+# - Prometheus-style counters and latency histograms per endpoint (render_metrics());
+# - optionally, a sampled stack profile of requests slower than PROFILE_SLOW_REQUESTS_MS.
+# Metrics are kept per process, so each worker reports its own.
+class Instrumentation:
+    def __init__(self, app=None):
+        self.server_timing = True
+        self.profiler = None
+        self._lock = threading.Lock()
+        self._requests = Counter()  # (endpoint, method, status) -> count
+        self._histograms = {}  # endpoint -> [bucket counts..., sum, count]
+        self._phases = Counter()  # (endpoint, phase) -> seconds
+        self._queries = Counter()  # endpoint -> SQL statements
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.server_timing = app.config['SERVER_TIMING']
+        if app.config['PROFILE_SLOW_REQUESTS_MS'] > 0:
+            self.profiler = SlowRequestProfiler(app.config['PROFILE_DIR'], app.config['PROFILE_SLOW_REQUESTS_MS'],
+                                                app.config['PROFILE_INTERVAL_MS'], app.logger)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._teardown_request)
+        # Engine events are global: listen once, or a second app would count every query twice
+        if not self._listening:
+            self._listening = True
+            event.listen(Engine, 'before_cursor_execute', self._query_started)
+            event.listen(Engine, 'after_cursor_execute', self._query_finished)
+        before_render_template.connect(self._render_started, app)
+        template_rendered.connect(self._render_finished, app)
+        app.extensions['instrumentation'] = self
+
+    # Time a block of work as one of PHASES, e.g. `with instrumentation.timed('pdf'):`
+    @contextmanager
+    def timed(self, phase):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(phase, time.perf_counter() - started)
+
+    def _add(self, phase, seconds):
+        if has_request_context() and 'timings' in g:
+            g.timings[phase] += seconds
+
+    # Request hooks
+
+    def _start_request(self):
+        g.request_started = time.perf_counter()
+        g.timings = Counter()
+        g.query_count = 0
+        if self.profiler:
+            self.profiler.begin()
+
+    def _finish_request(self, response):
+        if 'request_started' not in g:
+            return response
+        total = time.perf_counter() - g.request_started
+        endpoint = request.endpoint or 'unmatched'
+        self._observe(endpoint, request.method, response.status_code, total, g.timings, g.query_count)
+        if self.server_timing:
+            metrics = []
+            for phase in PHASES:
+                if phase == 'db' and g.query_count:
+                    queries = f"{g.query_count} {'query' if g.query_count == 1 else 'queries'}"
+                    metrics.append(f'db;dur={g.timings[phase] * 1000:.1f};desc="{queries}"')
+                elif g.timings[phase]:
+                    metrics.append(f'{phase};dur={g.timings[phase] * 1000:.1f}')
+            metrics.append(f'total;dur={total * 1000:.1f}')
+            response.headers['Server-Timing'] = ', '.join(metrics)
+        return response
+
+    def _teardown_request(self, exception):
+        if self.profiler and 'request_started' in g:
+            self.profiler.end(request.endpoint or 'unmatched', time.perf_counter() - g.request_started)
+
+    # SQLAlchemy hooks; queries outside a request (CLI, background threads) are not timed
+
+    def _query_started(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._instrumentation_started = time.perf_counter()
+        if has_request_context() and 'query_count' in g:
+            g.query_count += 1
+
+    def _query_finished(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_instrumentation_started', None)
+        if started is not None:
+            self._add('db', time.perf_counter() - started)
+
+    # Template hooks; a template rendered while another renders is counted once, in the outer one
+
+    def _render_started(self, sender, template, context, **extra):
+        if has_request_context():
+            g.setdefault('render_stack', []).append(time.perf_counter())
+
+    def _render_finished(self, sender, template, context, **extra):
+        if has_request_context() and g.get('render_stack'):
+            started = g.render_stack.pop()
+            if not g.render_stack:
+                self._add('render', time.perf_counter() - started)
+
+    # Metrics
+
+    def _observe(self, endpoint, method, status, seconds, timings, queries):
+        with self._lock:
+            self._requests[endpoint, method, status] += 1
+            histogram = self._histograms.setdefault(endpoint, [0] * (len(LATENCY_BUCKETS) + 2))
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    histogram[index] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+            for phase in PHASES:
+                if timings[phase]:
+                    self._phases[endpoint, phase] += timings[phase]
+            self._queries[endpoint] += queries
+
+    # Metrics in the Prometheus text exposition format
+    def render_metrics(self):
+        with self._lock:
+            requests = sorted(self._requests.items())
+            histograms = sorted((endpoint, list(values)) for endpoint, values in self._histograms.items())
+            phases = sorted(self._phases.items())
+            queries = sorted(self._queries.items())
+        lines = [
+            '# HELP recipes_http_requests_total Requests handled, by endpoint, method and status.',
+            '# TYPE recipes_http_requests_total counter',
+        ]
+        for (endpoint, method, status), count in requests:
+            lines.append(f'recipes_http_requests_total{{endpoint="{_label(endpoint)}",method="{method}",'
+                         f'status="{status}"}} {count}')
+        lines += [
+            '# HELP recipes_http_request_duration_seconds Time to produce a response, by endpoint.',
+            '# TYPE recipes_http_request_duration_seconds histogram',
+        ]
+        for endpoint, values in histograms:
+            name = _label(endpoint)
+            for bound, count in zip(LATENCY_BUCKETS, values):
+                lines.append(f'recipes_http_request_duration_seconds_bucket{{endpoint="{name}",le="{bound}"}} {count}')
+            lines.append(f'recipes_http_request_duration_seconds_bucket{{endpoint="{name}",le="+Inf"}} {values[-1]}')
+            lines.append(f'recipes_http_request_duration_seconds_sum{{endpoint="{name}"}} {values[-2]:.6f}')
+            lines.append(f'recipes_http_request_duration_seconds_count{{endpoint="{name}"}} {values[-1]}')
+        lines += [
+            '# HELP recipes_http_request_phase_seconds_total Time spent in the database, templates, PDFs and images.',
+            '# TYPE recipes_http_request_phase_seconds_total counter',
+        ]
+        for (endpoint, phase), seconds in phases:
+            lines.append(f'recipes_http_request_phase_seconds_total{{endpoint="{_label(endpoint)}",phase="{phase}"}} '
+                         f'{seconds:.6f}')
+        lines += [
+            '# HELP recipes_db_queries_total SQL statements run while handling requests, by endpoint.',
+            '# TYPE recipes_db_queries_total counter',
+        ]
+        for endpoint, count in queries:
+            lines.append(f'recipes_db_queries_total{{endpoint="{_label(endpoint)}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+# Samples the stacks of threads serving requests every `interval_ms` from one background
+# thread, and writes the samples of requests slower than `threshold_ms` to `directory`
+# in the collapsed-stack format read by flamegraph.pl and speedscope.
+# At most one profile per endpoint is written every PROFILE_COOLDOWN seconds.
+class SlowRequestProfiler:
+    def __init__(self, directory, threshold_ms, interval_ms, logger):
+        self.directory = directory
+        self.threshold = threshold_ms / 1000
+        self.interval = max(interval_ms, 1) / 1000
+        self.logger = logger
+        self._active = {}  # thread id -> Counter of collapsed stacks
+        self._last_written = {}  # endpoint -> time of the last profile
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def begin(self):
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample, name='slow-request-profiler', daemon=True)
+                self._thread.start()
+
+    def end(self, endpoint, seconds):
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+        if not samples or seconds < self.threshold:
+            return None
+        now = time.monotonic()
+        if now - self._last_written.get(endpoint, -PROFILE_COOLDOWN) < PROFILE_COOLDOWN:
+            return None
+        self._last_written[endpoint] = now
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{re.sub(r'[^A-Za-z0-9_.-]', '_', endpoint)}-{seconds * 1000:.0f}ms.folded"
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as file:
+            for stack, count in samples.most_common():
+                file.write(f'{stack} {count}\n')
+        self.logger.info('Profiled slow request to %s (%.0f ms, %d samples): %s',
+                         endpoint, seconds * 1000, sum(samples.values()), path)
+        return path
+
+    def _sample(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, samples in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[self._collapse(frame)] += 1
+
+    @staticmethod
+    def _collapse(frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
@@ -0,0 +1,183 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+
+# Fields copied onto every record logged while handling a request
+REQUEST_FIELDS = ('request_id', 'method', 'path', 'endpoint', 'remote_addr')
+# Extra fields (logger.info(..., extra={...})) written into JSON records when present
+EXTRA_FIELDS = ('status', 'duration_ms', 'db_ms', 'queries', 'render_ms', 'bytes')
+LEVELS_THAT_WAIT = logging.WARNING  # Records at this level or above wait briefly for room in a full queue
+WAIT_SECONDS = 0.05
+REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+PLAIN_ARGS = (str, int, float, bool, type(None))
+
+
+# One JSON object per line; messages are only formatted here, on the writer thread
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in REQUEST_FIELDS + EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.levelno >= logging.WARNING:
+            entry['source'] = f'{record.pathname}:{record.lineno}'
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+
+    def format(self, record):
+        message = super().format(record)
+        request_id = getattr(record, 'request_id', None)
+        return f'{message} [request {request_id}]' if request_id else message
+
+
+# Hands records to the writer thread without ever blocking for long.
+# When the queue is full, records below LEVELS_THAT_WAIT are dropped at once and the rest wait
+# up to WAIT_SECONDS; the number dropped is logged as soon as there is room again.
+class BoundedQueueHandler(QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    # Runs on the logging thread: capture the request and freeze arguments, but leave the
+    # message unformatted (QueueHandler would format it here)
+    def prepare(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.method = request.method
+            record.path = request.path
+            record.endpoint = request.endpoint
+            record.remote_addr = request.remote_addr
+        if isinstance(record.args, tuple) and not all(isinstance(arg, PLAIN_ARGS) for arg in record.args):
+            # Objects could change, or need this thread's database session, before the writer gets to them
+            record.args = tuple(arg if isinstance(arg, PLAIN_ARGS) else str(arg) for arg in record.args)
+        return record
+
+    def enqueue(self, record):
+        try:
+            if record.levelno >= LEVELS_THAT_WAIT:
+                self.queue.put(record, timeout=WAIT_SECONDS)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+            return
+        if self.dropped:
+            self._report_dropped(record)
+
+    def _report_dropped(self, record):
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        notice = logging.makeLogRecord({
+            'name': record.name, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+            'pathname': __file__, 'lineno': 0,
+            'msg': 'Dropped %d log records because the log queue was full', 'args': (dropped,),
+        })
+        try:
+            self.queue.put_nowait(notice)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += dropped
+
+
+# Logging for the app without disk writes on request threads:
+# app.logger puts records on a bounded queue, and one writer thread formats them and writes
+# the rotating log file (JSON lines by default) and stderr.
+# Requests get an id (X-Request-ID, taken from the client or proxy when valid) that is added
+# to every record they log, and one access record each with its status and timings.
+class LogPipeline:
+    def __init__(self, app=None):
+        self.handler = None
+        self.listener = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        level = logging.DEBUG if app.config['DEBUG'] else logging.INFO
+        os.makedirs(app.config['LOG_DIR'], exist_ok=True)
+        formatter = JsonFormatter() if app.config['LOG_FORMAT'] == 'json' else TextFormatter()
+
+        file_handler = RotatingFileHandler(
+            os.path.join(app.config['LOG_DIR'], 'recipe_app.log'),
+            maxBytes=app.config['LOG_MAX_BYTES'],
+            backupCount=app.config['LOG_BACKUP_COUNT'],
+            delay=True,
+        )
+        file_handler.setFormatter(formatter)
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(TextFormatter())
+        self.writers = [file_handler, console_handler]
+        self.queue_size = app.config['LOG_QUEUE_SIZE']
+
+        self.handler = BoundedQueueHandler(queue.Queue(self.queue_size))
+        app.logger.removeHandler(default_handler)  # Its stderr writes now happen on the writer thread
+        app.logger.addHandler(self.handler)
+        app.logger.setLevel(level)
+        self._start()
+        os.register_at_fork(after_in_child=self._restart_in_child)
+        atexit.register(self.stop)
+
+        app.before_request(self._assign_request_id)
+        app.after_request(self._log_request)
+        app.extensions['log_pipeline'] = self
+
+    def _start(self):
+        self.listener = QueueListener(self.handler.queue, *self.writers, respect_handler_level=True)
+        self.listener.start()
+
+    # A forked worker (e.g. gunicorn --preload) doesn't inherit the writer thread
+    def _restart_in_child(self):
+        self.handler.queue = queue.Queue(self.queue_size)
+        self.handler.dropped = 0
+        self._start()
+
+    # Write out whatever is still queued
+    def stop(self):
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+
+    def _assign_request_id(self):
+        request_id = request.headers.get('X-Request-ID', '')
+        g.request_id = request_id if REQUEST_ID.match(request_id) else uuid.uuid4().hex
+        g.setdefault('request_started', time.perf_counter())
+
+    def _log_request(self, response):
+        response.headers['X-Request-ID'] = g.get('request_id', '')
+        if not self.app.config['LOG_REQUESTS'] or request.endpoint == 'static':
+            return response
+        timings = g.get('timings') or {}
+        self.app.logger.info('%s %s %s', request.method, request.full_path.rstrip('?'), response.status_code, extra={
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - g.request_started) * 1000, 1),
+            'db_ms': round(timings.get('db', 0) * 1000, 1),
+            'queries': g.get('query_count'),
+            'render_ms': round(timings.get('render', 0) * 1000, 1),
+            'bytes': response.content_length,  # None for a streamed body, which isn't read here
+        })
+        return response
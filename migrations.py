@@ -0,0 +1,171 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Float, Integer, String, Table, MetaData, bindparam, column, inspect, table, text, tuple_
+
+from ingredients import parse_ingredient
+from recipe_io import parse_date
+
+
+# Schema migrations.
+# Each revision runs once per database, in its own transaction, and the number of the last
+# one applied is kept in `schema_version`. Databases created from the models already have
+# the latest schema and are stamped with the newest revision instead.
+# Revisions may meet a schema that is partly there (the baseline adds whatever the models
+# have), so they check before adding a column or index.
+
+MIGRATIONS = []
+
+schema_version = Table(
+    'schema_version', MetaData(),
+    Column('version', Integer, nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def revision(number, description):
+    def register(upgrade):
+        MIGRATIONS.append((number, description, upgrade))
+        MIGRATIONS.sort(key=lambda migration: migration[0])
+        return upgrade
+    return register
+
+
+def latest_revision():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def current_revision(connection):
+    if not inspect(connection).has_table(schema_version.name):
+        return None
+    return connection.execute(schema_version.select().with_only_columns(schema_version.c.version)).scalar()
+
+
+def _set_revision(connection, number):
+    connection.execute(schema_version.delete())
+    connection.execute(schema_version.insert().values(version=number, applied_at=datetime.now()))
+
+
+# Revisions not yet applied, as (number, description)
+def pending(engine):
+    with engine.connect() as connection:
+        current = current_revision(connection) or 0
+    return [(number, description) for number, description, _ in MIGRATIONS if number > current]
+
+
+# Create any missing tables and bring the schema up to date.
+# Returns the revisions applied, as (number, description).
+def upgrade(db, logger):
+    engine = db.engine
+    with engine.begin() as connection:
+        existing_tables = set(inspect(connection).get_table_names())
+        schema_version.create(connection, checkfirst=True)
+        current = current_revision(connection)
+        if current is None and not existing_tables & set(db.metadata.tables):
+            db.metadata.create_all(connection)
+            _set_revision(connection, latest_revision())
+            logger.info('Created a new database at schema revision %s', latest_revision())
+            return []
+        db.metadata.create_all(connection)  # Tables added since; columns and indexes are left to revisions
+    applied = []
+    for number, description, migrate in MIGRATIONS:
+        if number <= (current or 0):
+            continue
+        with engine.begin() as connection:
+            migrate(connection, db.metadata)
+            _set_revision(connection, number)
+        logger.info('Applied schema revision %s: %s', number, description)
+        applied.append((number, description))
+    return applied
+
+
+# Helpers for revisions
+
+def add_column(connection, table_name, name, column_type):
+    if name in {existing['name'] for existing in inspect(connection).get_columns(table_name)}:
+        return False
+    column_type = column_type.compile(dialect=connection.dialect)
+    connection.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {name} {column_type}'))
+    return True
+
+
+def create_index(connection, table_name, name, *columns):
+    if name in {index['name'] for index in inspect(connection).get_indexes(table_name)}:
+        return False
+    connection.execute(text(f'CREATE INDEX {name} ON {table_name} ({", ".join(columns)})'))
+    return True
+
+
+# Revisions
+
+@revision(1, 'Columns and indexes added before schema revisions were tracked')
+def add_missing_columns(connection, metadata):
+    for model_table in metadata.sorted_tables:
+        for model_column in model_table.columns:
+            if model_column.nullable:
+                add_column(connection, model_table.name, model_column.name, model_column.type)
+        existing_indexes = {index['name'] for index in inspect(connection).get_indexes(model_table.name)}
+        for index in model_table.indexes:
+            if index.name not in existing_indexes:
+                index.create(connection)
+
+
+# Recipes saved before this revision only have a 'YYYY-MM-DD' string; they are dated at
+# the start of that day, and undated ones at the epoch so they sort last.
+UNKNOWN_DATE = datetime(1970, 1, 1)
+
+
+@revision(2, 'Index recipe_images.recipe_id; add recipes.created_at and updated_at for ordering')
+def add_recipe_timestamps(connection, metadata, batch_size=1000):
+    create_index(connection, 'recipe_images', 'ix_recipe_images_recipe_id', 'recipe_id')
+    add_column(connection, 'recipes', 'created_at', DateTime())
+    add_column(connection, 'recipes', 'updated_at', DateTime())
+
+    recipes = table('recipes', column('id', Integer), column('date'),
+                    column('created_at', DateTime), column('updated_at', DateTime))
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            recipes.select().with_only_columns(recipes.c.id, recipes.c.date)
+            .where(recipes.c.created_at.is_(None), recipes.c.id > last_id)
+            .order_by(recipes.c.id).limit(batch_size)).all()
+        if not rows:
+            break
+        connection.execute(
+            recipes.update().where(recipes.c.id == bindparam('recipe_id')).values(
+                created_at=bindparam('stamp', type_=DateTime), updated_at=bindparam('stamp', type_=DateTime)),
+            [{'recipe_id': row.id, 'stamp': parse_date(row.date) or UNKNOWN_DATE} for row in rows])
+        last_id = rows[-1].id
+    create_index(connection, 'recipes', 'ix_recipes_created_at_id', 'created_at', 'id')
+
+
+@revision(3, 'Parsed quantities and units of ingredient lines; ingredient prices and calories')
+def add_ingredient_quantities(connection, metadata, batch_size=1000):
+    add_column(connection, 'recipe_ingredients', 'quantity', Float())
+    add_column(connection, 'recipe_ingredients', 'quantity_max', Float())
+    add_column(connection, 'recipe_ingredients', 'unit', String())
+    add_column(connection, 'ingredients', 'price', Float())
+    add_column(connection, 'ingredients', 'price_unit', String())
+    add_column(connection, 'ingredients', 'calories', Float())
+
+    lines = table('recipe_ingredients', column('recipe_id', Integer), column('position', Integer), column('text'),
+                  column('quantity', Float), column('quantity_max', Float), column('unit'))
+    last = (0, -1)
+    while True:
+        rows = connection.execute(
+            lines.select().with_only_columns(lines.c.recipe_id, lines.c.position, lines.c.text)
+            .where(tuple_(lines.c.recipe_id, lines.c.position) > tuple_(*last))
+            .order_by(lines.c.recipe_id, lines.c.position).limit(batch_size)).all()
+        if not rows:
+            break
+        updates = [{'line_recipe': row.recipe_id, 'line_position': row.position, 'line_quantity': quantity,
+                    'line_quantity_max': quantity_max, 'line_unit': unit}
+                   for row in rows for quantity, quantity_max, unit, _ in [parse_ingredient(row.text)]
+                   if quantity is not None]
+        if updates:
+            connection.execute(
+                lines.update().where(lines.c.recipe_id == bindparam('line_recipe'),
+                                     lines.c.position == bindparam('line_position'))
+                .values(quantity=bindparam('line_quantity'), quantity_max=bindparam('line_quantity_max'),
+                        unit=bindparam('line_unit')),
+                updates)
+        last = (rows[-1].recipe_id, rows[-1].position)
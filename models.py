@@ -0,0 +1,101 @@
+from datetime import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+
+
+db = SQLAlchemy()
+
+# SQLAlchemy models
+class Recipe(db.Model):
+    __tablename__ = 'recipes'
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String, nullable=False)
+    author = db.Column(db.String)
+    date = db.Column(db.String)  # 'YYYY-MM-DD', as shown on the pages
+    prep_time = db.Column(db.Integer)
+    cook_time = db.Column(db.Integer)
+    ingredients = db.Column(db.Text)
+    instructions = db.Column(db.Text)
+    variations = db.Column(db.Text)
+    notes = db.Column(db.Text)
+    # Listings order by (created_at, id), so the newest recipes are an index range scan
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    images = db.relationship('RecipeImage', backref='recipe', lazy=True, cascade='all, delete-orphan')
+    ingredient_lines = db.relationship('RecipeIngredient', backref='recipe', lazy=True,
+                                       order_by='RecipeIngredient.position', cascade='all, delete-orphan')
+    __table_args__ = (
+        db.Index('ix_recipes_created_at_id', 'created_at', 'id'),
+    )
+
+class RecipeImage(db.Model):
+    __tablename__ = 'recipe_images'
+    id = db.Column(db.Integer, primary_key=True)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), nullable=False, index=True)
+    image_path = db.Column(db.String, nullable=False)
+    blob_hash = db.Column(db.String(64), db.ForeignKey('image_blobs.hash'), index=True)  # None for legacy uploads
+    # Filled in by the background image processor
+    status = db.Column(db.String, default='pending')  # pending, ready, failed or original
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    thumbnail_path = db.Column(db.String)
+    variants = db.Column(db.JSON)  # [{'width': 320, 'format': 'webp', 'path': ...}, ...]
+
+    # The original plus every generated variant
+    def file_paths(self):
+        return [self.image_path] + [variant['path'] for variant in self.variants or []]
+
+# One stored file per distinct photo, shared by every RecipeImage with the same content
+class ImageBlob(db.Model):
+    __tablename__ = 'image_blobs'
+    hash = db.Column(db.String(64), primary_key=True)  # SHA-256 of the file
+    path = db.Column(db.String, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    refcount = db.Column(db.Integer, nullable=False, default=0)  # RecipeImage rows using this blob
+    released_at = db.Column(db.DateTime, index=True)  # When it was stored or last became unreferenced
+
+# Keep ImageBlob.refcount in step with RecipeImage rows, whichever way they are added or deleted
+@db.event.listens_for(RecipeImage, 'after_insert')
+def reference_blob(mapper, connection, image):
+    if image.blob_hash:
+        connection.execute(ImageBlob.__table__.update().where(ImageBlob.hash == image.blob_hash).values(
+            refcount=ImageBlob.refcount + 1, released_at=None))
+
+@db.event.listens_for(RecipeImage, 'after_delete')
+def release_blob(mapper, connection, image):
+    if image.blob_hash:
+        connection.execute(ImageBlob.__table__.update().where(ImageBlob.hash == image.blob_hash).values(
+            refcount=ImageBlob.refcount - 1,
+            released_at=db.case((ImageBlob.refcount <= 1, datetime.now()), else_=ImageBlob.released_at)))
+
+# Normalized ingredients, parsed from Recipe.ingredients on write
+class Ingredient(db.Model):
+    __tablename__ = 'ingredients'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False, unique=True)  # Unique index doubles as the prefix lookup index
+    # Optional costing data, loaded with `flask import-prices`: cost and kcal per price_unit
+    price = db.Column(db.Float)
+    price_unit = db.Column(db.String)  # A key of ingredients.UNIT_SIZES, e.g. 'kg' or 'each'
+    calories = db.Column(db.Float)
+    words = db.relationship('IngredientWord', lazy=True, cascade='all, delete-orphan')
+
+# Each word of an ingredient name, so "basil" also finds "fresh basil"
+class IngredientWord(db.Model):
+    __tablename__ = 'ingredient_words'
+    word = db.Column(db.String, primary_key=True)
+    ingredient_id = db.Column(db.Integer, db.ForeignKey('ingredients.id'), primary_key=True)
+
+class RecipeIngredient(db.Model):
+    __tablename__ = 'recipe_ingredients'
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), primary_key=True)
+    position = db.Column(db.Integer, primary_key=True)
+    ingredient_id = db.Column(db.Integer, db.ForeignKey('ingredients.id'), nullable=False)
+    text = db.Column(db.String, nullable=False)  # The line as written, e.g. "2 cups tomato"
+    # Parsed from text by ingredients.parse_ingredient(); None when the line has no amount
+    quantity = db.Column(db.Float)
+    quantity_max = db.Column(db.Float)  # Upper end of a range such as "2-3", else the same as quantity
+    unit = db.Column(db.String)
+    ingredient = db.relationship('Ingredient')
+    __table_args__ = (
+        db.Index('ix_recipe_ingredients_ingredient_recipe', 'ingredient_id', 'recipe_id'),
+    )
@@ -0,0 +1,155 @@
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+# Rendered recipe PDFs, cached in memory and on disk.
+# Entries are keyed by recipe id and a content version, so an edited recipe never
+# serves a stale PDF; invalidate() just frees the space early.
+class PdfCache:
+    def __init__(self, app=None):
+        self.directory = None
+        self.max_disk_bytes = 0
+        self.max_memory_bytes = 0
+        self._memory = OrderedDict()  # recipe_id -> (version, data), least recently used first
+        self._memory_bytes = 0
+        self._disk_bytes = None  # Computed on first write
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.directory = app.config['PDF_CACHE_DIR']
+        self.max_disk_bytes = app.config['PDF_CACHE_MAX_BYTES']
+        self.max_memory_bytes = app.config['PDF_CACHE_MEMORY_BYTES']
+        app.extensions['pdf_cache'] = self
+
+    # Disk layout: <directory>/<shard>/<recipe_id>-<version>.pdf
+    def _shard(self, recipe_id):
+        return os.path.join(self.directory, f'{recipe_id % 256:02x}')
+
+    def _path(self, recipe_id, version):
+        return os.path.join(self._shard(recipe_id), f'{recipe_id}-{version}.pdf')
+
+    def get(self, recipe_id, version):
+        with self._lock:
+            entry = self._memory.get(recipe_id)
+            if entry and entry[0] == version:
+                self._memory.move_to_end(recipe_id)
+                return entry[1]
+
+        path = self._path(recipe_id, version)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+            os.utime(path)  # Mark as recently used for disk eviction
+        except OSError:
+            return None
+        self._remember(recipe_id, version, data)
+        return data
+
+    # Path of the cached file for this version, or None, so it can be sent straight from disk
+    def file_path(self, recipe_id, version):
+        if not self.max_disk_bytes:
+            return None
+        path = self._path(recipe_id, version)
+        try:
+            os.utime(path)  # Mark as recently used for disk eviction
+        except OSError:
+            return None
+        return path
+
+    def put(self, recipe_id, version, data):
+        self._remember(recipe_id, version, data)
+        if not self.max_disk_bytes:
+            return
+        shard = self._shard(recipe_id)
+        os.makedirs(shard, exist_ok=True)
+        path = self._path(recipe_id, version)
+        try:
+            replaced = os.path.getsize(path)  # Another worker rendered this version too
+        except OSError:
+            replaced = 0
+        # Write to a temporary file first so readers never see a partial PDF
+        fd, tmp_path = tempfile.mkstemp(dir=shard, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk_bytes()
+            else:
+                self._disk_bytes += len(data) - replaced
+        # Only then drop older versions: this one may be on its way to a client from file_path()
+        self._remove_files(recipe_id, keep=os.path.basename(path))
+        with self._lock:
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def invalidate(self, recipe_id):
+        with self._lock:
+            entry = self._memory.pop(recipe_id, None)
+            if entry:
+                self._memory_bytes -= len(entry[1])
+        self._remove_files(recipe_id)
+
+    def _remember(self, recipe_id, version, data):
+        if len(data) > self.max_memory_bytes:
+            return
+        with self._lock:
+            previous = self._memory.pop(recipe_id, None)
+            if previous:
+                self._memory_bytes -= len(previous[1])
+            self._memory[recipe_id] = (version, data)
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.max_memory_bytes:
+                _, (_, evicted) = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    # Delete the recipe's cached files, except the one named `keep`
+    def _remove_files(self, recipe_id, keep=None):
+        prefix = f'{recipe_id}-'
+        try:
+            names = os.listdir(self._shard(recipe_id))
+        except OSError:
+            return
+        for name in names:
+            if name.startswith(prefix) and name.endswith('.pdf') and name != keep:
+                path = os.path.join(self._shard(recipe_id), name)
+                try:
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                except OSError:
+                    continue
+                with self._lock:
+                    if self._disk_bytes is not None:
+                        self._disk_bytes -= size
+
+    def _cached_files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.pdf'):
+                    path = os.path.join(root, name)
+                    try:
+                        yield path, os.stat(path)
+                    except OSError:
+                        continue
+
+    def _scan_disk_bytes(self):
+        return sum(stat.st_size for _, stat in self._cached_files())
+
+    # Drop least recently used files until the cache is back under 90% of its cap
+    def _evict_disk(self):
+        files = sorted(self._cached_files(), key=lambda item: item[1].st_mtime)
+        total = sum(stat.st_size for _, stat in files)
+        target = self.max_disk_bytes * 0.9
+        for path, stat in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= stat.st_size
+            except OSError:
+                continue
+        self._disk_bytes = total
@@ -0,0 +1,99 @@
+import multiprocessing
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import threading
+
+
+# Plain copy of the recipe fields printed in a PDF, safe to send to worker processes
+RecipeSnapshot = namedtuple('RecipeSnapshot', [
+    'id', 'title', 'author', 'date', 'prep_time', 'cook_time',
+    'ingredients', 'instructions', 'variations', 'notes'
+])
+
+def snapshot(recipe):
+    return RecipeSnapshot(*(getattr(recipe, field) for field in RecipeSnapshot._fields))
+
+# FPDF's core fonts only cover latin-1: typographic punctuation is written as its plain
+# equivalent, and any other character outside latin-1 as '?'
+LATIN1_SUBSTITUTES = str.maketrans({
+    '\u2018': "'", '\u2019': "'", '\u201a': "'", '\u201c': '"', '\u201d': '"', '\u201e': '"',
+    '\u2013': '-', '\u2014': '-', '\u2212': '-', '\u2026': '...', '\u2022': '*', '\u2009': ' ', '\u202f': ' ',
+})
+
+def latin1(text):
+    return str(text or '').translate(LATIN1_SUBSTITUTES).encode('latin-1', errors='replace').decode('latin-1')
+
+# Render a recipe's PDF
+def render_recipe_pdf(recipe):
+    from fpdf import FPDF  # Imported by the first PDF rendered, not when the app starts
+
+    # Create PDF instance
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_margins(left=20, top=20, right=20)
+    
+    # Title styling
+    pdf.set_font("Helvetica", 'B', 14)
+    pdf.set_text_color(255, 71, 32)
+    pdf.cell(0, 10, txt=latin1(recipe.title), ln=True, align='C')
+    pdf.ln(5)
+
+    # Metadata styling
+    pdf.set_font("Helvetica", 'I', 12)
+    pdf.set_text_color(0, 0, 0)
+    pdf.multi_cell(0, 10, txt=latin1(f"Author: {recipe.author}"))
+    pdf.multi_cell(0, 10, txt=latin1(f"Date: {recipe.date}"))
+    pdf.multi_cell(0, 10, txt=latin1(f"Prep Time: {recipe.prep_time} minutes"))
+    pdf.multi_cell(0, 10, txt=latin1(f"Cook Time: {recipe.cook_time} minutes"))
+    pdf.ln(5)
+
+    # Ingredients styling
+    pdf.set_font("Arial", 'B', 12)
+    pdf.set_fill_color(240, 240, 240)
+    pdf.multi_cell(0, 10, txt="Ingredients:", fill=True)
+    pdf.set_font("Helvetica", '', 10)
+    pdf.multi_cell(0, 6, txt=latin1(recipe.ingredients))
+    pdf.ln(5)
+
+    # Instructions styling
+    pdf.set_font("Arial", 'B', 12)
+    pdf.multi_cell(0, 10, txt="Instructions:", fill=True)
+    pdf.set_font("Helvetica", '', 10)
+    pdf.multi_cell(0, 6, txt=latin1(recipe.instructions))
+    pdf.ln(5)
+
+    # Variations styling
+    pdf.set_font("Arial", 'B', 12)
+    pdf.multi_cell(0, 10, txt="Variations:", fill=True)
+    pdf.set_font("Helvetica", '', 10)
+    pdf.multi_cell(0, 6, txt=latin1(recipe.variations))
+    pdf.ln(5)
+
+    # Notes styling
+    pdf.set_font("Arial", 'B', 12)
+    pdf.multi_cell(0, 10, txt="Notes:", fill=True)
+    pdf.set_font("Helvetica", '', 10)
+    pdf.multi_cell(0, 6, txt=latin1(recipe.notes))
+
+    # Generate PDF in memory: FPDF builds the document as a latin-1 str, encoded to bytes once
+    return pdf.output(dest='S').encode('latin1')
+
+# Process pool for rendering many PDFs at once (FPDF is pure Python and holds the GIL).
+# Workers are started by a fork server, not forked from this process: its threads (log
+# writer, image workers, ...) could hold a lock at fork time that the child then never sees
+# released. The server imports FPDF once, so each worker starts with it loaded.
+_pool = None
+_pool_lock = threading.Lock()
+
+def render_pool(workers=None):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload(['pdf_render', 'fpdf'])
+            else:
+                context = multiprocessing.get_context('spawn')
+            _pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=context)
+    return _pool
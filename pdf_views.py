@@ -0,0 +1,146 @@
+import os
+import zipfile
+from datetime import datetime
+from io import BytesIO
+
+from flask import (Blueprint, Response, current_app, flash, make_response, redirect, request, send_file,
+                   stream_with_context, url_for)
+from werkzeug.utils import secure_filename  # For filename sanitization
+
+from catalog import recipe_version, search_recipe_ids
+from extensions import instrumentation, limiter, pdf_cache
+from models import db, Recipe
+from pdf_render import render_recipe_pdf, render_pool, snapshot
+from queries import in_ranked_order, newest_first
+
+
+# Recipe PDFs, one at a time or a whole menu as a ZIP
+bp = Blueprint('pdf', __name__)
+
+# Generate PDF
+@bp.route('/generate_pdf/<int:recipe_id>')
+# Limit PDF generation (resource-intensive); cached copies and 304s don't count
+@limiter.limit("5 per minute", deduct_when=lambda response: response.headers.get('X-PDF-Cache') == 'miss')
+def generate_pdf(recipe_id):
+    try:
+        recipe = Recipe.query.get_or_404(recipe_id)
+        version = recipe_version(recipe)
+
+        # The browser already has this version
+        if request.if_none_match.contains(version):
+            response = make_response('', 304)
+            response.set_etag(version)
+            response.headers['X-PDF-Cache'] = 'hit'
+            return response
+
+        # Cached PDFs are sent from the file (with sendfile() where the server supports it),
+        # so the document isn't read into memory; without a disk cache, from memory
+        path = pdf_cache.file_path(recipe_id, version)
+        pdf_bytes = None if path else pdf_cache.get(recipe_id, version)
+        cache_status = 'hit'
+        if path is None and pdf_bytes is None:
+            with instrumentation.timed('pdf'):
+                pdf_bytes = render_recipe_pdf(recipe)
+            pdf_cache.put(recipe_id, version, pdf_bytes)
+            path = pdf_cache.file_path(recipe_id, version)
+            cache_status = 'miss'
+
+        # Sanitize filename to prevent invalid characters
+        safe_title = secure_filename(recipe.title)
+        download_name = f"{safe_title}_{recipe.date}.pdf"
+
+        # Send PDF to browser for download or preview
+        response = send_file(
+            os.path.abspath(path) if path else BytesIO(pdf_bytes),
+            as_attachment=True,
+            download_name=download_name,
+            mimetype='application/pdf',
+            etag=version,
+            max_age=0
+        )
+        response.cache_control.private = True
+        response.cache_control.no_cache = True  # Revalidate with If-None-Match every time
+        response.headers['X-PDF-Cache'] = cache_status
+        return response
+    
+    except Exception as e:
+        current_app.logger.error('Error generating PDF for recipe %s: %s', recipe_id, e)
+        flash('Application cooked. Something went wrong.', 'error')
+        return f"Error generating PDF: {str(e)}", 500
+    
+# Menu export: recipe PDFs rendered in a process pool and streamed out as a ZIP
+class ChunkWriter:
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+# Recipe ids for a menu: explicit ids (in the given order), a search, or the newest recipes
+def menu_recipe_ids(ids=None, keyword=None, ingredient=None, limit=None):
+    limit = limit or current_app.config['MENU_EXPORT_MAX_RECIPES']
+    if ids:
+        return list(dict.fromkeys(ids))[:limit]
+    if keyword or ingredient:
+        return search_recipe_ids(keyword, ingredient)[:limit]
+    query = db.session.query(Recipe.id).order_by(*newest_first()).limit(limit)
+    return [row.id for row in query]
+
+# Yield (filename, pdf bytes) in menu order, a batch of recipes at a time
+def menu_pdfs(recipe_ids):
+    workers = current_app.config['PDF_EXPORT_WORKERS'] or os.cpu_count()
+    batch_size = workers * 4  # Bounds the rendered PDFs held in memory
+    for start in range(0, len(recipe_ids), batch_size):
+        recipes = in_ranked_order(Recipe.query, Recipe.id, recipe_ids[start:start + batch_size],
+                                  key=lambda recipe: recipe.id)
+        pending = []
+        for recipe in recipes:
+            version = recipe_version(recipe)
+            cached = pdf_cache.get(recipe.id, version)
+            rendering = None
+            if cached is None:
+                rendering = render_pool(workers).submit(render_recipe_pdf, snapshot(recipe))
+            pending.append((recipe.id, recipe.title, version, cached, rendering))
+        for offset, (recipe_id, title, version, cached, rendering) in enumerate(pending):
+            data = cached
+            if rendering is not None:
+                data = rendering.result()
+                pdf_cache.put(recipe_id, version, data)
+            yield f"{start + offset + 1:03d}_{secure_filename(title) or recipe_id}.pdf", data
+
+def stream_menu_zip(recipe_ids):
+    writer = ChunkWriter()
+    with zipfile.ZipFile(writer, 'w', zipfile.ZIP_STORED) as archive:  # FPDF pages are already compressed
+        for filename, data in menu_pdfs(recipe_ids):
+            archive.writestr(filename, data)
+            yield writer.drain()
+    yield writer.drain()
+
+def parse_ids(value):
+    return [int(part) for part in (value or '').split(',') if part.strip().isdigit()]
+
+# Export a menu of recipes as a ZIP of PDFs
+@bp.route('/menu/export')
+@limiter.limit("2 per minute")  # Renders up to MENU_EXPORT_MAX_RECIPES PDFs
+def export_menu():
+    recipe_ids = menu_recipe_ids(ids=parse_ids(request.args.get('ids')),
+                                 keyword=request.args.get('keyword'),
+                                 ingredient=request.args.get('ingredient'))
+    if not recipe_ids:
+        flash('No recipes to put on the menu.', 'info')
+        return redirect(request.referrer or url_for('recipes.index'))
+    current_app.logger.info('Exporting menu of %s recipes', len(recipe_ids))
+    return Response(
+        stream_with_context(stream_menu_zip(recipe_ids)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f"attachment; filename=menu_{datetime.now().strftime('%Y-%m-%d')}.zip"}
+    )
@@ -0,0 +1,142 @@
+import os
+from datetime import datetime, timedelta
+
+from flask import current_app, request, url_for
+
+from extensions import blob_store, image_processor, instrumentation
+from models import db, RecipeImage, ImageBlob
+
+
+# Recipe photos: storing uploads, cleaning up files no recipe uses, and their URLs.
+# Shared by the pages, the API and the command line.
+
+# Check if a filename has an allowed extension
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+
+# Claim a stored photo's row in the current transaction before reusing its file. The UPDATE
+# locks the row, so collect_image_garbage() can't delete it until this transaction commits,
+# and by then the new RecipeImage reference makes it no longer match. An unreferenced row
+# starts its grace period again. False when there is no row (never stored, or collected).
+def claim_blob(digest):
+    return db.session.execute(ImageBlob.__table__.update().where(ImageBlob.hash == digest).values(
+        released_at=db.case((ImageBlob.refcount <= 0, datetime.now()), else_=ImageBlob.released_at))).rowcount > 0
+
+# Store an uploaded file (deduplicated by content) and return its ImageBlob row
+def store_blob(stream, extension):
+    def existing_path(digest):
+        return db.session.get(ImageBlob, digest).path if claim_blob(digest) else None
+
+    with instrumentation.timed('image'):
+        digest, path, size = blob_store.save(stream, extension, existing_path=existing_path)
+    blob = db.session.get(ImageBlob, digest)
+    if blob is None:
+        try:
+            with db.session.begin_nested():
+                # Collected after the grace period unless a RecipeImage row comes to use it
+                blob = ImageBlob(hash=digest, path=path, size=size, refcount=0, released_at=datetime.now())
+                db.session.add(blob)
+        except db.exc.IntegrityError:
+            claim_blob(digest)  # Stored by a concurrent upload
+            blob = db.session.get(ImageBlob, digest)
+    return blob
+
+# Save uploaded photos for a recipe; returns the new RecipeImage rows that still need processing
+def save_uploaded_images(recipe_id):
+    new_images = []
+    if 'images' in request.files:
+        files = request.files.getlist('images')
+        for file in files:
+            if file and allowed_file(file.filename):
+                extension = file.filename.rsplit('.', 1)[1].lower()
+                blob = store_blob(file.stream, extension)
+                new_image = RecipeImage(
+                    recipe_id=recipe_id,
+                    image_path=blob.path,
+                    blob_hash=blob.hash
+                )
+                # Reuse variants already generated for the same photo
+                processed = RecipeImage.query.filter_by(blob_hash=blob.hash, status='ready').first()
+                if processed:
+                    new_image.status = processed.status
+                    new_image.width = processed.width
+                    new_image.height = processed.height
+                    new_image.thumbnail_path = processed.thumbnail_path
+                    new_image.variants = processed.variants
+                else:
+                    new_images.append(new_image)
+                db.session.add(new_image)
+    return new_images
+
+# Remove files of an upload made before content-addressed storage (blobs are garbage collected instead)
+def remove_legacy_image_files(image):
+    if image.blob_hash:
+        return
+    for path in image.file_paths():
+        if os.path.exists(path):
+            os.remove(path)
+
+# Delete stored photos that have had no references for the grace period
+def collect_image_garbage(grace_seconds=None):
+    if grace_seconds is None:
+        grace_seconds = current_app.config['IMAGE_GC_GRACE_SECONDS']
+    cutoff = datetime.now() - timedelta(seconds=grace_seconds)
+    # Rows stored before released_at was set on unreferenced photos have none
+    collectable = (ImageBlob.refcount <= 0, db.or_(ImageBlob.released_at <= cutoff, ImageBlob.released_at.is_(None)))
+    candidates = db.session.query(ImageBlob.hash, ImageBlob.path).filter(*collectable).all()
+    removed = 0
+    for digest, path in candidates:
+        # Recheck and delete the row, then the files, before committing. An upload of the same
+        # photo claims the row (claim_blob) before reusing its file: either the upload commits
+        # its reference first and the row no longer matches, or it waits for this commit, finds
+        # no row and stores the file again.
+        claimed = db.session.execute(ImageBlob.__table__.delete().where(
+            ImageBlob.hash == digest, *collectable)).rowcount
+        if claimed:
+            blob_store.delete(path, digest, os.path.join(current_app.config['UPLOAD_FOLDER'], 'variants'))
+            removed += 1
+        db.session.commit()
+    if removed:
+        current_app.logger.info('Garbage collected %s unreferenced photos', removed)
+    return removed
+
+# Move uploads saved under random names into the content-addressed store
+def adopt_legacy_images():
+    adopted = []
+    for image in RecipeImage.query.filter(RecipeImage.blob_hash.is_(None)).all():
+        if not os.path.exists(image.image_path):
+            continue
+        extension = image.image_path.rsplit('.', 1)[-1].lower()
+        with open(image.image_path, 'rb') as file:
+            blob = store_blob(file, extension)
+        old_paths = image.file_paths()
+        image.blob_hash = blob.hash
+        image.image_path = blob.path
+        image.status = 'pending'
+        image.variants = None
+        image.thumbnail_path = None
+        blob.refcount = ImageBlob.refcount + 1
+        blob.released_at = None
+        db.session.commit()
+        for path in old_paths:
+            if path != blob.path and os.path.exists(path):
+                os.remove(path)
+        adopted.append(image.id)
+    for image_id in adopted:
+        image_processor.run(image_id)
+    if adopted:
+        current_app.logger.info('Moved %s legacy uploads into content-addressed storage', len(adopted))
+    return adopted
+
+# URL for an uploaded photo or one of its variants
+def upload_url(path):
+    upload_folder = os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+    relative = os.path.relpath(os.path.abspath(path), upload_folder)
+    if relative.startswith('..'):
+        return url_for('static', filename=path.replace('static/', '', 1))
+    return url_for('gallery.uploaded_file', filename=relative.replace('\\', '/'))
+
+# srcset attribute value for one format of an image's variants
+def image_srcset(variants, image_format):
+    return ', '.join(f"{upload_url(variant['path'])} {variant['width']}w"
+                     for variant in variants or [] if variant['format'] == image_format)
@@ -0,0 +1,191 @@
+from flask import abort
+
+from models import db, Recipe, RecipeImage, Ingredient, IngredientWord, RecipeIngredient
+from ingredients import split_ingredients, ingredient_name
+from search_index import tokenize
+
+
+# Read queries used by the views.
+# Each function loads what its page renders in as few statements as possible,
+# selecting only the columns that are shown.
+
+CARD_INGREDIENT_PREVIEW = 3  # Ingredients shown on each recipe card
+GALLERY_BATCH = 500  # Gallery rows fetched at a time
+
+
+# A list of ids rendered inline, so one statement works however many ids there are
+def id_list(ids):
+    return db.bindparam('ids', list(ids), expanding=True, literal_execute=True, unique=True)
+
+
+# Fetch rows for a ranked list of recipe ids, keeping the ranking order
+def in_ranked_order(query, column, ranked_ids, key):
+    if not ranked_ids:
+        return []
+    rows = query.filter(column.in_(id_list(ranked_ids))).all()
+    position = {recipe_id: rank for rank, recipe_id in enumerate(ranked_ids)}
+    rows.sort(key=lambda row: position[key(row)])
+    return rows
+
+
+# Match a lowercase string column against a prefix with an index range scan
+def prefix_filter(column, prefix):
+    return db.and_(column >= prefix, column < prefix + '\uffff')
+
+
+# Newest first; matches ix_recipes_created_at_id, so the database reads the index backwards instead of sorting
+def newest_first(created_at=Recipe.created_at, recipe_id=Recipe.id):
+    return created_at.desc(), recipe_id.desc()
+
+
+# Recipes older than a keyset position (created_at, id), as one index range condition
+def older_than(created_at, recipe_id):
+    return db.tuple_(Recipe.created_at, Recipe.id) < db.tuple_(created_at, recipe_id)
+
+
+# Total number of recipes and the newest few (id, title, date), in one statement
+def recent_recipes(limit):
+    total = db.select(db.func.count(Recipe.id)).scalar_subquery()
+    rows = db.session.query(Recipe.id, Recipe.title, Recipe.date, total.label('total')).order_by(
+        *newest_first()).limit(limit).all()
+    return (rows[0].total if rows else 0), rows
+
+
+# Only the columns the recipe cards render, plus a count of the ingredients
+def recipe_card_query():
+    ingredient_count = db.select(db.func.count()).where(
+        RecipeIngredient.recipe_id == Recipe.id
+    ).scalar_subquery()
+    return db.session.query(
+        Recipe.id,
+        Recipe.title,
+        Recipe.date,
+        Recipe.created_at,
+        Recipe.prep_time,
+        Recipe.cook_time,
+        ingredient_count.label('ingredient_count')
+    )
+
+
+# Card dicts for the recipes selected by `page_query` (built on recipe_card_query()),
+# joined with their first few ingredient lines in the same statement.
+# `order` maps the page subquery to ORDER BY columns; cards come back in that order.
+def recipe_cards(page_query, order=None):
+    page = page_query.subquery()
+    query = db.session.query(page, RecipeIngredient.text).outerjoin(RecipeIngredient, db.and_(
+        RecipeIngredient.recipe_id == page.c.id,
+        RecipeIngredient.position < CARD_INGREDIENT_PREVIEW
+    ))
+    ordering = list(order(page)) if order else [page.c.id]
+    cards = {}
+    for row in query.order_by(*ordering, RecipeIngredient.position):
+        card = cards.get(row.id)
+        if card is None:
+            card = cards[row.id] = {
+                'id': row.id,
+                'title': row.title,
+                'date': row.date,
+                'created_at': row.created_at,
+                'prep_time': row.prep_time,
+                'cook_time': row.cook_time,
+                'ingredients': [],
+                'more_ingredients': row.ingredient_count or 0
+            }
+        if row.text is not None:
+            card['ingredients'].append(row.text)
+            card['more_ingredients'] -= 1
+    return list(cards.values())
+
+
+# Cards for a page of ranked recipe ids, in ranking order
+def ranked_recipe_cards(page_ids):
+    if not page_ids:
+        return []
+    cards = recipe_cards(recipe_card_query().filter(Recipe.id.in_(id_list(page_ids))))
+    position = {recipe_id: rank for rank, recipe_id in enumerate(page_ids)}
+    cards.sort(key=lambda card: position[card['id']])
+    return cards
+
+
+# A recipe with its images (joined) and ingredient lines (one extra select), or 404
+def recipe_with_details(recipe_id, ingredient_lines=True):
+    options = [db.joinedload(Recipe.images)]
+    if ingredient_lines:
+        options.append(db.selectinload(Recipe.ingredient_lines))
+    recipe = Recipe.query.options(*options).filter(Recipe.id == recipe_id).first()
+    if recipe is None:
+        abort(404)
+    return recipe
+
+
+# Gallery rows (image columns plus recipe id and title) in one joined statement.
+# With ranked_ids, a list of the images of those recipes, best match first. Without, every
+# image in upload order, fetched GALLERY_BATCH rows at a time as the page streams.
+def gallery_images(ranked_ids=None):
+    query = db.session.query(
+        RecipeImage.image_path,
+        RecipeImage.thumbnail_path,
+        RecipeImage.variants,
+        Recipe.id.label('recipe_id'),
+        Recipe.title
+    ).join(Recipe, RecipeImage.recipe_id == Recipe.id)
+    if ranked_ids is None:
+        return query.order_by(RecipeImage.id).yield_per(GALLERY_BATCH)
+    return in_ranked_order(query, RecipeImage.recipe_id, ranked_ids, key=lambda row: row.recipe_id)
+
+
+# Number of gallery images, and a version that changes whenever the full gallery would
+# (images added, removed or processed, recipes edited), in one statement
+def gallery_summary():
+    edited = db.select(db.func.max(Recipe.updated_at)).scalar_subquery()
+    row = db.session.query(db.func.count(RecipeImage.id), db.func.max(RecipeImage.id),
+                           db.func.count(RecipeImage.thumbnail_path), edited).one()
+    return row[0], tuple(row)
+
+
+# Ingredient ids whose name has a word starting with each word of `line`
+def matching_ingredients(line):
+    words = tokenize(ingredient_name(line))
+    if not words:
+        return None
+    matches = [db.select(IngredientWord.ingredient_id).where(prefix_filter(IngredientWord.word, word))
+               for word in words]
+    return matches[0] if len(matches) == 1 else db.intersect(*matches)
+
+
+# Ids of recipes containing every comma-separated ingredient, newest first
+def recipes_with_ingredients(ingredient):
+    matches = []
+    for line in split_ingredients(ingredient):
+        ingredient_ids = matching_ingredients(line)
+        if ingredient_ids is not None:
+            matches.append(db.select(RecipeIngredient.recipe_id).where(
+                RecipeIngredient.ingredient_id.in_(ingredient_ids)))
+    if not matches:
+        return []
+    matching = matches[0] if len(matches) == 1 else db.intersect(*matches)
+    query = db.session.query(Recipe.id).filter(Recipe.id.in_(matching))
+    return [row.id for row in query.order_by(*newest_first())]
+
+
+# Recipes with their ingredient lines for costing: the parsed amounts of each line and the
+# price and calories of its ingredient, in recipe and line order, in one statement.
+# A recipe without ingredient lines has one row, with text None.
+def costing_rows(recipe_ids):
+    if not recipe_ids:
+        return []
+    return db.session.query(
+        Recipe.id.label('recipe_id'),
+        Recipe.title,
+        RecipeIngredient.text,
+        RecipeIngredient.quantity,
+        RecipeIngredient.quantity_max,
+        RecipeIngredient.unit,
+        Ingredient.id.label('ingredient_id'),
+        Ingredient.name,
+        Ingredient.price,
+        Ingredient.price_unit,
+        Ingredient.calories
+    ).outerjoin(RecipeIngredient, RecipeIngredient.recipe_id == Recipe.id).outerjoin(
+        Ingredient, RecipeIngredient.ingredient_id == Ingredient.id
+    ).filter(Recipe.id.in_(id_list(recipe_ids))).order_by(Recipe.id, RecipeIngredient.position).all()
@@ -0,0 +1,234 @@
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+from limits.errors import ConfigurationError
+from limits.storage import SlidingWindowCounterSupport, Storage
+from limits.storage.base import TimestampedSlidingWindow
+
+
+MAGIC = b'RLSLOTS1'
+HEADER = struct.Struct('<8sQ')  # Magic, number of slots
+SLOT = struct.Struct('<Qdq')  # Key hash (0 = empty), expiry time, count
+BUCKET = 16  # Slots a key may use, read and locked together
+BUCKET_SLOTS = struct.Struct('<' + 'Qdq' * BUCKET)
+DEFAULT_SLOTS = 262144  # 6 MB; room for ~10,000 clients hitting several limited routes a day
+DEFAULT_PATH = 'cache/ratelimit.slots'
+THREAD_LOCKS = 64
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+
+
+# Locks buckets of a SharedMemoryStorage for a `with` block: the threads of this process with
+# thread locks, other processes with byte-range locks on the file (fcntl locks don't exclude
+# threads of the same process). Locks are taken in order, so holding two buckets can't deadlock.
+class _HeldBuckets:
+    def __init__(self, storage, buckets):
+        self.storage = storage
+        self.buckets = buckets
+        stripes = {bucket % THREAD_LOCKS for bucket in buckets}
+        self.thread_locks = [storage._thread_locks[stripe] for stripe in sorted(stripes)]
+
+    def __enter__(self):
+        for lock in self.thread_locks:
+            lock.acquire()
+        try:
+            for bucket in self.buckets:
+                fcntl.lockf(self.storage._fd, fcntl.LOCK_EX, BUCKET * SLOT.size, self.storage._offset(bucket))
+        except BaseException:
+            self._release_threads()
+            raise
+
+    def __exit__(self, *exc_info):
+        try:
+            for bucket in reversed(self.buckets):
+                fcntl.lockf(self.storage._fd, fcntl.LOCK_UN, BUCKET * SLOT.size, self.storage._offset(bucket))
+        finally:
+            self._release_threads()
+
+    def _release_threads(self):
+        for lock in reversed(self.thread_locks):
+            lock.release()
+
+
+# Rate-limit counters in a memory-mapped file shared by every worker process on the host,
+# for the fixed-window and sliding-window-counter strategies: `shm://cache/ratelimit.slots`.
+# The file is a fixed-size hash table (`?slots=` sets its size when it is created); each key
+# lives in one bucket of BUCKET slots, locked with a byte-range lock (fcntl, no I/O) and a
+# thread lock while it is read and updated. A full bucket
+# reuses the slot closest to expiring, so an overloaded table forgets counts instead of failing.
+# Counts stay in the file when every process exits, so limits carry over restarts; delete
+# the file, or use another one, to start from zero.
+class SharedMemoryStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    STORAGE_SCHEME = ['shm']
+
+    def __init__(self, uri=None, wrap_exceptions=False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        parsed = urlparse(uri or 'shm://')
+        self.path = (parsed.netloc + parsed.path) or DEFAULT_PATH
+        slots = int(parse_qs(parsed.query).get('slots', [DEFAULT_SLOTS])[0])
+        self._fd, self.slots = self._open(self.path, math.ceil(slots / BUCKET) * BUCKET)
+        self.buckets = self.slots // BUCKET
+        self._map = mmap.mmap(self._fd, HEADER.size + self.slots * SLOT.size)
+        self._thread_locks = [threading.Lock() for _ in range(THREAD_LOCKS)]
+        os.register_at_fork(after_in_child=self._reset_thread_locks)
+
+    @staticmethod
+    def _open(path, slots):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX)  # Only one process creates the table
+            if os.fstat(fd).st_size == 0:
+                os.ftruncate(fd, HEADER.size + slots * SLOT.size)
+                os.pwrite(fd, HEADER.pack(MAGIC, slots), 0)
+            magic, slots = HEADER.unpack(os.pread(fd, HEADER.size, 0))
+            if magic != MAGIC or os.fstat(fd).st_size != HEADER.size + slots * SLOT.size:
+                raise ConfigurationError(f'{path} is not a rate limit file; remove it to start over')
+            fcntl.lockf(fd, fcntl.LOCK_UN)
+        except Exception:
+            os.close(fd)
+            raise
+        return fd, slots
+
+    def _reset_thread_locks(self):
+        self._thread_locks = [threading.Lock() for _ in range(THREAD_LOCKS)]
+
+    @property
+    def base_exceptions(self):
+        return OSError
+
+    # Hold the buckets of the given key hashes (or bucket numbers): `with self._locked(key_hash):`
+    def _locked(self, *hashes):
+        if len(hashes) == 1:
+            return _HeldBuckets(self, [hashes[0] % self.buckets])
+        return _HeldBuckets(self, sorted({key_hash % self.buckets for key_hash in hashes}))
+
+    def _offset(self, bucket):
+        return HEADER.size + bucket * BUCKET * SLOT.size
+
+    # Slot access; callers hold the bucket's lock
+
+    def _find(self, key_hash, now):
+        offset = self._offset(key_hash % self.buckets)
+        values = BUCKET_SLOTS.unpack_from(self._map, offset)
+        hashes = values[::3]
+        if key_hash in hashes:
+            index = hashes.index(key_hash)
+            expires, count = values[index * 3 + 1:index * 3 + 3]
+            if expires > now:
+                return offset + index * SLOT.size, expires, count
+        return None, now, 0
+
+    # The slot to use for a new key: its expired slot, an empty one, or else the one expiring
+    # soonest. A key never has two slots, so _find only needs the first match.
+    def _claim(self, key_hash):
+        offset = self._offset(key_hash % self.buckets)
+        values = BUCKET_SLOTS.unpack_from(self._map, offset)
+        hashes = values[::3]
+        if key_hash in hashes:
+            return offset + hashes.index(key_hash) * SLOT.size
+        expiries = values[1::3]
+        return offset + expiries.index(min(expiries)) * SLOT.size
+
+    def _add(self, key_hash, expiry, amount, now):
+        position, expires, count = self._find(key_hash, now)
+        if position is None:
+            position, expires, count = self._claim(key_hash), now + expiry, 0
+        count = max(count + amount, 0)
+        SLOT.pack_into(self._map, position, key_hash, expires, count)
+        return count
+
+    def _count(self, key_hash, now):
+        return self._find(key_hash, now)[2]
+
+    # Fixed window
+
+    def incr(self, key, expiry, amount=1):
+        key_hash = _hash(key)
+        with self._locked(key_hash):
+            return self._add(key_hash, expiry, amount, time.time())
+
+    def decr(self, key, amount=1):
+        key_hash = _hash(key)
+        with self._locked(key_hash):
+            now = time.time()
+            position, expires, count = self._find(key_hash, now)
+            if position is None:
+                return 0
+            count = max(count - amount, 0)
+            SLOT.pack_into(self._map, position, key_hash, expires, count)
+            return count
+
+    def get(self, key):
+        key_hash = _hash(key)
+        with self._locked(key_hash):
+            return self._count(key_hash, time.time())
+
+    def get_expiry(self, key):
+        key_hash = _hash(key)
+        with self._locked(key_hash):
+            return self._find(key_hash, time.time())[1]
+
+    def clear(self, key):
+        key_hash = _hash(key)
+        with self._locked(key_hash):
+            position = self._find(key_hash, time.time())[0]
+            if position is not None:
+                SLOT.pack_into(self._map, position, 0, 0.0, 0)
+
+    def check(self):
+        return not self._map.closed
+
+    def reset(self):
+        cleared = 0
+        for bucket in range(self.buckets):
+            offset = self._offset(bucket)
+            with self._locked(bucket):
+                values = BUCKET_SLOTS.unpack_from(self._map, offset)
+                cleared += sum(1 for index in range(BUCKET) if values[index * 3])
+                self._map[offset:offset + BUCKET * SLOT.size] = bytes(BUCKET * SLOT.size)
+        return cleared
+
+    # Sliding window counter: the previous window's count, weighted by how much of it is still
+    # inside the sliding window, plus the current one's. Both are read and updated under one lock.
+
+    def _sliding_window(self, previous_hash, current_hash, expiry, now):
+        previous_count = self._count(previous_hash, now)
+        current_count = self._count(current_hash, now)
+        previous_ttl = (1 - (((now - expiry) / expiry) % 1)) * expiry if previous_count else 0.0
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(self, key, limit, expiry, amount=1):
+        if amount > limit:
+            return False
+        now = time.time()
+        previous_hash, current_hash = (_hash(window) for window in self.sliding_window_keys(key, expiry, now))
+        with self._locked(previous_hash, current_hash):
+            previous_count, previous_ttl, current_count, _ = self._sliding_window(
+                previous_hash, current_hash, expiry, now)
+            if math.floor(previous_count * previous_ttl / expiry + current_count) + amount > limit:
+                return False
+            self._add(current_hash, 2 * expiry, amount, now)
+            return True
+
+    def get_sliding_window(self, key, expiry):
+        now = time.time()
+        previous_hash, current_hash = (_hash(window) for window in self.sliding_window_keys(key, expiry, now))
+        with self._locked(previous_hash, current_hash):
+            return self._sliding_window(previous_hash, current_hash, expiry, now)
+
+    def clear_sliding_window(self, key, expiry):
+        for window in self.sliding_window_keys(key, expiry, time.time()):
+            self.clear(window)
@@ -0,0 +1,174 @@
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+
+# Cache backends share one interface:
+#   get(key) -> value or None, set(key, value, ttl), delete(keys), clear()
+
+# In-process LRU with a time-to-live per entry (each worker process has its own)
+class MemoryBackend:
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Pickled entries in a local directory, shared by every worker process on the host
+class DiskBackend:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, key):
+        name = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, name[:2], f'{name}.cache')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                expires_at, value = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires_at < time.time():
+            self._remove(path)
+            return None
+        return value
+
+    def set(self, key, value, ttl):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            pickle.dump((time.time() + ttl, value), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def delete(self, keys):
+        for key in keys:
+            self._remove(self._path(key))
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+BACKENDS = ('memory', 'disk', 'none')
+
+
+# Read-through cache for hot pages and aggregates.
+# Entries are dropped when the rows they were built from are committed
+# (see invalidate_on); the TTL bounds anything that slips past that.
+class ReadCache:
+    PENDING_KEY = 'read_cache_pending'
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = 0
+        self._invalidations = {}  # model -> keys(target)
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        name = app.config['READ_CACHE_BACKEND']
+        if name not in BACKENDS:
+            raise ValueError(f"READ_CACHE_BACKEND must be one of {', '.join(BACKENDS)}, not {name!r}")
+        if name == 'memory':
+            self.backend = MemoryBackend(app.config['READ_CACHE_MAX_ENTRIES'])
+        elif name == 'disk':
+            self.backend = DiskBackend(app.config['READ_CACHE_DIR'])
+        self.ttl = app.config['READ_CACHE_TTL']
+        app.extensions['read_cache'] = self
+        # Session events are global: listen once, however many apps are created
+        if not self._listening:
+            self._listening = True
+            event.listen(Session, 'after_commit', self._apply_pending)
+            event.listen(Session, 'after_soft_rollback', self._discard_pending)
+
+    @property
+    def enabled(self):
+        return self.backend is not None and self.ttl > 0
+
+    # Cached value for `key`, calling `loader()` and storing its result on a miss.
+    # Values must be picklable (plain data, not ORM objects) and never None.
+    def get_or_set(self, key, loader, ttl=None):
+        if not self.enabled:
+            return loader()
+        value = self.backend.get(key)
+        if value is None:
+            value = loader()
+            self.backend.set(key, value, ttl or self.ttl)
+        return value
+
+    def delete(self, *keys):
+        if self.enabled:
+            self.backend.delete(keys)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    # Drop keys(target) once an insert, update or delete of a `model` row is committed.
+    # Calling it again for the same model (e.g. from another create_app()) replaces its keys.
+    def invalidate_on(self, model, keys):
+        registered = model in self._invalidations
+        self._invalidations[model] = keys
+        if registered:
+            return
+
+        def record(mapper, connection, target):
+            session = object_session(target)
+            if session is not None:
+                session.info.setdefault(self.PENDING_KEY, set()).update(self._invalidations[model](target))
+        for name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(model, name, record)
+
+    def _apply_pending(self, session):
+        keys = session.info.pop(self.PENDING_KEY, None)
+        if keys:
+            self.delete(*keys)
+
+    def _discard_pending(self, session, previous_transaction):
+        session.info.pop(self.PENDING_KEY, None)
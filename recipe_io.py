@@ -0,0 +1,136 @@
+import io
+import json
+import os
+import tarfile
+import tempfile
+from datetime import datetime
+
+from werkzeug.datastructures import MultiDict
+
+
+# Fields a client may set on a recipe (validated by RecipeForm)
+RECIPE_FIELDS = ('title', 'author', 'prep_time', 'cook_time', 'ingredients', 'instructions', 'variations', 'notes')
+# Fields written by exports; `id` is ignored and `date` kept when importing
+EXPORT_FIELDS = ('id', 'title', 'author', 'date') + RECIPE_FIELDS[2:]
+DATE_FORMAT = '%Y-%m-%d'
+
+
+# The start of the day in a date string (DATE_FORMAT, or ISO with a time), or None
+def parse_date(value):
+    try:
+        return datetime.strptime(str(value)[:10], DATE_FORMAT) if value else None
+    except ValueError:
+        return None
+
+
+# created_at for a recipe dated `date`: now for today's recipes, so they keep the order they
+# were added in, otherwise the start of that day
+def created_at_for(date, now=None):
+    now = now or datetime.now()
+    if not date or date == now.strftime(DATE_FORMAT):
+        return now
+    return parse_date(date) or now
+
+
+# Check a recipe dict (from JSON) with the same rules as the HTML form.
+# `form` is a RecipeForm built without CSRF; one instance can check any number of recipes.
+# `current` holds existing values for partial updates.
+# Returns (values, errors): column values ready for Recipe, or a {field: [messages]} dict.
+def validate_recipe(data, form, current=None):
+    if not isinstance(data, dict):
+        return None, {'recipe': ['Expected a JSON object.']}
+    fields = dict(current or {})
+    fields.update({field: value for field, value in data.items() if field in RECIPE_FIELDS})
+    if isinstance(fields.get('ingredients'), list):
+        fields['ingredients'] = ', '.join(str(line) for line in fields['ingredients'])
+    formdata = MultiDict({field: value for field, value in fields.items() if value is not None})
+    form.process(formdata)
+    errors = {} if form.validate() else dict(form.errors)
+    errors.update({field: ['Unknown field.'] for field in sorted(set(data) - set(EXPORT_FIELDS))})
+
+    values = {field: form[field].data for field in RECIPE_FIELDS}
+    if data.get('date') is not None:
+        date = parse_date(data['date'])
+        if date:
+            values['date'] = date.strftime(DATE_FORMAT)
+        else:
+            errors['date'] = [f'Expected a date like {datetime.now().strftime(DATE_FORMAT)}.']
+    return (None, errors) if errors else (values, None)
+
+
+# Parse newline-delimited JSON from a binary or text stream without reading it all at once.
+# Yields (line_number, value, error) for every non-blank line.
+def read_ndjson(stream):
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line), None
+        except ValueError as e:
+            yield number, None, f'Invalid JSON: {e}'
+
+
+# One NDJSON line for a value
+def ndjson_line(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+# Backup archives (.tar.gz), written and read in one pass:
+#   manifest.json   {'format', 'created', 'recipes', 'images'}
+#   images/<name>   photo files, each stored once
+#   recipes.ndjson  one recipe per line, with 'images': [archive names]
+ARCHIVE_FORMAT = 1
+ARCHIVE_MANIFEST = 'manifest.json'
+ARCHIVE_RECIPES = 'recipes.ndjson'
+ARCHIVE_IMAGE_DIR = 'images/'
+
+
+# Archive name for a photo file: blobs by content hash, older uploads by row id
+def archive_image_name(blob_hash, path, image_id):
+    extension = os.path.splitext(path)[1].lower()
+    return f'{ARCHIVE_IMAGE_DIR}{blob_hash or f"legacy-{image_id}"}{extension}'
+
+
+def _add_bytes(archive, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(datetime.now().timestamp())
+    archive.addfile(info, fileobj=io.BytesIO(data))
+
+
+# Write a backup archive. `images` yields (archive name, file path) pairs and `recipe_lines`
+# yields NDJSON lines; recipe lines are spooled to a temporary file because tar needs each
+# member's size up front.
+def write_archive(path, manifest, images, recipe_lines):
+    manifest = {'format': ARCHIVE_FORMAT, 'created': datetime.now().isoformat(timespec='seconds'), **manifest}
+    with tarfile.open(path, 'w:gz') as archive:
+        _add_bytes(archive, ARCHIVE_MANIFEST, json.dumps(manifest).encode())
+        for name, file_path in images:
+            archive.add(file_path, arcname=name, recursive=False)
+        with tempfile.TemporaryFile() as spool:
+            for line in recipe_lines:
+                spool.write(line.encode())
+            info = tarfile.TarInfo(ARCHIVE_RECIPES)
+            info.size = spool.tell()
+            info.mtime = int(datetime.now().timestamp())
+            spool.seek(0)
+            archive.addfile(info, fileobj=spool)
+
+
+# Read a backup archive sequentially. Yields ('manifest', dict), then ('image', name, file)
+# for each photo, then ('recipes', file); files are only readable until the next item.
+def read_archive(path):
+    with tarfile.open(path, 'r|gz') as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            file = archive.extractfile(member)
+            if member.name == ARCHIVE_MANIFEST:
+                manifest = json.load(file)
+                if manifest.get('format') != ARCHIVE_FORMAT:
+                    raise ValueError(f"Unsupported archive format {manifest.get('format')!r}")
+                yield 'manifest', manifest
+            elif member.name.startswith(ARCHIVE_IMAGE_DIR):
+                yield 'image', member.name, file
+            elif member.name == ARCHIVE_RECIPES:
+                yield 'recipes', file
@@ -0,0 +1,223 @@
+from datetime import datetime
+
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, url_for
+from markupsafe import Markup
+
+from catalog import home_summary, recipe_details, recipe_page, remove_recipe, scale_factor, sync_ingredients
+from extensions import http_cache, image_processor, limiter, pdf_cache, read_cache
+from forms import RecipeForm
+from models import db, Recipe, RecipeImage
+from photos import collect_image_garbage, remove_legacy_image_files, save_uploaded_images
+from queries import costing_rows, recipe_with_details
+
+
+# Recipe pages: the home page and its infinite scroll, and adding, viewing, editing and deleting recipes
+bp = Blueprint('recipes', __name__)
+
+# Recipe cards per page: RECIPES_PER_PAGE, or ?per_page= up to MAX_RECIPES_PER_PAGE
+def get_page_size():
+    page_size = request.args.get('per_page', current_app.config['RECIPES_PER_PAGE'], type=int)
+    return max(1, min(page_size, current_app.config['MAX_RECIPES_PER_PAGE']))
+
+# Links to the following page: a full page for plain links, a JSON fragment for infinite scroll
+def next_page_urls(next_cursor, **params):
+    if not next_cursor:
+        return None, None
+    params = {key: value for key, value in params.items() if value}
+    endpoint = 'search.search' if params else 'recipes.index'
+    if 'per_page' in request.args:
+        params['per_page'] = get_page_size()
+    return (url_for(endpoint, cursor=next_cursor, **params),
+            url_for('recipes.more_recipes', cursor=next_cursor, **params))
+
+# Home page - Display all recipes
+@bp.route('/')
+def index():
+    # Get total recipes and recent recipes
+    total_recipes, recently_added = home_summary(8)
+    
+    # Get the first page of recipes (or the page after ?cursor=); the default first page is cached
+    cursor = request.args.get('cursor')
+    if cursor or 'per_page' in request.args:
+        recipes, next_cursor, _ = recipe_page(cursor=cursor, page_size=get_page_size())
+    else:
+        recipes, next_cursor = read_cache.get_or_set('recipes:first-page', lambda: recipe_page()[:2])
+    next_url, more_url = next_page_urls(next_cursor)
+    
+    results = f"Showing all {total_recipes} recipes in the database:"
+
+    not_modified = http_cache.not_modified(total_recipes, recently_added, recipes, next_cursor)
+    if not_modified:
+        return not_modified
+    
+    if not recipes:
+        message = "You don't have any recipes yet. Why not add your first one?"
+        return render_template('index.html', 
+                            recipes=recipes, 
+                            message=message, 
+                            total_recipes=total_recipes, 
+                            recently_added=recently_added)
+    
+    return render_template('index.html', 
+                         recipes=recipes, 
+                         total_recipes=total_recipes, 
+                         recently_added=recently_added, 
+                         results=results,
+                         next_url=next_url,
+                         more_url=more_url)
+
+# Next page of recipe cards for infinite scroll
+@bp.route('/recipes/more')
+@limiter.limit("60 per minute")  # Scrolling fetches pages in quick succession
+def more_recipes():
+    keyword = request.args.get('keyword')
+    ingredient = request.args.get('ingredient')
+    recipes, next_cursor, _ = recipe_page(keyword=keyword,
+                                          ingredient=ingredient,
+                                          cursor=request.args.get('cursor'),
+                                          page_size=get_page_size())
+    next_url, more_url = next_page_urls(next_cursor, keyword=keyword, ingredient=ingredient)
+    return jsonify(
+        html=render_template('partials/recipe_cards.html', recipes=recipes),
+        next_url=next_url,
+        more_url=more_url
+    )
+
+# Add a new recipe
+@bp.route('/add', methods=['GET', 'POST'])
+@limiter.limit("10 per minute")  # Limit recipe creation
+def add_recipe():
+    form = RecipeForm()
+    if request.method == 'POST' and form.validate_on_submit():
+        current_app.logger.info('Adding new recipe: %s', form.title.data)
+        try:
+            new_recipe = Recipe(
+                title=form.title.data,
+                author=form.author.data,
+                date=datetime.now().strftime('%Y-%m-%d'),
+                prep_time=form.prep_time.data,
+                cook_time=form.cook_time.data,
+                ingredients=form.ingredients.data,
+                instructions=form.instructions.data,
+                variations=form.variations.data,
+                notes=form.notes.data
+            )
+            db.session.add(new_recipe)
+            db.session.flush()
+            sync_ingredients(new_recipe)
+
+            # Handle image uploads
+            new_images = save_uploaded_images(new_recipe.id)
+            
+            db.session.commit()
+            image_processor.submit([image.id for image in new_images])
+            current_app.logger.info('Successfully added recipe %s with %s images', new_recipe.id, len(new_images))
+            flash('Recipe added successfully!', 'success')
+            return redirect(url_for('recipes.index'))
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error('Error adding recipe: %s', e)
+            flash('Error adding recipe. Please try again.', 'error')
+            return render_template('add_recipe.html', form=form)
+    return render_template('add_recipe.html', form=form)
+
+# View a single recipe; with ?covers= (and ?servings=) or ?factor=, also scaled and costed
+@bp.route('/recipe/<int:recipe_id>')
+def view_recipe(recipe_id):
+    recipe = recipe_details(recipe_id)
+    scaling = scale_error = None
+    if request.args.get('covers') or request.args.get('factor'):
+        factor = scale_factor(request.args)
+        if factor is None:
+            scale_error = f"Enter positive numbers, scaling the recipe up to {current_app.config['MAX_SCALE_FACTOR']} times."
+        else:
+            from costing import cost_recipes  # Loads NumPy, so only once a recipe is scaled
+            scaling = cost_recipes(costing_rows([recipe_id]), {recipe_id: factor})
+    not_modified = http_cache.not_modified(recipe, scaling, scale_error)
+    if not_modified:
+        return not_modified
+    detail = read_cache.get_or_set(f'fragment:recipe:{recipe_id}', lambda: render_template(
+        'partials/recipe_detail.html',
+        recipe=recipe,
+        ingredients_list=recipe['ingredients_list'],
+        images=recipe['images']))
+    return render_template('view_recipe.html', 
+                         recipe=recipe, 
+                         detail=Markup(detail),
+                         scaling=scaling,
+                         scale_error=scale_error)
+
+# Update a recipe
+@bp.route('/update/<int:recipe_id>', methods=['GET', 'POST'])
+@limiter.limit("20 per minute")  # Limit recipe updates
+def update_recipe(recipe_id):
+    recipe = recipe_with_details(recipe_id)
+    form = RecipeForm()
+
+    if request.method == 'POST' and form.validate_on_submit():
+        current_app.logger.info('Updating recipe %s', recipe_id)
+        try:
+            recipe.title = form.title.data
+            recipe.author = form.author.data
+            recipe.prep_time = form.prep_time.data
+            recipe.cook_time = form.cook_time.data
+            recipe.ingredients = form.ingredients.data
+            recipe.instructions = form.instructions.data
+            recipe.variations = form.variations.data
+            recipe.notes = form.notes.data
+            sync_ingredients(recipe)
+
+            new_images = save_uploaded_images(recipe_id)
+
+            db.session.commit()
+            image_processor.submit([image.id for image in new_images])
+            pdf_cache.invalidate(recipe_id)
+            current_app.logger.info('Successfully updated recipe %s with %s new images', recipe_id, len(new_images))
+            flash('Recipe updated successfully!', 'success')
+            return redirect(url_for('recipes.view_recipe', recipe_id=recipe_id))
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error('Error updating recipe %s: %s', recipe_id, e)
+            flash('Error updating recipe. Please try again.', 'error')
+    
+    # Populate form with existing data for GET request
+    form.title.data = recipe.title
+    form.author.data = recipe.author
+    form.prep_time.data = recipe.prep_time
+    form.cook_time.data = recipe.cook_time
+    form.ingredients.data = recipe.ingredients
+    form.instructions.data = recipe.instructions
+    form.variations.data = recipe.variations
+    form.notes.data = recipe.notes
+    
+    return render_template('update_recipe.html', form=form, recipe=recipe, images=recipe.images)
+
+# Delete a recipe
+@bp.route('/delete_recipe/<int:recipe_id>', methods=['GET', 'POST'])
+@limiter.limit("5 per minute")  # Stricter limit for deletions
+def delete_recipe(recipe_id):
+    recipe = recipe_with_details(recipe_id)
+    current_app.logger.info('Attempting to delete recipe %s', recipe_id)
+    try:
+        remove_recipe(recipe)
+        current_app.logger.info('Successfully deleted recipe %s', recipe_id)
+        flash('Recipe and associated images deleted successfully!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error('Error deleting recipe %s: %s', recipe_id, e)
+        flash('Error deleting recipe. Please try again.', 'error')
+    return redirect(url_for('recipes.index'))
+
+# Delete an image
+@bp.route('/delete_image/<int:image_id>')
+@limiter.limit("5 per minute")  # Stricter limit for image deletions
+def delete_image(image_id):
+    image = RecipeImage.query.get_or_404(image_id)
+    
+    remove_legacy_image_files(image)
+    
+    db.session.delete(image)
+    db.session.commit()
+    image_processor.defer(collect_image_garbage)
+    flash('Bleep blop! Image deleted successfully.', 'success')
+    return redirect(request.referrer)
@@ -0,0 +1,287 @@
+import bisect
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, object_session
+
+
+# Fields that are searchable, with the weight each one carries when ranking
+FIELD_WEIGHTS = {'title': 10.0, 'ingredients': 1.0}
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+# Split text into lowercase, accent-free terms (matches FTS5 "unicode61 remove_diacritics 2")
+def tokenize(value):
+    if not value:
+        return []
+    if value.isascii():
+        return TOKEN_PATTERN.findall(value.lower())  # Nothing to fold
+    folded = unicodedata.normalize('NFKD', value.lower())
+    folded = ''.join(char for char in folded if not unicodedata.combining(char))
+    return TOKEN_PATTERN.findall(folded)
+
+
+# SQLite FTS5 external-content table kept in sync with `recipes` by triggers
+class Fts5Backend:
+    name = 'fts5'
+
+    def __init__(self, table_name='recipes', fts_name='recipes_fts'):
+        self.table_name = table_name
+        self.fts_name = fts_name
+
+    def ddl(self):
+        table, fts = self.table_name, self.fts_name
+        columns = ', '.join(FIELD_WEIGHTS)
+        new_values = ', '.join(f'new.{column}' for column in FIELD_WEIGHTS)
+        old_values = ', '.join(f'old.{column}' for column in FIELD_WEIGHTS)
+        return [
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({columns}, content='{table}', "
+            f"content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+            f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+            f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END",
+            f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {columns} ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+        ]
+
+    # Create the index (and backfill it from existing rows) if it is missing
+    def create(self, engine):
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {'name': self.fts_name}
+            ).first()
+            if exists:
+                return
+            for statement in self.ddl():
+                conn.execute(text(statement))
+            conn.execute(text(f"INSERT INTO {self.fts_name}({self.fts_name}) VALUES ('rebuild')"))
+
+    # Build an FTS5 MATCH expression: every term is a prefix query and all terms must match
+    @staticmethod
+    def match_expression(keyword, ingredient):
+        clauses = []
+        keyword_terms = tokenize(keyword)
+        ingredient_terms = tokenize(ingredient)
+        if keyword_terms:
+            clauses.append(' '.join(f'"{term}"*' for term in keyword_terms))
+        if ingredient_terms:
+            clauses.append('ingredients : (' + ' '.join(f'"{term}"*' for term in ingredient_terms) + ')')
+        return ' AND '.join(clauses)
+
+    def search(self, engine, keyword=None, ingredient=None, limit=None):
+        expression = self.match_expression(keyword, ingredient)
+        if not expression:
+            return []
+        weights = ', '.join(str(weight) for weight in FIELD_WEIGHTS.values())
+        sql = (
+            f"SELECT rowid FROM {self.fts_name} WHERE {self.fts_name} MATCH :expression "
+            f"ORDER BY bm25({self.fts_name}, {weights}), rowid DESC"
+        )
+        params = {'expression': expression}
+        if limit:
+            sql += ' LIMIT :limit'
+            params['limit'] = limit
+        with engine.connect() as conn:
+            return [row[0] for row in conn.execute(text(sql), params)]
+
+
+# Pure-Python inverted index used for databases without FTS5
+# Note: each worker process keeps its own copy, built from the table on first use
+class InvertedIndex:
+    name = 'memory'
+
+    def __init__(self):
+        self._postings = {field: defaultdict(dict) for field in FIELD_WEIGHTS}  # field -> term -> {id: tf}
+        self._documents = {}  # id -> {field: Counter}
+        self._vocabulary = []  # sorted list of every indexed term, for prefix lookups
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add(self, recipe_id, **fields):
+        with self._lock:
+            self.remove(recipe_id)
+            document = {field: Counter(tokenize(fields.get(field))) for field in FIELD_WEIGHTS}
+            self._documents[recipe_id] = document
+            for field, counts in document.items():
+                for term, frequency in counts.items():
+                    if not self._has_term(term):
+                        bisect.insort(self._vocabulary, term)
+                    self._postings[field][term][recipe_id] = frequency
+
+    def remove(self, recipe_id):
+        with self._lock:
+            document = self._documents.pop(recipe_id, None)
+            if not document:
+                return
+            for field, counts in document.items():
+                postings = self._postings[field]
+                for term in counts:
+                    postings[term].pop(recipe_id, None)
+                    if not postings[term]:
+                        del postings[term]
+                    if not self._has_term(term):
+                        index = bisect.bisect_left(self._vocabulary, term)
+                        del self._vocabulary[index]
+
+    def clear(self):
+        with self._lock:
+            for postings in self._postings.values():
+                postings.clear()
+            self._documents.clear()
+            self._vocabulary.clear()
+
+    def _has_term(self, term):
+        return any(term in postings for postings in self._postings.values())
+
+    # Every indexed term starting with `prefix`
+    def _expand(self, prefix):
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        for term in self._vocabulary[start:]:
+            if not term.startswith(prefix):
+                break
+            yield term
+
+    # Score each document containing a term beginning with `prefix` (tf-idf, field weighted)
+    def _score_prefix(self, prefix, fields):
+        total = len(self._documents) or 1
+        scores = defaultdict(float)
+        for term in self._expand(prefix):
+            for field in fields:
+                postings = self._postings[field].get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + total / len(postings))
+                for recipe_id, frequency in postings.items():
+                    scores[recipe_id] += FIELD_WEIGHTS[field] * (1 + math.log(frequency)) * idf
+        return scores
+
+    def search(self, keyword=None, ingredient=None, limit=None):
+        clauses = [(term, tuple(FIELD_WEIGHTS)) for term in tokenize(keyword)]
+        clauses += [(term, ('ingredients',)) for term in tokenize(ingredient)]
+        if not clauses:
+            return []
+        with self._lock:
+            totals = None
+            for prefix, fields in clauses:
+                scores = self._score_prefix(prefix, fields)
+                if totals is None:
+                    totals = scores
+                else:
+                    totals = {recipe_id: score + scores[recipe_id]
+                              for recipe_id, score in totals.items() if recipe_id in scores}
+                if not totals:
+                    return []
+        ranked = sorted(totals.items(), key=lambda item: (-item[1], -item[0]))
+        if limit:
+            ranked = ranked[:limit]
+        return [recipe_id for recipe_id, _ in ranked]
+
+
+# Full-text search over recipe titles and ingredients.
+# Uses SQLite FTS5 when available and falls back to an in-memory inverted index.
+class RecipeSearchIndex:
+    PENDING_KEY = 'search_index_pending'
+
+    def __init__(self, db=None, model=None):
+        self.db = db
+        self.model = model
+        self.backend = None
+        self._lock = threading.Lock()
+        self._listening = False
+
+    def init_app(self, app, db, model):
+        self.db = db
+        self.model = model
+        app.extensions['search_index'] = self
+
+    # Create or build the index the first time it is needed
+    def ensure(self):
+        if self.backend is not None:
+            return self.backend
+        with self._lock:
+            if self.backend is None:
+                self.backend = self._create_backend()
+        return self.backend
+
+    def _create_backend(self):
+        engine = self.db.engine
+        if engine.dialect.name == 'sqlite':
+            backend = Fts5Backend(self.model.__tablename__)
+            try:
+                backend.create(engine)
+                return backend
+            except OperationalError:
+                pass  # SQLite built without FTS5
+        backend = InvertedIndex()
+        self._listen()
+        self._build(backend, engine)
+        return backend
+
+    def _build(self, backend, engine):
+        table = self.model.__table__
+        columns = [table.c.id] + [table.c[field] for field in FIELD_WEIGHTS]
+        with engine.connect() as conn:
+            result = conn.execution_options(yield_per=1000).execute(table.select().with_only_columns(*columns))
+            for row in result:
+                backend.add(row.id, **{field: row._mapping[field] for field in FIELD_WEIGHTS})
+
+    # Keep the in-memory index in step with committed ORM changes
+    def _listen(self):
+        if self._listening:
+            return
+        self._listening = True
+        event.listen(self.model, 'after_insert', self._record_upsert)
+        event.listen(self.model, 'after_update', self._record_upsert)
+        event.listen(self.model, 'after_delete', self._record_delete)
+        event.listen(Session, 'after_commit', self._apply_pending)
+        event.listen(Session, 'after_soft_rollback', self._discard_pending)
+
+    def _pending(self, target):
+        session = object_session(target)
+        return session.info.setdefault(self.PENDING_KEY, []) if session is not None else None
+
+    def _record_upsert(self, mapper, connection, target):
+        pending = self._pending(target)
+        if pending is not None:
+            pending.append((target.id, {field: getattr(target, field) for field in FIELD_WEIGHTS}))
+
+    def _record_delete(self, mapper, connection, target):
+        pending = self._pending(target)
+        if pending is not None:
+            pending.append((target.id, None))
+
+    # Index recipes written with bulk inserts, which skip the ORM events; `rows` are
+    # (recipe_id, {field: value}) pairs, applied when the session commits
+    def record_bulk_insert(self, session, rows):
+        if isinstance(self.ensure(), InvertedIndex):
+            session.info.setdefault(self.PENDING_KEY, []).extend(
+                (recipe_id, {field: fields.get(field) for field in FIELD_WEIGHTS}) for recipe_id, fields in rows)
+
+    def _apply_pending(self, session):
+        backend = self.backend
+        for recipe_id, fields in session.info.pop(self.PENDING_KEY, []):
+            if fields is None:
+                backend.remove(recipe_id)
+            else:
+                backend.add(recipe_id, **fields)
+
+    def _discard_pending(self, session, previous_transaction):
+        session.info.pop(self.PENDING_KEY, None)
+
+    # Recipe ids matching every term (prefix match), best match first
+    def search(self, keyword=None, ingredient=None, limit=None):
+        backend = self.ensure()
+        if isinstance(backend, Fts5Backend):
+            return backend.search(self.db.engine, keyword, ingredient, limit)
+        return backend.search(keyword, ingredient, limit)
@@ -0,0 +1,77 @@
+from flask import Blueprint, flash, jsonify, render_template, request, url_for
+
+from catalog import home_summary, recipe_page
+from extensions import limiter, typeahead
+from ingredients import ingredient_name
+from recipe_views import get_page_size, next_page_urls
+
+
+# Recipe search and the search form's suggestions
+bp = Blueprint('search', __name__)
+
+# Search for recipes
+@bp.route('/search', methods=['GET'])
+@limiter.limit("25 per minute")  # Pace search requests
+def search():
+    # Get total recipe count and recent recipes
+    total_recipes, recently_added = home_summary(10)
+    
+    # Keyword Search
+    keyword = request.args.get('keyword')
+    ingredient = request.args.get('ingredient')
+    
+    # Ranked full-text match (all terms, prefix matching), one page at a time
+    recipes, next_cursor, total_matches = recipe_page(keyword=keyword,
+                                                      ingredient=ingredient,
+                                                      cursor=request.args.get('cursor'),
+                                                      page_size=get_page_size())
+    next_url, more_url = next_page_urls(next_cursor, keyword=keyword, ingredient=ingredient)
+    found = total_recipes if total_matches is None else total_matches
+
+    if not recipes:
+        flash('Recipe not there? Add one!', 'info')
+        results = "No recipes found matching your criteria."
+    else:
+        if keyword and ingredient:
+            flash(f'{found} recipes found!', 'success')
+            results = f"Found {found} recipes matching your filters '{keyword}' and '{ingredient}':"
+        elif keyword:
+            flash(f'{found} recipes found!', 'success')
+            results = f"Found {found} recipes matching your keyword '{keyword}':"
+        elif ingredient:
+            flash(f'{found} recipes found!', 'success')
+            results = f"Found {found} recipes containing '{ingredient}':"
+        else:
+            flash(f'{found} recipes found! Get cooking!', 'info')
+            results = f"Showing all {found} recipes in the database:"
+
+    return render_template('index.html', 
+                         recipes=recipes, 
+                         recently_added=recently_added,
+                         keyword=keyword, 
+                         ingredient=ingredient, 
+                         total_recipes=total_recipes,
+                         results=results,
+                         next_url=next_url,
+                         more_url=more_url)
+
+# Typeahead for the search form's keyword (titles, then ingredients) and ingredient fields.
+# `q` is the text typed so far; for the ingredient field, the last comma-separated part of it.
+@bp.route('/suggest')
+@limiter.limit("300 per minute")  # Called as the user types, a few times a second at most
+def suggest():
+    field = request.args.get('field', 'keyword')
+    limit = max(min(request.args.get('limit', 8, type=int), 20), 1)
+    text = request.args.get('q', '')
+    if field == 'ingredient':
+        text = ingredient_name(text)
+    suggestions = []
+    for kind, ref, value in typeahead.suggest(text, field=field, limit=limit):
+        suggestion = {'value': value, 'kind': kind}
+        if kind == 'recipe':
+            suggestion['url'] = url_for('recipes.view_recipe', recipe_id=ref)
+        suggestions.append(suggestion)
+    response = jsonify(suggestions=suggestions)
+    response.cache_control.private = True
+    response.cache_control.max_age = 60
+    return response
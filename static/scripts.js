@@ -23,7 +23,7 @@
 
             const lightbox = document.createElement('div');
             lightbox.className = 'lightbox';
-            lightbox.innerHTML = `<img src="${image.src}" alt="Recipe Image">`;
+            lightbox.innerHTML = `<img src="${image.dataset.full || image.src}" alt="Recipe Image">`;
             lightbox.style.zIndex = '1000'; // Ensure lightbox is on top of overlay
 
             const info = document.createElement('div');
@@ -103,4 +103,109 @@
                 }, 300);
             });
         });
-    });
\ No newline at end of file
+    });
+
+    // Infinite scroll: append the next page of recipe cards when "Load More" comes into view
+    document.addEventListener('DOMContentLoaded', function() {
+        const grid = document.getElementById('recipe-grid');
+        const loadMore = document.getElementById('load-more');
+        if (!grid || !loadMore) return;
+
+        let loading = false;
+        let observer = null;
+
+        function fetchNextPage() {
+            if (loading || !loadMore.dataset.moreUrl) return;
+            loading = true;
+            fetch(loadMore.dataset.moreUrl, { headers: { 'Accept': 'application/json' } })
+                .then(response => response.ok ? response.json() : Promise.reject(response.status))
+                .then(data => {
+                    grid.insertAdjacentHTML('beforeend', data.html);
+                    if (data.more_url) {
+                        loadMore.href = data.next_url;
+                        loadMore.dataset.moreUrl = data.more_url;
+                        if (observer) {
+                            // Re-observe so a still-visible link triggers the following page
+                            observer.unobserve(loadMore);
+                            observer.observe(loadMore);
+                        }
+                    } else {
+                        if (observer) observer.disconnect();
+                        loadMore.remove();
+                    }
+                })
+                .catch(() => {
+                    // Stop auto-loading; the link still works as a regular page link
+                    if (observer) observer.disconnect();
+                    delete loadMore.dataset.moreUrl;
+                })
+                .finally(() => { loading = false; });
+        }
+
+        loadMore.addEventListener('click', (event) => {
+            if (!loadMore.dataset.moreUrl) return;
+            event.preventDefault();
+            fetchNextPage();
+        });
+
+        if ('IntersectionObserver' in window) {
+            observer = new IntersectionObserver(entries => {
+                if (entries.some(entry => entry.isIntersecting)) fetchNextPage();
+            }, { rootMargin: '400px' });
+            observer.observe(loadMore);
+        }
+    });
+
+    // Search suggestions: ask /suggest once typing pauses, and show the answers in the input's datalist.
+    // The ingredient field takes comma-separated ingredients, so only the last one is completed.
+    document.addEventListener('DOMContentLoaded', function() {
+        const DEBOUNCE_MS = 150;
+
+        document.querySelectorAll('input[data-suggest-url]').forEach(input => {
+            const list = document.getElementById(input.getAttribute('list'));
+            if (!list) return;
+            const multiple = input.name === 'ingredient';
+            let timer = null;
+            let controller = null;
+            let recipeUrls = {};
+
+            function update() {
+                const text = input.value;
+                const split = multiple ? text.lastIndexOf(',') + 1 : 0;
+                const head = multiple && split ? text.slice(0, split) + ' ' : '';
+                const query = text.slice(split).trim();
+                if (controller) controller.abort();
+                if (!query) {
+                    list.replaceChildren();
+                    return;
+                }
+                controller = new AbortController();
+                const url = `${input.dataset.suggestUrl}&q=${encodeURIComponent(query)}`;
+                fetch(url, { headers: { 'Accept': 'application/json' }, signal: controller.signal })
+                    .then(response => response.ok ? response.json() : Promise.reject(response.status))
+                    .then(data => {
+                        recipeUrls = {};
+                        list.replaceChildren(...data.suggestions.map(suggestion => {
+                            const option = document.createElement('option');
+                            option.value = head + suggestion.value;
+                            if (suggestion.url) recipeUrls[option.value] = suggestion.url;
+                            return option;
+                        }));
+                    })
+                    .catch(() => {});  // Aborted or rate limited: the form still works without suggestions
+            }
+
+            input.addEventListener('input', (event) => {
+                // Picking a recipe title from the list opens that recipe
+                if (event.inputType === 'insertReplacementText' || !event.inputType) {
+                    const url = recipeUrls[input.value];
+                    if (url) {
+                        window.location.href = url;
+                        return;
+                    }
+                }
+                clearTimeout(timer);
+                timer = setTimeout(update, DEBOUNCE_MS);
+            });
+        });
+    });
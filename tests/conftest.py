@@ -0,0 +1,66 @@
+"""Shared setup for the tests: the app, configured for a throwaway data directory, and a
+small seeded SQLite catalog.
+
+The app runs in debug mode, so each response reports the statements it ran in an
+X-Query-Count header, with the read cache off, so cached pages can't hide their queries.
+"""
+import io
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA = tempfile.mkdtemp(prefix='recipe-tests-')
+RECIPES = 30  # More than one page, so there is a next page to fetch
+
+# Settings are read when config.py is imported, so they are set before the app is
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(DATA, 'recipes.db')}",
+    UPLOAD_FOLDER=os.path.join(DATA, 'uploads'),
+    PDF_CACHE_DIR=os.path.join(DATA, 'pdf'),
+    STATIC_PRECOMPRESS_DIR=os.path.join(DATA, 'static'),
+    LOG_DIR=os.path.join(DATA, 'logs'),
+    PROFILE_DIR=os.path.join(DATA, 'profiles'),
+    TEMPLATE_CACHE_DIR='',
+    TEMPLATE_PRELOAD='false',
+    READ_CACHE_BACKEND='none',
+    RATELIMIT_STORAGE_URL='memory://',
+    RATELIMIT_ENABLED='false',
+    TYPEAHEAD_REFRESH_SECONDS='0',
+    RECIPES_PER_PAGE='24',
+    FLASK_ENV='development',
+)
+sys.path.insert(0, ROOT)
+
+
+# The app, with RECIPES recipes titled "Tomato soup <n>" sharing one photo
+@pytest.fixture(scope='session')
+def app():
+    from PIL import Image
+    from app import app
+    from catalog import import_recipes, init_db
+    from models import db
+    from photos import store_blob
+    from recipe_io import read_ndjson
+    with app.app_context():
+        init_db()
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 48), 'red').save(buffer, 'JPEG')
+        buffer.seek(0)
+        blob = store_blob(buffer, 'jpg')
+        db.session.commit()
+        lines = (json.dumps({'title': f'Tomato soup {i}', 'author': 'Ana', 'date': '2024-01-05',
+                             'prep_time': 5, 'cook_time': 10, 'ingredients': '2 cups tomato, 1 onion, salt',
+                             'instructions': 'Simmer.', 'images': ['photo']})
+                 for i in range(RECIPES))
+        summary = import_recipes(read_ndjson(lines), images={'photo': (blob.hash, blob.path)}, collect_ids=False)
+        assert summary['created'] == RECIPES
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
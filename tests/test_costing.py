@@ -0,0 +1,76 @@
+"""Scaling and costing recipes and menus from their parsed ingredient lines."""
+from collections import namedtuple
+
+import pytest
+
+from costing import LINE_FIELDS, cost_recipes
+from ingredients import parse_ingredient
+
+Row = namedtuple('Row', LINE_FIELDS)
+
+# name: (ingredient id, price, price unit, calories per price unit)
+PRICES = {
+    'rice': (1, 2.0, 'kg', 3600.0),
+    'milk': (2, 1.5, 'l', None),
+    'saffron': (3, None, None, None),
+    'eggs': (4, 0.25, 'each', 70.0),
+}
+
+
+# Rows as queries.costing_rows() returns them
+def rows(recipe_id, title, lines):
+    result = []
+    for line in lines:
+        quantity, quantity_max, unit, name = parse_ingredient(line)
+        ingredient_id, price, price_unit, calories = PRICES[name]
+        result.append(Row(recipe_id, title, line, quantity, quantity_max, unit, ingredient_id, name, price, price_unit,
+                          calories))
+    return result
+
+
+@pytest.fixture
+def menu():
+    return cost_recipes(rows(1, 'Rice pudding', ['500 g rice', '1 l milk', '1 pinch saffron'])
+                        + rows(2, 'Saffron water', ['1 pinch saffron'])
+                        + rows(3, 'Eggs and rice', ['2-4 eggs', '1 cup rice']),
+                        {1: 1.0, 2: 1.0, 3: 2.0})
+
+
+def test_converts_units_and_scales(menu):
+    pudding, _, eggs = menu['recipes']
+    assert [line['cost'] for line in pudding['lines']] == [1.0, 1.5, None]  # 0.5 kg and 1 l
+    assert pudding['calories'] == 1800
+    assert eggs['lines'][0]['scaled'] == '4-8 eggs'
+    assert eggs['lines'][0]['cost'] == 1.5  # The middle of the range: 6 eggs
+
+
+def test_partially_priced_menu(menu):
+    pudding, saffron, eggs = menu['recipes']
+    # Lines without a price (no price, or one in a unit that doesn't convert) are left out
+    # of the totals, and the totals say how many lines were priced
+    assert (pudding['cost'], pudding['priced_lines'], pudding['line_count']) == (2.5, 2, 3)
+    assert (eggs['cost'], eggs['priced_lines'], eggs['line_count']) == (1.5, 1, 2)
+    # With no line priced there is no cost, rather than a cost of 0
+    assert (saffron['cost'], saffron['calories'], saffron['priced_lines']) == (None, None, 0)
+    assert (menu['cost'], menu['priced_lines'], menu['line_count']) == (4.0, 3, 6)
+    assert menu['calories'] == 2220
+
+
+def test_shopping_list_totals_each_ingredient(menu):
+    shopping = {(item['ingredient'], item['unit']): (item['quantity'], item['cost']) for item in menu['shopping_list']}
+    assert shopping == {
+        ('eggs', None): (6.0, 1.5),
+        ('milk', 'l'): (1.0, 1.5),
+        ('rice', 'g'): (500.0, 1.0),
+        ('rice', 'ml'): (473.18, None),  # Cups don't convert to the price per kg
+        ('saffron', 'ml'): (0.62, None),
+    }
+
+
+def test_unpriced_menu_and_recipe_without_lines():
+    costing = cost_recipes(rows(1, 'Saffron water', ['1 pinch saffron'])
+                           + [Row(2, 'Empty', *[None] * (len(LINE_FIELDS) - 2))], {1: 1.0, 2: 1.0})
+    assert costing['cost'] is None
+    assert [recipe['line_count'] for recipe in costing['recipes']] == [1, 0]
+    assert costing['recipes'][1]['lines'] == []
+    assert cost_recipes([], {})['cost'] is None
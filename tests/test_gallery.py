@@ -0,0 +1,13 @@
+"""The streamed photo gallery."""
+
+
+def test_streamed_gallery_returns_its_connection(app, client):
+    from models import db
+    with app.app_context():
+        pool = db.engine.pool
+    for _ in range(3):
+        response = client.get('/photo_gallery')
+        assert response.is_streamed
+        assert response.get_data(as_text=True).count('gallery-item') == 30
+        response.close()
+        assert pool.checkedout() == 0
@@ -0,0 +1,50 @@
+"""Parsing, formatting and scaling ingredient lines."""
+import pytest
+
+from ingredients import format_quantity, parse_ingredient, scale_line, split_ingredients
+
+
+@pytest.mark.parametrize('line,parsed', [
+    ('2 cups tomato', (2.0, 2.0, 'cup', 'tomato')),
+    ('2-3 Cups of  Tomato', (2.0, 3.0, 'cup', 'tomato')),
+    ('2 to 4 eggs', (2.0, 4.0, 'each', 'eggs')),
+    ('4-2 apples', (4.0, 4.0, 'each', 'apples')),  # A reversed range is its larger end
+    ('1/2 cup sugar', (0.5, 0.5, 'cup', 'sugar')),
+    ('1 1/2 tsp salt', (1.5, 1.5, 'tsp', 'salt')),
+    ('½ cup milk', (0.5, 0.5, 'cup', 'milk')),
+    ('1½ cups flour', (1.5, 1.5, 'cup', 'flour')),
+    ('1,5 kg potatoes', (1.5, 1.5, 'kg', 'potatoes')),
+    ('1.5 lb beef', (1.5, 1.5, 'lb', 'beef')),
+    ('250 grams butter', (250.0, 250.0, 'g', 'butter')),
+    ('2 L water', (2.0, 2.0, 'l', 'water')),
+    ('3 tbsp. olive oil', (3.0, 3.0, 'tbsp', 'olive oil')),
+    ('3 cloves garlic', (3.0, 3.0, 'clove', 'garlic')),
+    ('2 large eggs', (2.0, 2.0, 'each', 'large eggs')),
+    ('pinch of salt', (1.0, 1.0, 'pinch', 'salt')),
+    ('salt to taste', (None, None, None, 'salt to taste')),
+    ('1/0 cup water', (None, None, None, 'water')),
+])
+def test_parse_ingredient(line, parsed):
+    assert parse_ingredient(line) == parsed
+
+
+@pytest.mark.parametrize('value,written', [
+    (1.5, '1 1/2'), (1 / 3, '1/3'), (0.125, '1/8'), (2.0, '2'), (2.99, '3'), (12.75, '12.8'), (0.05, '0.05'),
+])
+def test_format_quantity(value, written):
+    assert format_quantity(value) == written
+
+
+@pytest.mark.parametrize('line,quantity,quantity_max,scaled', [
+    ('2 cups rice', 3.0, 3.0, '3 cups rice'),
+    ('2-3  eggs', 4.0, 6.0, '4-6 eggs'),
+    ('½ cup milk', 0.75, 0.75, '3/4 cup milk'),
+    ('salt to taste', None, None, 'salt to taste'),
+])
+def test_scale_line(line, quantity, quantity_max, scaled):
+    assert scale_line(line, quantity, quantity_max) == scaled
+
+
+def test_split_ingredients():
+    assert split_ingredients(' 2 cups rice, ,1 onion,') == ['2 cups rice', '1 onion']
+    assert split_ingredients(None) == []
@@ -0,0 +1,44 @@
+"""Cursor pagination of the home, search and API listings."""
+import base64
+import json
+import re
+
+import pytest
+
+CARD_PATTERN = re.compile(r'/recipe/(\d+)"')
+
+
+def cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip('=')
+
+
+# Recipe ids on a page of /recipes/more
+def page_ids(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return CARD_PATTERN.findall(response.get_json()['html']), response.get_json()['more_url']
+
+
+@pytest.mark.parametrize('path', ['/recipes/more?', '/recipes/more?keyword=tomato&'])
+def test_pages_follow_on(client, path):
+    first, more_url = page_ids(client, f'{path}per_page=10')
+    second, _ = page_ids(client, more_url)
+    assert len(first) == len(second) == 10
+    assert not set(first) & set(second)
+
+
+# Cursors clients could send: not base64 or JSON, the wrong type or length, out of range
+MALFORMED = ['NQ', '!!!', 'bm90IGpzb24', cursor({'a': 1}), cursor('x'), cursor([]), cursor([1, 2, 3]),
+             cursor([-5]), cursor([True]), cursor([2 ** 70]), cursor(['x']), cursor([1.5]),
+             cursor([None, 1]), cursor(['2024-01-05T10:00:00', 'x']), cursor(['2024-01-05T10:00:00', 2 ** 64]),
+             cursor(['yesterday', 3]), cursor([20240105, 3]), cursor(['2024-01-05T10:00:00', 3, 4])]
+
+
+@pytest.mark.parametrize('value', MALFORMED)
+@pytest.mark.parametrize('path', ['/', '/recipes/more', '/search?keyword=tom', '/search?ingredient=tomato',
+                                  '/recipes/more?keyword=tom', '/api/v1/recipes', '/api/v1/recipes?keyword=tom'])
+def test_malformed_cursor_starts_from_the_first_page(client, path, value):
+    separator = '&' if '?' in path else '?'
+    response = client.get(f'{path}{separator}cursor={value}')
+    assert response.status_code == 200
+    assert response.get_data() == client.get(path).get_data()
@@ -0,0 +1,40 @@
+"""Recipe PDFs are written with FPDF's latin-1 core fonts, whatever the recipe contains."""
+import re
+import zlib
+
+from pdf_render import RecipeSnapshot, render_recipe_pdf
+
+TITLE = 'Crème brûlée — “Tokyo” 東京 style'
+
+
+# The text drawn on the pages (FPDF compresses each page's content stream)
+def page_text(data):
+    return b''.join(zlib.decompress(stream) for stream in re.findall(rb'stream\n(.*?)endstream', data, re.S))
+
+
+def test_title_outside_latin1_renders():
+    recipe = RecipeSnapshot(1, TITLE, 'Zoë', '2024-01-05', 5, 10, '1 cup cream', 'Bake…', None, None)
+    data = render_recipe_pdf(recipe)
+    assert data.startswith(b'%PDF')
+    text = page_text(data)
+    assert 'Crème brûlée - "Tokyo" ?? style'.encode('latin-1') in text
+    assert 'Zoë'.encode('latin-1') in text
+    assert b'Bake...' in text
+
+
+def test_pdf_route_renders_title_outside_latin1(app, client):
+    from models import Recipe, db
+    with app.app_context():
+        recipe = Recipe(title=TITLE, ingredients='1 cup cream', instructions='Bake.')
+        db.session.add(recipe)
+        db.session.commit()
+        recipe_id = recipe.id
+    try:
+        response = client.get(f'/generate_pdf/{recipe_id}')
+        assert response.status_code == 200
+        assert response.mimetype == 'application/pdf'
+        assert 'Crème brûlée - '.encode('latin-1') in page_text(response.get_data())
+    finally:
+        with app.app_context():
+            db.session.delete(db.session.get(Recipe, recipe_id))
+            db.session.commit()
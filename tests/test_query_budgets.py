@@ -0,0 +1,48 @@
+"""Every page stays within its SQL statement budget (QUERY_BUDGETS in config.py).
+
+Each URL is requested once to build the lazily created indexes, then its X-Query-Count
+header is checked (see conftest.py).
+
+    python -m pytest tests
+"""
+import pytest
+
+
+# URLs checked for each budgeted endpoint
+URLS = {
+    'recipes.index': ['/'],
+    'search.search': ['/search?keyword=soup', '/search?ingredient=tomato'],
+    'recipes.more_recipes': ['/recipes/more', 'next page'],
+    'search.suggest': ['/suggest?q=tom', '/suggest?q=tom&field=ingredient'],
+    'recipes.view_recipe': ['/recipe/1', '/recipe/1?covers=8&servings=4'],
+    'recipes.update_recipe': ['/update/1'],
+    'gallery.photo_gallery': ['/photo_gallery'],
+    'pdf.generate_pdf': ['/generate_pdf/1'],
+    'api.list_recipes': ['/api/v1/recipes', '/api/v1/recipes?keyword=soup'],
+    'api.get_recipe': ['/api/v1/recipes/1'],
+    'api.scale_recipe': ['/api/v1/recipes/1/scale?factor=2'],
+}
+
+
+# The URL to request; 'next page' is the infinite-scroll URL the first page links to
+def resolve(client, url):
+    if url == 'next page':
+        url = client.get('/recipes/more').get_json()['more_url']
+        assert url, 'the first page has no next page'
+    return url
+
+
+def test_every_budget_is_checked(app):
+    assert set(URLS) == set(app.config['QUERY_BUDGETS'])
+
+
+@pytest.mark.parametrize('endpoint,url', [(endpoint, url) for endpoint, urls in URLS.items() for url in urls])
+def test_query_budget(app, client, endpoint, url):
+    url = resolve(client, url)
+    client.get(url)
+    response = client.get(url)
+    assert response.status_code == 200
+    assert app.url_map.bind('localhost').match(url.split('?')[0])[0] == endpoint
+    count = int(response.headers['X-Query-Count'])
+    budget = app.config['QUERY_BUDGETS'][endpoint]
+    assert count <= budget, f'{url} ran {count} queries (budget {budget})'
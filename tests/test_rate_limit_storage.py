@@ -0,0 +1,146 @@
+"""The shm:// rate limit storage: counts, windows, and sharing between processes."""
+import os
+import subprocess
+import sys
+
+import pytest
+from limits import parse
+from limits.errors import ConfigurationError
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter, MovingWindowRateLimiter, SlidingWindowCounterRateLimiter
+
+import rate_limit_storage
+from rate_limit_storage import SharedMemoryStorage
+
+ROOT = os.path.dirname(rate_limit_storage.__file__)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def uri(tmp_path):
+    return f"shm://{tmp_path / 'ratelimit.slots'}?slots=64"
+
+
+@pytest.fixture
+def storage(uri):
+    return SharedMemoryStorage(uri)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit_storage, 'time', clock)
+    return clock
+
+
+def test_registered_for_shm_urls(uri):
+    assert isinstance(storage_from_string(uri), SharedMemoryStorage)
+
+
+def test_fixed_window_hits(storage):
+    limiter = FixedWindowRateLimiter(storage)
+    limit = parse('3/minute')
+    assert [limiter.hit(limit, 'client-a') for _ in range(4)] == [True, True, True, False]
+    assert limiter.hit(limit, 'client-b')
+    assert limiter.get_window_stats(limit, 'client-a').remaining == 0
+    assert limiter.get_window_stats(limit, 'client-b').remaining == 2
+
+
+def test_sliding_window_hits(storage):
+    limiter = SlidingWindowCounterRateLimiter(storage)
+    limit = parse('3/minute')
+    assert [limiter.hit(limit, 'client-a') for _ in range(4)] == [True, True, True, False]
+    assert limiter.hit(limit, 'client-b')
+    assert not limiter.hit(parse('1/minute'), 'client-c', cost=2)
+    limiter.clear(limit, 'client-a')
+    assert limiter.hit(limit, 'client-a')
+
+
+# Only the strategies above are supported: a moving window needs every hit's time
+def test_moving_window_is_not_supported(storage):
+    with pytest.raises(NotImplementedError):
+        MovingWindowRateLimiter(storage)
+
+
+def test_window_expiry(storage, clock):
+    assert storage.incr('key', expiry=60) == 1
+    assert storage.incr('key', expiry=60) == 2
+    assert storage.get_expiry('key') == clock.now + 60
+    clock.now += 59
+    assert storage.get('key') == 2
+    clock.now += 1
+    assert storage.get('key') == 0
+    assert storage.incr('key', expiry=60) == 1  # A new window
+
+
+def test_sliding_window_weights_the_previous_window(storage, clock):
+    clock.now = 600.0  # The start of a 60 s window
+    for _ in range(4):
+        assert storage.acquire_sliding_window_entry('key', limit=4, expiry=60)
+    assert not storage.acquire_sliding_window_entry('key', limit=4, expiry=60)
+    clock.now += 90  # Half of the previous window is still inside the sliding window: 4 * 0.5 = 2
+    previous_count, _, current_count, _ = storage.get_sliding_window('key', 60)
+    assert (previous_count, current_count) == (4, 0)
+    assert storage.acquire_sliding_window_entry('key', limit=4, expiry=60)
+    assert storage.acquire_sliding_window_entry('key', limit=4, expiry=60)
+    assert not storage.acquire_sliding_window_entry('key', limit=4, expiry=60)
+
+
+def test_decr_stops_at_zero(storage):
+    storage.incr('key', expiry=60, amount=2)
+    assert storage.decr('key') == 1
+    assert storage.decr('key', amount=5) == 0
+    assert storage.decr('missing') == 0
+
+
+def test_clear_and_reset(storage):
+    for key in ('a', 'b', 'c'):
+        storage.incr(key, expiry=60)
+    storage.clear('a')
+    assert storage.get('a') == 0
+    assert storage.get('b') == 1
+    assert storage.reset() == 2
+    assert storage.get('b') == storage.get('c') == 0
+
+
+def test_full_bucket_reuses_the_slot_expiring_first(tmp_path, clock):
+    storage = SharedMemoryStorage(f"shm://{tmp_path / 'one-bucket.slots'}?slots=16")
+    for n in range(16):
+        storage.incr(f'key-{n}', expiry=60 + n)
+    storage.incr('one-more', expiry=60)
+    assert storage.get('one-more') == 1
+    assert storage.get('key-0') == 0  # Forgotten rather than failing
+    assert storage.get('key-15') == 1
+
+
+# Counts are in the file, so they outlive the process: a restarted worker keeps the limits
+def test_counts_persist_in_the_file(uri, storage):
+    storage.incr('key', expiry=60, amount=3)
+    assert SharedMemoryStorage(uri).get('key') == 3
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'other'
+    path.write_bytes(b'not a slot table')
+    with pytest.raises(ConfigurationError, match='not a rate limit file'):
+        SharedMemoryStorage(f'shm://{path}')
+
+
+# Each process increments the same key; no increment may be lost
+def test_processes_share_counts(uri, storage):
+    code = (f'import sys; sys.path.insert(0, {ROOT!r}); from rate_limit_storage import SharedMemoryStorage; '
+            f'storage = SharedMemoryStorage({uri!r}); sys.stdin.read(); '
+            f'[storage.incr("shared", expiry=600) for _ in range(2000)]')
+    processes = [subprocess.Popen([sys.executable, '-c', code], stdin=subprocess.PIPE) for _ in range(2)]
+    for process in processes:
+        process.stdin.close()  # Start both at once
+    for process in processes:
+        assert process.wait(timeout=60) == 0
+    assert storage.get('shared') == 4000
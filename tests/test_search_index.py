@@ -0,0 +1,105 @@
+"""Full-text search, on SQLite FTS5 and on the in-memory inverted index used without it."""
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from search_index import Fts5Backend, InvertedIndex, RecipeSearchIndex, tokenize
+
+
+def test_tokenize_folds_case_and_accents():
+    assert tokenize('Crème Brûlée, 2 ÉCLAIRS') == ['creme', 'brulee', '2', 'eclairs']
+    assert tokenize('') == []
+
+
+# A search index over the test database with each backend, built before the test's changes
+@pytest.fixture(params=['fts5', 'memory'])
+def index(request, app, monkeypatch):
+    from models import Recipe, db
+    if request.param == 'memory':
+        def no_fts5(self, engine):
+            raise OperationalError('CREATE VIRTUAL TABLE', {}, Exception('no such module: fts5'))
+        monkeypatch.setattr(Fts5Backend, 'create', no_fts5)
+    index = RecipeSearchIndex(db, Recipe)
+    with app.app_context():
+        backend = index.ensure()
+        assert backend.name == request.param
+        yield index
+        db.session.rollback()
+        for recipe in Recipe.query.filter(Recipe.title.not_like('Tomato soup %')):
+            db.session.delete(recipe)
+        db.session.commit()
+    if index._listening:
+        event.remove(Recipe, 'after_insert', index._record_upsert)
+        event.remove(Recipe, 'after_update', index._record_upsert)
+        event.remove(Recipe, 'after_delete', index._record_delete)
+        event.remove(Session, 'after_commit', index._apply_pending)
+        event.remove(Session, 'after_soft_rollback', index._discard_pending)
+
+
+def add_recipe(title, ingredients='1 quince, 2 cups sugar'):
+    from models import Recipe, db
+    recipe = Recipe(title=title, ingredients=ingredients, instructions='Cook.')
+    db.session.add(recipe)
+    db.session.commit()
+    return recipe
+
+
+def test_finds_a_new_recipe(index):
+    recipe = add_recipe('Quince paste')
+    assert recipe.id in index.search(keyword='quince')
+    assert recipe.id in index.search(keyword='qui pas')  # Every term, by prefix
+    assert recipe.id in index.search(ingredient='sugar')
+    assert recipe.id not in index.search(keyword='quince', ingredient='tomato')
+
+
+def test_title_matches_rank_first(index):
+    in_ingredients = add_recipe('Spiced pears', ingredients='4 pears, 1 quince')
+    in_title = add_recipe('Quince jelly', ingredients='1 kg apples')
+    assert index.search(keyword='quince')[:2] == [in_title.id, in_ingredients.id]
+
+
+def test_folds_accents(index):
+    recipe = add_recipe('Crème brûlée')
+    assert recipe.id in index.search(keyword='creme brulee')
+    assert recipe.id in index.search(keyword='BRÛLÉE')
+
+
+def test_finds_a_renamed_recipe_by_its_new_title(index):
+    from models import db
+    recipe = add_recipe('Quince paste')
+    recipe.title = 'Medlar jelly'
+    db.session.commit()
+    assert recipe.id in index.search(keyword='medlar')
+    assert recipe.id not in index.search(keyword='paste')
+
+
+def test_forgets_a_deleted_recipe(index):
+    from models import db
+    recipe = add_recipe('Medlar jelly')
+    recipe_id = recipe.id
+    db.session.delete(recipe)
+    db.session.commit()
+    assert recipe_id not in index.search(keyword='medlar')
+
+
+def test_ignores_a_rolled_back_insert(index):
+    from models import Recipe, db
+    recipe = Recipe(title='Rowan jelly', ingredients='1 kg rowan berries')
+    db.session.add(recipe)
+    db.session.flush()
+    db.session.rollback()
+    db.session.commit()  # The next commit of the session must not apply the rolled back change
+    assert index.search(keyword='rowan') == []
+    kept = add_recipe('Rowan chutney')
+    assert index.search(keyword='rowan') == [kept.id]
+
+
+def test_inverted_index_prunes_removed_terms():
+    backend = InvertedIndex()
+    backend.add(1, title='Quince paste', ingredients='quince')
+    backend.add(2, title='Quiche', ingredients='eggs')
+    backend.remove(1)
+    assert backend.search(keyword='qui') == [2]
+    assert backend.search(keyword='paste') == []
+    assert len(backend) == 1
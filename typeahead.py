@@ -0,0 +1,259 @@
+import bisect
+import threading
+import time
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session, object_session
+
+from search_index import tokenize
+
+
+MAX_WORD_STARTS = 4  # Besides its start, a value is found from the start of this many of its later words
+SCAN_FACTOR = 5  # Keys read per suggestion at most, so repeated values can't make a lookup slow
+
+
+# Search key for a value or a typed prefix: lowercase, accent-free words separated by one space
+def normalize(text):
+    return ' '.join(tokenize(text))
+
+
+def _keys(value):
+    words = tokenize(value)
+    keys = [(0, ' '.join(words))] if words else []
+    keys += [(1, ' '.join(words[start:])) for start in range(1, min(len(words), MAX_WORD_STARTS + 1))]
+    return keys
+
+
+# Prefix lookups over short strings (recipe titles, ingredient names) with two sorted key arrays
+# searched with bisect: one keyed on whole values, which rank first, and one on their later
+# words, so "soup" finds "Tomato Soup" too. `ref` identifies a value (e.g. its row id).
+class PrefixIndex:
+    def __init__(self):
+        self._values = {}  # ref -> value
+        self._keys = ([], [])  # Sorted keys: whole values, later words
+        self._refs = ([], [])  # The ref of each key
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._values)
+
+    # A new index of (ref, value) pairs, sorted once instead of inserted one at a time
+    @classmethod
+    def build(cls, entries):
+        index = cls()
+        pairs = ([], [])
+        for ref, value in entries:
+            index._values[ref] = value
+            for tier, key in _keys(value):
+                pairs[tier].append((key, ref))
+        for tier, tier_pairs in enumerate(pairs):
+            tier_pairs.sort()
+            index._keys[tier][:] = [key for key, _ in tier_pairs]
+            index._refs[tier][:] = [ref for _, ref in tier_pairs]
+        return index
+
+    def add(self, ref, value):
+        with self._lock:
+            self.remove(ref)
+            self._values[ref] = value
+            for tier, key in _keys(value):
+                position = bisect.bisect_right(self._keys[tier], key)
+                self._keys[tier].insert(position, key)
+                self._refs[tier].insert(position, ref)
+
+    def remove(self, ref):
+        with self._lock:
+            value = self._values.pop(ref, None)
+            if value is None:
+                return
+            for tier, key in _keys(value):
+                keys, refs = self._keys[tier], self._refs[tier]
+                position = bisect.bisect_left(keys, key)
+                while position < len(keys) and keys[position] == key:
+                    if refs[position] == ref:
+                        del keys[position], refs[position]
+                        break
+                    position += 1
+
+    # Up to `limit` (ref, value) pairs whose value, or a later word of it, starts with `text`.
+    # Values starting with it come first; each list is alphabetical, and repeats are skipped.
+    def search(self, text, limit=10):
+        prefix = normalize(text)
+        if not prefix or limit <= 0:
+            return []
+        found = {}
+        with self._lock:
+            for keys, refs in zip(self._keys, self._refs):
+                position = bisect.bisect_left(keys, prefix)
+                end = min(position + limit * SCAN_FACTOR, len(keys))
+                while position < end and len(found) < limit and keys[position].startswith(prefix):
+                    ref = refs[position]
+                    value = self._values[ref]
+                    found.setdefault(value.casefold(), (ref, value))
+                    position += 1
+        return list(found.values())
+
+
+# Suggestions for the search form from recipe titles and ingredient names, answered from memory.
+# Built from the tables the first time it is needed and kept in step with committed ORM changes
+# (and bulk inserts recorded with record_bulk_insert). Each process has its own copy, so one
+# worker doesn't see another's writes at once: every `TYPEAHEAD_REFRESH_SECONDS` a background
+# thread checks whether the tables changed and rebuilds the index if they did.
+class Typeahead:
+    PENDING_KEY = 'typeahead_pending'
+
+    def __init__(self, app=None, db=None, recipe_model=None, ingredient_model=None):
+        self.titles = None
+        self.ingredients = None
+        self.refresh_seconds = 0
+        self._built_at = 0
+        self._signature = None
+        self._replay = None  # Changes committed while a rebuild reads the tables
+        self._listening = False
+        self._build_lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, db, recipe_model, ingredient_model)
+
+    def init_app(self, app, db, recipe_model, ingredient_model):
+        self.app = app
+        self.db = db
+        self.recipe_model = recipe_model
+        self.ingredient_model = ingredient_model
+        self.refresh_seconds = app.config['TYPEAHEAD_REFRESH_SECONDS']
+        self._listen()
+        app.extensions['typeahead'] = self
+
+    # Keep the index in step with committed ORM changes. The events are global to the
+    # models and Session, so listen once however many apps are created.
+    def _listen(self):
+        if self._listening:
+            return
+        self._listening = True
+        event.listen(self.recipe_model, 'after_insert', self._record_recipe)
+        event.listen(self.recipe_model, 'after_update', self._record_recipe)
+        event.listen(self.recipe_model, 'after_delete', self._record_recipe_delete)
+        event.listen(self.ingredient_model, 'after_insert', self._record_ingredient)
+        event.listen(self.ingredient_model, 'after_update', self._record_ingredient)
+        event.listen(self.ingredient_model, 'after_delete', self._record_ingredient_delete)
+        event.listen(Session, 'after_commit', self._apply_pending)
+        event.listen(Session, 'after_soft_rollback', self._discard_pending)
+
+    # Build the index the first time it is needed, and start a refresh when it is due
+    def ensure(self):
+        if self.titles is None:
+            with self._build_lock:
+                if self.titles is None:
+                    with self._replay_lock:
+                        self._replay = []
+                    self._rebuild()
+        elif self.refresh_seconds and time.monotonic() - self._built_at > self.refresh_seconds:
+            with self._replay_lock:
+                if self._replay is not None:
+                    return  # Already refreshing
+                self._replay = []
+                self._built_at = time.monotonic()
+            threading.Thread(target=self._refresh, name='typeahead-refresh', daemon=True).start()
+
+    def _refresh(self):
+        try:
+            with self.app.app_context():
+                if self._table_signature() != self._signature:
+                    self._rebuild()
+                    self.app.logger.info('Rebuilt the typeahead index (%d titles, %d ingredients)',
+                                         len(self.titles), len(self.ingredients))
+                    return
+        except Exception:
+            self.app.logger.exception('Could not refresh the typeahead index')
+        with self._replay_lock:
+            self._replay = None
+
+    # Row counts, newest ids and last edit: these change whenever the suggestions could
+    def _table_signature(self):
+        recipes = self.recipe_model.__table__
+        ingredients = self.ingredient_model.__table__
+        with self.db.engine.connect() as conn:
+            return (tuple(conn.execute(select(func.count(), func.max(recipes.c.id), func.max(recipes.c.updated_at)))
+                          .one()),
+                    tuple(conn.execute(select(func.count(), func.max(ingredients.c.id))).one()))
+
+    # Read both tables into new indexes, then swap them in with whatever was committed meanwhile
+    def _rebuild(self):
+        recipes = self.recipe_model.__table__
+        ingredients = self.ingredient_model.__table__
+        signature = self._table_signature()
+        with self.db.engine.connect() as conn:
+            titles = PrefixIndex.build(conn.execution_options(yield_per=5000).execute(
+                select(recipes.c.id, recipes.c.title)))
+            names = PrefixIndex.build(conn.execution_options(yield_per=5000).execute(
+                select(ingredients.c.id, ingredients.c.name)))
+        with self._replay_lock:
+            for change in self._replay or []:
+                self._apply(titles, names, change)
+            self.titles, self.ingredients = titles, names
+            self._signature = signature
+            self._built_at = time.monotonic()
+            self._replay = None
+
+    # Changes are (kind, id, value), with value None for a delete
+    def _pending(self, target):
+        session = object_session(target)
+        return session.info.setdefault(self.PENDING_KEY, []) if session is not None else None
+
+    def _record(self, target, kind, value):
+        pending = self._pending(target)
+        if pending is not None:
+            pending.append((kind, target.id, value))
+
+    def _record_recipe(self, mapper, connection, target):
+        self._record(target, 'recipe', target.title)
+
+    def _record_recipe_delete(self, mapper, connection, target):
+        self._record(target, 'recipe', None)
+
+    def _record_ingredient(self, mapper, connection, target):
+        self._record(target, 'ingredient', target.name)
+
+    def _record_ingredient_delete(self, mapper, connection, target):
+        self._record(target, 'ingredient', None)
+
+    # Add rows written with bulk inserts, which skip the ORM events; `recipes` and `ingredients`
+    # are (id, title) and (id, name) pairs, applied when the session commits
+    def record_bulk_insert(self, session, recipes=(), ingredients=()):
+        pending = session.info.setdefault(self.PENDING_KEY, [])
+        pending.extend(('recipe', recipe_id, title) for recipe_id, title in recipes)
+        pending.extend(('ingredient', ingredient_id, name) for ingredient_id, name in ingredients)
+
+    def _apply_pending(self, session):
+        changes = session.info.pop(self.PENDING_KEY, None)
+        if not changes:
+            return
+        with self._replay_lock:
+            if self._replay is not None:
+                self._replay.extend(changes)
+            if self.titles is not None:
+                for change in changes:
+                    self._apply(self.titles, self.ingredients, change)
+
+    def _discard_pending(self, session, previous_transaction):
+        session.info.pop(self.PENDING_KEY, None)
+
+    @staticmethod
+    def _apply(titles, ingredients, change):
+        kind, ref, value = change
+        index = titles if kind == 'recipe' else ingredients
+        if value is None:
+            index.remove(ref)
+        else:
+            index.add(ref, value)
+
+    # Up to `limit` (kind, id, value) suggestions for `text`: ingredient names for the
+    # 'ingredient' field, otherwise recipe titles followed by ingredient names
+    def suggest(self, text, field='keyword', limit=10):
+        self.ensure()
+        suggestions = []
+        if field != 'ingredient':
+            suggestions += [('recipe', ref, value) for ref, value in self.titles.search(text, limit)]
+        suggestions += [('ingredient', ref, value)
+                        for ref, value in self.ingredients.search(text, limit - len(suggestions))]
+        return suggestions